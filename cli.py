@@ -4,9 +4,11 @@ os.environ["POLARS_ENGINE_AFFINITY"] = "streaming"
 if "POLARS_MAX_THREADS" not in os.environ:
     os.environ["POLARS_MAX_THREADS"] = "1"
 
+import datetime
 import ftplib
 import io
 import sys
+from typing import Optional
 import tqdm
 import click
 import em27_metadata
@@ -20,6 +22,7 @@ retrieval_command_group = click.Group(name="retrieval")
 profiles_command_group = click.Group(name="profiles")
 bundle_command_group = click.Group(name="bundle")
 geoms_command_group = click.Group(name="geoms")
+ifg_catalog_command_group = click.Group(name="ifg-catalog")
 
 
 def _check_config_validity() -> None:
@@ -95,7 +98,101 @@ def watch(
 
     import src
 
-    src.retrieval.utils.queue_watcher.start_retrieval_watcher(cluster_mode)
+    src.retrieval.utils.queue_watcher.start_retrieval_watcher(
+        cluster_mode, max_process_count=_get_max_process_count()
+    )
+
+
+def _get_max_process_count() -> Optional[int]:
+    """The `max_process_count` from the config, if there is a valid one."""
+
+    import src
+
+    try:
+        config = src.types.Config.load(ignore_path_existence=True)
+    except Exception:
+        return None
+    if config.retrieval is None:
+        return None
+    return config.retrieval.general.max_process_count
+
+
+@retrieval_command_group.command(
+    name="estimate",
+    short_help="Estimate Remaining Retrieval Time",
+    help="Print the progress of the retrieval queue and the projected remaining time of each job and of the whole queue as JSON. The throughput (interferograms per core-second) is estimated from the recently finished sessions.",
+)
+@click.option(
+    "--max-process-count",
+    type=int,
+    default=None,
+    help="Number of cores to project the remaining time for. Defaults to `max_process_count` from the config.",
+)
+def estimate(
+    max_process_count: Optional[int],
+) -> None:
+    # no config check because this does not require a config
+
+    import src
+
+    if max_process_count is None:
+        max_process_count = _get_max_process_count() or 1
+    estimate = src.retrieval.utils.throughput.estimate_queue(
+        src.retrieval.utils.retrieval_status.RetrievalStatusList.load(),
+        max_process_count=max_process_count,
+    )
+    click.echo(estimate.model_dump_json(indent=4))
+
+
+@retrieval_command_group.command(
+    name="stats",
+    short_help="Print Retrieval Stage Statistics",
+    help="Print the p50/p90/p99/max wall time, CPU time, peak memory and disk I/O of every stage of the finished retrieval sessions, per retrieval algorithm and sensor. The sessions append their measurements to `data/logs/retrieval-metrics.jsonl`.",
+)
+@click.option(
+    "--json",
+    "as_json",
+    is_flag=True,
+    default=False,
+    help="Print the statistics as JSON instead of a table.",
+)
+def stats(
+    as_json: bool,
+) -> None:
+    # no config check because this does not require a config
+
+    import src
+
+    statistics = src.retrieval.utils.telemetry.compute_stage_statistics(
+        src.retrieval.utils.telemetry.load_session_metrics()
+    )
+    if as_json:
+        click.echo(
+            pydantic.TypeAdapter(list[src.retrieval.utils.telemetry.StageStatistics])
+            .dump_json(statistics, indent=4)
+            .decode()
+        )
+        return
+    if len(statistics) == 0:
+        click.echo("No session metrics recorded yet")
+        return
+
+    click.echo(
+        f"{'algorithm':<16} {'sensor':<8} {'stage':<18} {'n':>5} "
+        + f"{'wall p50/p90/max [s]':>24} {'cpu p50/p90/max [s]':>24} "
+        + f"{'rss max [MB]':>12} {'read p90 [MB]':>14} {'write p90 [MB]':>15}"
+    )
+    for s in statistics:
+        wall = s.wall_time_seconds
+        cpu = s.cpu_time_seconds
+        rss = f"{s.peak_rss_mb['max']:.1f}" if "max" in s.peak_rss_mb else "-"
+        click.echo(
+            f"{s.retrieval_algorithm:<16} {s.sensor_id:<8} {s.stage:<18} {s.session_count:>5} "
+            + f"{wall['p50']:>8.1f}{wall['p90']:>8.1f}{wall['max']:>8.1f} "
+            + f"{cpu['p50']:>8.1f}{cpu['p90']:>8.1f}{cpu['max']:>8.1f} "
+            + f"{rss:>12} {s.read_bytes['p90'] / 1e6:>14.1f} "
+            + f"{s.write_bytes['p90'] / 1e6:>15.1f}"
+        )
 
 
 @retrieval_command_group.command(
@@ -230,12 +327,109 @@ def run_geoms() -> None:
     src.geoms.main.run()
 
 
+@ifg_catalog_command_group.command(
+    name="update",
+    short_help="Update the Interferogram Catalog",
+    help="Add all interferograms under `config.general.data.interferograms.root` to the catalog at `data/ifg-catalog.sqlite`: their size, checksum, measurement time, instrument parameters and whether they are corrupt. Only the day directories that have changed since the last update are rescanned and only new or modified files are read, so this can be run regularly in the background (e.g. as a cron job).",
+)
+@click.option(
+    "--sensor-id",
+    "sensor_ids",
+    multiple=True,
+    help="Only update the interferograms of these sensors. Can be given multiple times. Defaults to all sensors.",
+)
+@click.option(
+    "--concurrency",
+    type=click.IntRange(min=1),
+    default=8,
+    show_default=True,
+    help="Number of files read in parallel.",
+)
+@click.option(
+    "--force",
+    is_flag=True,
+    default=False,
+    help="Check the files of all directories, also of the ones that have not changed since the last update. Needed when files have been modified in place.",
+)
+def update_ifg_catalog(
+    sensor_ids: tuple[str, ...],
+    concurrency: int,
+    force: bool,
+) -> None:
+    _check_config_validity()
+
+    import src  # import here so that the CLI is more reactive
+
+    config = src.types.Config.load()
+    progress = tqdm.tqdm(desc="scanning directories", unit="dir")
+
+    def _on_progress(done: int, total: int) -> None:
+        progress.total = total
+        progress.n = done
+        progress.refresh()
+
+    result = src.utils.ifg_catalog.InterferogramCatalog.update(
+        config.general.data.interferograms.root,
+        sensor_ids=None if len(sensor_ids) == 0 else list(sensor_ids),
+        concurrency=concurrency,
+        force=force,
+        on_progress=_on_progress,
+    )
+    progress.close()
+    click.echo(result.model_dump_json(indent=4))
+
+
+@ifg_catalog_command_group.command(
+    name="summary",
+    short_help="Print the Interferograms per Day",
+    help="Print the number of interferograms, the number of corrupt interferograms, their total size and the first and last measurement time of every day of a sensor in the interferogram catalog as JSON.",
+)
+@click.argument("sensor_id")
+@click.option(
+    "--from-date",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    default=None,
+    help="First date to include (YYYY-MM-DD).",
+)
+@click.option(
+    "--to-date",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    default=None,
+    help="Last date to include (YYYY-MM-DD).",
+)
+def print_ifg_catalog_summary(
+    sensor_id: str,
+    from_date: Optional[datetime.datetime],
+    to_date: Optional[datetime.datetime],
+) -> None:
+    # no config check because this does not require a config
+
+    import src
+
+    summaries = src.utils.ifg_catalog.InterferogramCatalog.get_day_summaries(
+        sensor_id,
+        from_date=None if from_date is None else from_date.date(),
+        to_date=None if to_date is None else to_date.date(),
+    )
+    click.echo(
+        pydantic.TypeAdapter(list[src.utils.ifg_catalog.DaySummary])
+        .dump_json(summaries, indent=4)
+        .decode()
+    )
+
+
 @cli.command(
     name="data-report",
     short_help="Export Data Report",
     help="exports a report of the data present on the configured system",
 )
-def print_data_report() -> None:
+@click.option(
+    "--use-ifg-catalog",
+    is_flag=True,
+    default=False,
+    help="Count the interferograms from the interferogram catalog instead of listing every directory, and include the number of corrupt interferograms. Run `ifg-catalog update` first.",
+)
+def print_data_report(use_ifg_catalog: bool) -> None:
     _check_config_validity()
 
     import rich.console
@@ -268,6 +462,7 @@ def print_data_report() -> None:
             config=config,
             em27_metadata_interface=em27_metadata_interface,
             console=console,
+            use_ifg_catalog=use_ifg_catalog,
         )
     except KeyboardInterrupt:
         console.print("Aborted by user")
@@ -277,6 +472,7 @@ cli.add_command(retrieval_command_group)
 cli.add_command(profiles_command_group)
 cli.add_command(bundle_command_group)
 cli.add_command(geoms_command_group)
+cli.add_command(ifg_catalog_command_group)
 
 if __name__ == "__main__":
     cli()
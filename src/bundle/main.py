@@ -2,6 +2,7 @@ import datetime
 import os
 import re
 import sys
+import time
 from typing import Optional
 
 import em27_metadata
@@ -25,6 +26,7 @@ def run(
 
     assert config.bundles is not None, "no bundle targets found"
     assert len(config.bundles) > 0, "no bundle targets found"
+    metrics = utils.metrics.MetricsRegistry.from_config(config, "bundle")
 
     if em27_metadata_interface is None:
         em27_metadata_interface = utils.metadata.load_local_em27_metadata_interface()
@@ -175,13 +177,51 @@ def run(
                         name += f"-{bundle_target.bundle_suffix}"
 
                     print(f"    Combined dataset has {len(combined_df)} rows")
+                    metric_labels = {
+                        "retrieval_algorithm": retrieval_algorithm,
+                        "atmospheric_profile_model": atmospheric_profile_model,
+                        "sensor_id": sensor_id,
+                    }
+                    metrics.inc(
+                        "em27_bundle_results_directories_total",
+                        "Results directories loaded into bundles.",
+                        len(timed_results),
+                        **metric_labels,
+                    )
+                    metrics.inc(
+                        "em27_bundle_rows_total",
+                        "Rows written to bundles.",
+                        len(combined_df),
+                        **metric_labels,
+                    )
 
                     if "csv" in bundle_target.output_formats:
                         path = os.path.join(bundle_target.dst_dir.root, name + ".csv")
                         combined_df.write_csv(path)
                         print(f"    Wrote CSV file to {path}")
+                        metrics.inc(
+                            "em27_bundle_written_bytes_total",
+                            "Bytes of the written bundle files.",
+                            os.path.getsize(path),
+                            output_format="csv",
+                        )
 
                     if "parquet" in bundle_target.output_formats:
                         path = os.path.join(bundle_target.dst_dir.root, name + ".parquet")
                         combined_df.write_parquet(path)
                         print(f"    Wrote Parquet file to {path}")
+                        metrics.inc(
+                            "em27_bundle_written_bytes_total",
+                            "Bytes of the written bundle files.",
+                            os.path.getsize(path),
+                            output_format="parquet",
+                        )
+
+                    metrics.write()
+
+    metrics.set(
+        "em27_bundle_last_run_timestamp_seconds",
+        "Unix timestamp of the end of the last bundle run.",
+        time.time(),
+    )
+    metrics.write()
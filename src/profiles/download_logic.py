@@ -2,7 +2,7 @@ import ftplib
 import io
 import os
 import tarfile
-from typing import BinaryIO
+from typing import BinaryIO, Optional
 
 import rich.progress
 
@@ -14,6 +14,7 @@ def download_data(
     queries: list[types.DownloadQuery],
     ftp: ftplib.FTP,
     atmospheric_profile_model: types.AtmosphericProfileModel,
+    metrics: Optional[utils.metrics.MetricsRegistry] = None,
 ) -> list[types.DownloadQuery]:
     """Downloads data from 'ccycle.gps.caltech.edu' and returns a list of
     queries that were fulfilled."""
@@ -68,6 +69,7 @@ def download_data(
                         lat=query.lat,
                         lon=query.lon,
                         atmospheric_profile_model=atmospheric_profile_model,
+                        metrics=metrics,
                     )
 
     return fulfilled_queries
@@ -79,8 +81,24 @@ def extract_archive(
     lat: float,
     lon: float,
     atmospheric_profile_model: types.AtmosphericProfileModel,
+    metrics: Optional[utils.metrics.MetricsRegistry] = None,
 ) -> None:
-    """Extracts, renames and stores archive members."""
+    """Extracts, renames and stores archive members. Counts the archive
+    and its extracted files in `metrics`."""
+
+    if metrics is not None:
+        metrics.inc(
+            "em27_profiles_downloaded_bytes_total",
+            "Bytes of the profile archives downloaded from the ccycle server.",
+            archive.seek(0, io.SEEK_END),
+            atmospheric_profile_model=atmospheric_profile_model,
+        )
+        metrics.inc(
+            "em27_profiles_downloaded_archives_total",
+            "Profile archives downloaded from the ccycle server.",
+            atmospheric_profile_model=atmospheric_profile_model,
+        )
+        archive.seek(0)
 
     dst_path = f"{config.general.data.atmospheric_profiles.root}/{atmospheric_profile_model}"
     with tarfile.open(fileobj=archive) as tar:
@@ -127,3 +145,9 @@ def extract_archive(
             member_dir = os.path.join(dst_path, date[:4], date[4:6])
             os.makedirs(member_dir, exist_ok=True)
             tar.extract(member, member_dir)
+            if metrics is not None:
+                metrics.inc(
+                    "em27_profiles_extracted_files_total",
+                    "Profile files (map, mod and vmr) extracted from the downloaded archives.",
+                    atmospheric_profile_model=atmospheric_profile_model,
+                )
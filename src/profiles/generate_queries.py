@@ -2,8 +2,6 @@ from __future__ import annotations
 
 import copy
 import datetime
-import os
-import re
 from typing import Optional
 
 import em27_metadata
@@ -36,72 +34,30 @@ def list_downloaded_data(
     assert config.profiles.scope is not None
     downloaded_data: dict[ProfilesQueryLocation, set[datetime.date]] = {}
 
-    profile_root_dir = os.path.join(
-        config.general.data.atmospheric_profiles.root, atmospheric_profile_model
-    )
-
-    r = re.compile(r"^\d{8,10}_\d{2}(N|S)\d{3}(E|W)\.(map|mod|vmr)$")
-    filenames: set[str] = set([f for f in os.listdir(profile_root_dir) if r.match(f)])
-
     # starting with 1.7.0, the default way of storing atmospheric profiles
     # is to store them in subdirectories by year and month. However, only newly
     # downloaded data will be stored in this way. Data in the old format can still
     # be used. There is a script to move all data from the previous paths to
-    # the new paths, but this should not be done automatically.
-    years = set([f"{y:04d}" for y in range(1950, 2500)]).union(set(os.listdir(profile_root_dir)))
-    for y in years:
-        for m in range(1, 13):
-            _d = os.path.join(profile_root_dir, y, f"{m:02d}")
-            if os.path.isdir(_d):
-                filenames.update([f for f in os.listdir(_d) if r.match(f)])
-
-    dates: set[datetime.date] = set(
-        [
-            d
-            for d in [
-                datetime.date(
-                    year=int(f[0:4]),
-                    month=int(f[4:6]),
-                    day=int(f[6:8]),
-                )
-                for f in filenames
-            ]
-            if ((config.profiles.scope.from_date <= d) and (d <= config.profiles.scope.to_date))
-        ]
-    )
-    locations: set[ProfilesQueryLocation] = set(
-        [
-            ProfilesQueryLocation(
-                lat=int(f.split("_")[1][0:2]) * (-1 if f.split("_")[1][2] == "S" else 1),
-                lon=int(f.split("_")[1][3:6]) * (-1 if f.split("_")[1][6] == "W" else 1),
-            )
-            for f in filenames
-        ]
+    # the new paths, but this should not be done automatically. The inventory
+    # considers both layouts.
+    profile_inventory = utils.profile_inventory.AtmosphericProfileInventory(
+        config.general.data.atmospheric_profiles.root, atmospheric_profile_model
     )
-
-    required_prefixes: list[str]
-    required_extensions: list[str]
-    if atmospheric_profile_model == "GGG2014":
-        required_prefixes = ["%Y%m%d"]
-        required_extensions = ["map", "mod"]
-    else:
-        required_prefixes = [f"%Y%m%d{h:02d}" for h in range(0, 24, 3)]
-        required_extensions = ["map", "mod", "vmr"]
-
-    for location in locations:
-        cs = utils.text.get_coordinates_slug(lat=location.lat, lon=location.lon)
-        for d in dates:
-            expected_filenames = set(
-                [
-                    f"{d.strftime(p)}_{cs}.{e}"
-                    for e in required_extensions
-                    for p in required_prefixes
-                ]
-            )
-            if expected_filenames.issubset(filenames):
-                if location not in downloaded_data.keys():
-                    downloaded_data[location] = set()
-                downloaded_data[location].add(d)
+    for cs, dates in profile_inventory.list_complete_days().items():
+        dates_in_scope = set(
+            [
+                d
+                for d in dates
+                if (config.profiles.scope.from_date <= d) and (d <= config.profiles.scope.to_date)
+            ]
+        )
+        if len(dates_in_scope) > 0:
+            downloaded_data[
+                ProfilesQueryLocation(
+                    lat=int(cs[0:2]) * (-1 if cs[2] == "S" else 1),
+                    lon=int(cs[3:6]) * (-1 if cs[6] == "W" else 1),
+                )
+            ] = dates_in_scope
 
     return downloaded_data
 
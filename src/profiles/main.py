@@ -1,16 +1,31 @@
 import ftplib
 import os
 import sys
+import time
 
 import tum_esm_utils
 
 sys.path.append(tum_esm_utils.files.rel_to_abs_path("../.."))
-from src import profiles, types
+from src import profiles, types, utils
+
+
+def _count_fulfilled_queries(
+    metrics: utils.metrics.MetricsRegistry,
+    atmospheric_profile_model: types.AtmosphericProfileModel,
+    query_count: int,
+) -> None:
+    metrics.inc(
+        "em27_profiles_fulfilled_queries_total",
+        "Profile queries whose data has been downloaded from the ccycle server.",
+        query_count,
+        atmospheric_profile_model=atmospheric_profile_model,
+    )
 
 
 def run() -> None:
     config = types.Config.load()
     assert config.profiles is not None, "No profiles config found"
+    metrics = utils.metrics.MetricsRegistry.from_config(config, "profiles")
 
     for variant in ["GGG2014", "GGG2020"]:
         os.makedirs(
@@ -27,7 +42,7 @@ def run() -> None:
                 timeout=60,
             ) as ftp:
                 print("Connected to FTP server")
-                profiles.std_site_logic.download_data(config, ftp)
+                profiles.std_site_logic.download_data(config, ftp, metrics=metrics)
         else:
             print("No standard site data to download")
 
@@ -52,9 +67,10 @@ def run() -> None:
                 if len(running_queries) > 0:
                     print(f"Trying to download {len(running_queries)} queries")
                     fulfilled_queries = profiles.download_logic.download_data(
-                        config, running_queries, ftp, profile_model
+                        config, running_queries, ftp, profile_model, metrics=metrics
                     )
                     print(f"Successfully downloaded {len(fulfilled_queries)} queries")
+                    _count_fulfilled_queries(metrics, profile_model, len(fulfilled_queries))
                     cache.remove_queries(profile_model, fulfilled_queries)
 
                     timed_out_queries = cache.get_timed_out_queries(profile_model)
@@ -100,8 +116,9 @@ def run() -> None:
                 # downloadable from the server
                 print(f"Trying to download {len(outstanding_download_queries)} queries")
                 fulfilled_queries = profiles.download_logic.download_data(
-                    config, outstanding_download_queries, ftp, profile_model
+                    config, outstanding_download_queries, ftp, profile_model, metrics=metrics
                 )
+                _count_fulfilled_queries(metrics, profile_model, len(fulfilled_queries))
                 outstanding_download_queries = sorted(
                     set(outstanding_download_queries).difference(set(fulfilled_queries)),
                     key=lambda q: q.from_date,
@@ -123,6 +140,12 @@ def run() -> None:
                 profiles.upload_logic.upload_requests(
                     config, new_download_queries[:query_count], ftp, profile_model
                 )
+                metrics.inc(
+                    "em27_profiles_requested_queries_total",
+                    "Profile queries requested from the ccycle server.",
+                    query_count,
+                    atmospheric_profile_model=profile_model,
+                )
                 print(
                     "Done. Run this script again (after waiting "
                     + "a bit to download the reqested data)."
@@ -130,6 +153,13 @@ def run() -> None:
     except KeyboardInterrupt:
         print("Interrupted by user.")
         exit(1)
+    finally:
+        metrics.set(
+            "em27_profiles_last_run_timestamp_seconds",
+            "Unix timestamp of the end of the last profiles download.",
+            time.time(),
+        )
+        metrics.write()
 
 
 if __name__ == "__main__":
@@ -1,8 +1,7 @@
 import datetime
 import ftplib
 import io
-import os
-import re
+from typing import Optional
 
 import rich.progress
 import tum_esm_utils
@@ -31,52 +30,18 @@ def list_downloaded_data(
     std_site_config: types.config.ProfilesGGG2020StandardSitesItemConfig,
 ) -> set[datetime.date]:
     assert config.profiles is not None
-    downloaded_data: set[datetime.date] = set()
-
     cs = utils.text.get_coordinates_slug(lat=std_site_config.lat, lon=std_site_config.lon)
-    r = re.compile(r"^\d{8,10}_" + cs + r"\.(map|mod|vmr)$")
-    profile_root_dir = os.path.join(config.general.data.atmospheric_profiles.root, "GGG2020")
-    filenames: set[str] = set(
-        [
-            f
-            for f in os.listdir(
-                profile_root_dir
-            )
-            if r.match(f)
-        ]
+    profile_inventory = utils.profile_inventory.AtmosphericProfileInventory(
+        config.general.data.atmospheric_profiles.root, "GGG2020"
     )
-    years = set([f"{y:04d}" for y in range(1950, 2500)]).union(set(os.listdir(profile_root_dir)))
-    for y in years:
-        for m in range(1, 13):
-            _d = os.path.join(profile_root_dir, y, f"{m:02d}")
-            if os.path.isdir(_d):
-                filenames.update([f for f in os.listdir(_d) if r.match(f)])
-    
-    dates: set[datetime.date] = set(
+    downloaded_data: set[datetime.date] = set(
         [
             d
-            for d in [
-                datetime.date(
-                    year=int(f[0:4]),
-                    month=int(f[4:6]),
-                    day=int(f[6:8]),
-                )
-                for f in filenames
-            ]
+            for d in profile_inventory.list_complete_days().get(cs, set())
             if ((std_site_config.from_date <= d) and (d <= std_site_config.to_date))
         ]
     )
 
-    required_prefixes = [f"%Y%m%d{h:02d}" for h in range(0, 24, 3)]
-    required_extensions = ["map", "mod", "vmr"]
-
-    for d in dates:
-        expected_filenames = set(
-            [f"{d.strftime(p)}_{cs}.{e}" for e in required_extensions for p in required_prefixes]
-        )
-        if expected_filenames.issubset(filenames):
-            downloaded_data.add(d)
-
     return downloaded_data
 
 
@@ -90,6 +55,7 @@ def compute_missing_data(
 def download_data(
     config: types.Config,
     ftp: ftplib.FTP,
+    metrics: Optional[utils.metrics.MetricsRegistry] = None,
 ) -> None:
     assert config.profiles is not None
     with rich.progress.Progress() as progress:
@@ -140,6 +106,7 @@ def download_data(
                                 lat=std_site_config.lat,
                                 lon=std_site_config.lon,
                                 atmospheric_profile_model="GGG2020",
+                                metrics=metrics,
                             )
                     except StopIteration:
                         progress.print("No tarball")
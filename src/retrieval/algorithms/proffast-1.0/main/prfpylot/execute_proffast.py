@@ -4,7 +4,34 @@ from typing import Callable
 
 import tum_esm_utils
 
-from src import types
+from src import retrieval, types
+
+
+def _run_shell_command(
+    session: types.RetrievalSession,
+    command: str,
+    executable_name: str,
+    working_directory: str,
+) -> None:
+    """Like `tum_esm_utils.shell.run_shell_command`, but appends the resource
+    usage of the executable to the usage file of the session."""
+
+    stdout, stderr, usage = retrieval.utils.process_accounting.run_accounted(
+        command,
+        executable_name=executable_name,
+        shell=True,
+        cwd=working_directory,
+        env=os.environ.copy(),
+        executable="/bin/bash",
+    )
+    retrieval.utils.process_accounting.append_executable_usage(
+        session.ctn.executable_usage_path, usage
+    )
+    if usage.return_code != 0:
+        raise tum_esm_utils.shell.CommandLineException(
+            f"command '{command}' failed with exit code {usage.return_code}",
+            details=f"\nstderr:\n{stderr.strip()}\nstout:\n{stdout.strip()}",
+        )
 
 
 def execute_preprocess(
@@ -16,8 +43,10 @@ def execute_preprocess(
     start_timestamp = datetime.datetime.now(tz=datetime.timezone.utc).timestamp()
 
     # running preprocess
-    tum_esm_utils.shell.run_shell_command(
+    _run_shell_command(
+        session,
         f"./preprocess4 > {logs_dir}/preprocess4.log",
+        executable_name="preprocess4",
         working_directory=os.path.join(prf_dir, "preprocess"),
     )
 
@@ -35,8 +64,10 @@ def execute_pcxs(
     start_timestamp = datetime.datetime.now(tz=datetime.timezone.utc).timestamp()
 
     # running pcxs10
-    tum_esm_utils.shell.run_shell_command(
+    _run_shell_command(
+        session,
         f"./pcxs10 pcxs10.inp > {logs_dir}/pcxs10.log",
+        executable_name="pcxs10",
         working_directory=prf_dir,
     )
 
@@ -67,8 +98,10 @@ def execute_invers(
     start_timestamp = datetime.datetime.now(tz=datetime.timezone.utc).timestamp()
 
     # running invers10
-    tum_esm_utils.shell.run_shell_command(
+    _run_shell_command(
+        session,
         'printf "Y\n%.0s" {1..100} | ./invers10 invers10.inp' + f" > {logs_dir}/invers10.log",
+        executable_name="invers10",
         working_directory=prf_dir,
     )
 
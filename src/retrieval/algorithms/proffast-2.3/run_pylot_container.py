@@ -4,21 +4,56 @@ Script to run a particular Pylot instance
 
 example:
 
-./run.py container_dir container_id config_path
+./run.py container_dir container_id config_path [options]
+
+options is a JSON object with the following optional keys:
+
+n_processes: the number of processes the Pylot may use for the
+    preprocessing, pcxs and invers stages (default: 1)
+invers_shards: the number of time-contiguous shards the spectra of a
+    day may be split into for the invers stage (default: 1)
+preprocess_slices: the number of slices the interferograms of a day may
+    be split into for the preprocessing stage (default: 1)
+abscos_cache_dir: the directory of the cache for the pcxs outputs
+    (default: no cache)
+abscos_cache_max_size_gb: the size budget of this cache (default: 50)
+spectra_cache_dir: the directory of the cache for the preprocessed
+    spectra (default: no cache)
+spectra_cache_max_size_gb: the size budget of this cache (default: 50)
+timings_path: the JSON file to write the timings of the preprocess, pcxs,
+    invers and combine stages to (default: no timings)
+executable_usage_path: the JSON lines file to append the resource usage
+    of every preprocess, pcxs and invers call to (default: no accounting)
 """
 
-import importlib
+import json
 import os
 import sys
+from typing import Any, Optional
+
+_PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", ".."))
 
 
 if __name__ == "__main__":
-    assert len(sys.argv) == 4, (
+    assert len(sys.argv) in [4, 5], (
         "wrong number of arguments provided to run.py. Example"
-        + ' call: "./run.py container_dir container_id pylot_config_path"'
+        + ' call: "./run.py container_dir container_id pylot_config_path [options]"'
     )
 
-    container_dir, container_id, pylot_config_path = sys.argv[1:]
+    container_dir, container_id, pylot_config_path = sys.argv[1:4]
+    options: dict[str, Any] = json.loads(sys.argv[4]) if len(sys.argv) == 5 else {}
+    n_processes = int(options.get("n_processes", 1))
+    invers_shards = int(options.get("invers_shards", 1))
+    preprocess_slices = int(options.get("preprocess_slices", 1))
+    abscos_cache_dir: Optional[str] = options.get("abscos_cache_dir")
+    abscos_cache_max_size_gb = float(options.get("abscos_cache_max_size_gb") or 50)
+    spectra_cache_dir: Optional[str] = options.get("spectra_cache_dir")
+    spectra_cache_max_size_gb = float(options.get("spectra_cache_max_size_gb") or 50)
+    timings_path: Optional[str] = options.get("timings_path")
+    executable_usage_path: Optional[str] = options.get("executable_usage_path")
+    assert n_processes >= 1, "n_processes must be at least 1"
+    assert invers_shards >= 1, "invers_shards must be at least 1"
+    assert preprocess_slices >= 1, "preprocess_slices must be at least 1"
     container_path = os.path.join(
         container_dir,
         f"retrieval-container-{container_id}",
@@ -28,8 +63,26 @@ if __name__ == "__main__":
     print(
         f'executing in container_id "{container_id}" '
         + f'at container_path "{container_path}" and '
-        + f'pylot_config_path "{pylot_config_path}".'
+        + f'pylot_config_path "{pylot_config_path}" '
+        + f"with {n_processes} process(es), {invers_shards} invers shard(s) "
+        + f"and {preprocess_slices} preprocess slice(s)"
+        + ("" if abscos_cache_dir is None else f', using the abscos cache "{abscos_cache_dir}"')
+        + ("" if spectra_cache_dir is None else f', using the spectra cache "{spectra_cache_dir}"')
+        + "."
     )
     sys.path.append(container_path)
-    pylot = importlib.import_module("prfpylot.pylot")
-    pylot.Pylot(pylot_config_path, logginglevel="debug").run(n_processes=1)
+    sys.path.append(_PROJECT_DIR)
+    from src.retrieval.utils.sharded_pylot import ShardedPylot
+
+    ShardedPylot(
+        pylot_config_path,
+        logginglevel="debug",
+        invers_shard_count=invers_shards,
+        preprocess_slice_count=preprocess_slices,
+        abscos_cache_dir=abscos_cache_dir,
+        abscos_cache_max_size_gb=abscos_cache_max_size_gb,
+        spectra_cache_dir=spectra_cache_dir,
+        spectra_cache_max_size_gb=spectra_cache_max_size_gb,
+        timings_path=timings_path,
+        executable_usage_path=executable_usage_path,
+    ).run(n_processes=n_processes)
@@ -1,2 +1,6 @@
+from . import concurrency_controller as concurrency_controller
 from . import container_factory as container_factory
+from . import data_inventory as data_inventory
+from . import job_leases as job_leases
+from . import metrics_exporter as metrics_exporter
 from . import retrieval_queue as retrieval_queue
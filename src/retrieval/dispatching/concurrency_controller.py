@@ -0,0 +1,207 @@
+import multiprocessing.context
+import os
+import time
+from typing import Optional
+
+import psutil
+
+from src import retrieval, types
+
+
+def _get_process_tree_rss(pid: Optional[int]) -> int:
+    """Resident memory of a process and all its child processes in bytes."""
+
+    if pid is None:
+        return 0
+    try:
+        process = psutil.Process(pid)
+        rss: int = process.memory_info().rss
+        for child in process.children(recursive=True):
+            try:
+                rss += child.memory_info().rss
+            except psutil.NoSuchProcess:
+                pass
+        return rss
+    except psutil.NoSuchProcess:
+        return 0
+
+
+class ConcurrencyController:
+    """Decides whether the dispatch loop may start another retrieval session.
+
+    Without `config.retrieval.general.adaptive_process_count`, up to
+    `max_process_count` sessions run at once. In adaptive mode, the number
+    of sessions lies between `min_process_count` and `max_process_count`:
+    above the minimum, a new session is only started if the available
+    memory minus the memory a session needs stays above
+    `min_available_memory_gb` and if the load average per CPU core is
+    below `max_load_per_core`.
+
+    The memory a session needs is the largest resident memory of any
+    finished session (`session_memory_gb` before the first one finished).
+    Running sessions that are still below this estimate have not allocated
+    their memory yet, so the difference is reserved for them as well.
+    Likewise, sessions started within the last minute are not reflected in
+    the 1-minute load average yet and count as one unit of load each.
+    Otherwise, all sessions would be started at once at startup.
+    Under memory or CPU pressure, no new sessions are started until the
+    running sessions have finished and the pressure is gone.
+
+    With `max_processes_per_session > 1`, a session may use several
+    processes when there are more free process slots than queued jobs (see
+    `get_process_budget`), but never more than `max_invers_shards` or
+    `max_preprocess_slices` - more processes would sit idle. Such a session
+    counts as that many processes towards `max_process_count`."""
+
+    def __init__(
+        self,
+        config: types.Config,
+        logger: "retrieval.utils.logger.Logger",
+    ) -> None:
+        assert config.retrieval is not None
+        self.max_process_count = config.retrieval.general.max_process_count
+        # only sharded invers calls and sliced preprocess calls run in
+        # parallel within a session, every other call covers the whole day
+        self.max_processes_per_session = min(
+            config.retrieval.general.max_processes_per_session,
+            max(
+                config.retrieval.general.max_invers_shards,
+                config.retrieval.general.max_preprocess_slices,
+            ),
+        )
+        self.adaptive_config = config.retrieval.general.adaptive_process_count
+        self.logger = logger
+        self.cpu_count = os.cpu_count() or 1
+
+        # process name -> largest resident memory of a running session (including
+        # its child processes) and the time at which the session was first seen
+        self.session_peak_rss: dict[str, int] = {}
+        self.session_start_times: dict[str, float] = {}
+
+        # largest resident memory of any finished session
+        self.peak_session_rss: Optional[int] = None
+        self.last_decision_reason: Optional[str] = None
+
+        # process name -> number of processes the session may use
+        self.process_budgets: dict[str, int] = {}
+
+    @property
+    def poll_interval(self) -> Optional[float]:
+        """How often the dispatch loop should re-evaluate `may_start_process`
+        while no session finishes. `None` means only when a session finishes."""
+
+        return None if self.adaptive_config is None else 30
+
+    def _log_decision(self, reason: Optional[str]) -> None:
+        # only log changes so that the log is not flooded while waiting
+        if reason != self.last_decision_reason:
+            if reason is None:
+                self.logger.info("Enough headroom to start new sessions again")
+            else:
+                self.logger.info(f"Not starting new sessions: {reason}")
+            self.last_decision_reason = reason
+
+    def _used_process_slots(self, processes: list[multiprocessing.context.SpawnProcess]) -> int:
+        self.process_budgets = {
+            p.name: self.process_budgets[p.name]
+            for p in processes
+            if p.name in self.process_budgets
+        }
+        return sum(self.process_budgets.get(p.name, 1) for p in processes)
+
+    def get_process_budget(
+        self,
+        processes: list[multiprocessing.context.SpawnProcess],
+        queued_job_count: int,
+    ) -> int:
+        """Number of processes the next session may use. The free process
+        slots are split between the next session and the `queued_job_count`
+        jobs still waiting in the queue, so a session only gets more than one
+        process when the queue is running dry. In adaptive mode, the slots
+        are also limited by the number of idle CPU cores."""
+
+        if self.max_processes_per_session == 1:
+            return 1
+        free_slots = self.max_process_count - self._used_process_slots(processes)
+        if self.adaptive_config is not None:
+            idle_cores = int(
+                self.cpu_count * self.adaptive_config.max_load_per_core - os.getloadavg()[0]
+            )
+            free_slots = min(free_slots, idle_cores)
+        return max(1, min(self.max_processes_per_session, free_slots // (queued_job_count + 1)))
+
+    def set_process_budget(self, process_name: str, process_budget: int) -> None:
+        self.process_budgets[process_name] = process_budget
+
+    @property
+    def estimated_session_memory_gb(self) -> float:
+        assert self.adaptive_config is not None
+        if self.peak_session_rss is None:
+            return self.adaptive_config.session_memory_gb
+        return self.peak_session_rss / 1e9
+
+    def _update_session_memory(
+        self,
+        processes: list[multiprocessing.context.SpawnProcess],
+    ) -> list[int]:
+        """Measure the running sessions and move the peak memory of finished
+        sessions into `peak_session_rss`. Returns the current resident memory
+        of every running session."""
+
+        running_names = set(p.name for p in processes)
+        for name in list(self.session_peak_rss.keys()):
+            if name not in running_names:
+                self.peak_session_rss = max(
+                    self.peak_session_rss or 0, self.session_peak_rss.pop(name)
+                )
+                self.session_start_times.pop(name, None)
+
+        current_session_rss: list[int] = []
+        for p in processes:
+            rss = _get_process_tree_rss(p.pid)
+            self.session_peak_rss[p.name] = max(self.session_peak_rss.get(p.name, 0), rss)
+            self.session_start_times.setdefault(p.name, time.time())
+            current_session_rss.append(rss)
+        return current_session_rss
+
+    def may_start_process(
+        self,
+        processes: list[multiprocessing.context.SpawnProcess],
+    ) -> bool:
+        used_process_slots = self._used_process_slots(processes)
+        if used_process_slots >= self.max_process_count:
+            return False
+        if self.adaptive_config is None:
+            return True
+
+        current_session_rss = self._update_session_memory(processes)
+        if used_process_slots < self.adaptive_config.min_process_count:
+            return True
+
+        reason: Optional[str] = None
+        available_memory_gb = psutil.virtual_memory().available / 1e9
+        session_memory_gb = self.estimated_session_memory_gb
+        unallocated_memory_gb = sum(
+            max(0, session_memory_gb - rss / 1e9) for rss in current_session_rss
+        )
+        required_memory_gb = (
+            session_memory_gb + unallocated_memory_gb + self.adaptive_config.min_available_memory_gb
+        )
+        recently_started_sessions = sum(
+            1 for t in self.session_start_times.values() if time.time() - t < 60
+        )
+        load_per_core = (os.getloadavg()[0] + recently_started_sessions) / self.cpu_count
+        if available_memory_gb < required_memory_gb:
+            reason = (
+                f"available memory is {available_memory_gb:.1f} GB, "
+                + f"a new session would need {required_memory_gb:.1f} GB "
+                + f"({len(processes)} sessions running)"
+            )
+        elif load_per_core > self.adaptive_config.max_load_per_core:
+            reason = (
+                f"load average per core is {load_per_core:.2f} "
+                + f"({len(processes)} sessions running)"
+            )
+
+        self._log_decision(reason)
+        return reason is None
@@ -1,6 +1,12 @@
+import concurrent.futures
+import errno
+import fcntl
+import hashlib
 import os
 import shutil
-from typing import Callable, Literal
+import threading
+import uuid
+from typing import Callable, Literal, Optional
 
 import tum_esm_utils
 
@@ -8,6 +14,164 @@ from src import retrieval, types
 
 _RETRIEVAL_CODE_DIR = tum_esm_utils.files.rel_to_abs_path("../algorithms")
 
+# ioctl request to create a copy-on-write clone of a file (Linux)
+_FICLONE = 0x40049409
+
+# directories of the Proffast code that the sessions write into - all
+# other files in `prf/` except for the `.inp` files are never modified
+_PROFFAST_WORKING_DIRS = ["inp_fast", "out_fast", "wrk_fast", "analysis"]
+
+
+def _is_immutable_code_file(relative_path: str) -> bool:
+    """The compiled executables and the reference data of Proffast. The
+    Pylot code, its templates and all input files are rewritten by the
+    sessions (e.g. by `update_templates`)."""
+
+    parts = relative_path.split(os.sep)
+    return (
+        (len(parts) > 2)
+        and (parts[0] == "prf")
+        and (parts[1] not in _PROFFAST_WORKING_DIRS)
+        and (not relative_path.endswith(".inp"))
+    )
+
+
+def provision_code_tree(src_dir: str, dst_dir: str) -> None:
+    """Copy the retrieval code from `src_dir` to `dst_dir` without copying
+    the file contents where possible: files are reflinked (copy-on-write)
+    if the file system supports it, immutable files are hardlinked and
+    only the remaining files are copied."""
+
+    reflinks_supported = True
+
+    def _provision_file(src: str, dst: str) -> None:
+        nonlocal reflinks_supported
+        if reflinks_supported:
+            try:
+                with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                    fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+                shutil.copymode(src, dst)
+                return
+            except OSError as e:
+                if os.path.exists(dst):
+                    os.remove(dst)
+                if e.errno in [errno.EOPNOTSUPP, errno.EXDEV, errno.EINVAL, errno.ENOTTY]:
+                    reflinks_supported = False
+        if _is_immutable_code_file(os.path.relpath(src, src_dir)):
+            try:
+                os.link(src, dst)
+                return
+            except OSError:
+                pass
+        shutil.copy2(src, dst)
+
+    shutil.copytree(src_dir, dst_dir, copy_function=_provision_file)
+
+
+def _get_compilation_key(root_dir: str, fast_compilation: bool) -> str:
+    """Hash of everything the compiled executables depend on: the install
+    script, all Fortran sources, the compilation flag and the compiler."""
+
+    hasher = hashlib.sha256()
+    for dirpath, dirnames, filenames in os.walk(root_dir):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if (filename == "install.sh") or filename.lower().endswith(".f90"):
+                path = os.path.join(dirpath, filename)
+                digest = retrieval.utils.file_cache.get_file_digest(path)
+                hasher.update(f"{os.path.relpath(path, root_dir)} {digest}\n".encode())
+    hasher.update(("-O0" if fast_compilation else "-O3").encode())
+    if shutil.which("gfortran") is not None:
+        hasher.update(tum_esm_utils.shell.run_shell_command("gfortran --version").encode())
+    return hasher.hexdigest()
+
+
+def download_code_archive(
+    base_url: str,
+    zipfile_name: str,
+    root_dir: str,
+    binary_cache_dir: Optional[str] = None,
+) -> None:
+    """Download the code archive into `root_dir`. With a `binary_cache_dir`,
+    the archive is copied from `<binary_cache_dir>/archives` if another node
+    has downloaded it already."""
+
+    cached_archive_path = (
+        None
+        if binary_cache_dir is None
+        else os.path.join(binary_cache_dir, "archives", zipfile_name)
+    )
+    if (cached_archive_path is not None) and os.path.isfile(cached_archive_path):
+        shutil.copyfile(cached_archive_path, os.path.join(root_dir, zipfile_name))
+        return
+
+    tum_esm_utils.shell.run_shell_command(
+        command=f"wget --quiet {base_url}/{zipfile_name}",
+        working_directory=root_dir,
+    )
+    if cached_archive_path is not None:
+        tmp_path = cached_archive_path + f".tmp-{uuid.uuid4().hex}"
+        try:
+            os.makedirs(os.path.dirname(cached_archive_path), exist_ok=True)
+            shutil.copyfile(os.path.join(root_dir, zipfile_name), tmp_path)
+            os.rename(tmp_path, cached_archive_path)
+        except OSError:
+            # the binary cache may be shared read-only
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+def compile_code(
+    root_dir: str,
+    executables: list[str],
+    _print: Callable[[str], None],
+    fast_compilation: bool = False,
+    binary_cache_dir: Optional[str] = None,
+) -> None:
+    """Run the `install.sh` in `root_dir`, which compiles the `executables`
+    (paths relative to `root_dir`).
+
+    With a `binary_cache_dir`, the executables are copied from there if
+    they have been compiled from the same sources with the same flags and
+    compiler before, and they are added to it otherwise. The cache entries
+    are immutable, so the directory can be shared between nodes, and nodes
+    that can only read it still use the existing entries."""
+
+    cache_entry_path: Optional[str] = None
+    if binary_cache_dir is not None:
+        key = _get_compilation_key(root_dir, fast_compilation)
+        cache_entry_path = os.path.join(binary_cache_dir, key)
+        if all(
+            os.path.isfile(os.path.join(cache_entry_path, os.path.basename(e))) for e in executables
+        ):
+            _print(f"Copying the executables from the binary cache ({key[:12]})")
+            for e in executables:
+                # replaced instead of overwritten, the old executables might
+                # still be hardlinked into containers
+                tmp_path = os.path.join(root_dir, e) + ".tmp"
+                shutil.copy2(os.path.join(cache_entry_path, os.path.basename(e)), tmp_path)
+                os.replace(tmp_path, os.path.join(root_dir, e))
+            return
+
+    _print("Compiling")
+    tum_esm_utils.shell.run_shell_command(
+        command="./install.sh -O0" if fast_compilation else "./install.sh",
+        working_directory=root_dir,
+    )
+
+    if cache_entry_path is not None:
+        _print("Adding the executables to the binary cache")
+        tmp_path = f"{cache_entry_path}.tmp-{uuid.uuid4().hex}"
+        try:
+            os.mkdir(tmp_path)
+            for e in executables:
+                shutil.copy2(os.path.join(root_dir, e), tmp_path)
+            os.rename(tmp_path, cache_entry_path)
+        except OSError:
+            # the binary cache may be shared read-only or another
+            # node has added the same entry in the meantime
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
 
 class ContainerFactory:
     """Factory for creating pylot containers.
@@ -17,7 +181,13 @@ class ContainerFactory:
     have a unique id and is initialized with empty input and output
     directories.
 
-    The factory keeps track of all containers and can remove them."""
+    The factory keeps track of all containers and can remove them.
+    Containers can be removed in a background thread so that the
+    dispatch loop does not have to wait for the file deletion.
+
+    With `container_pool_size` > 0, the factory keeps that many containers
+    per retrieval algorithm ready. `create_container` hands out one of them
+    and provisions a replacement in a background thread."""
 
     def __init__(
         self,
@@ -43,8 +213,26 @@ class ContainerFactory:
         self.containers: list[types.RetrievalContainer] = []
         self.label_generator = tum_esm_utils.text.RandomLabelGenerator()
 
+        # the container list and the label generator are shared with
+        # the background thread that removes finished containers
+        self.lock = threading.Lock()
+        self.teardown_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="container-teardown"
+        )
+        self.pending_teardowns: list[concurrent.futures.Future[None]] = []
+
+        # pre-warmed containers per retrieval algorithm
+        self.pool_size = config.retrieval.general.container_pool_size
+        self.warm_containers: dict[str, list[types.RetrievalContainer]] = {}
+        self.provisioning_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="container-provisioning"
+        )
+        self.pending_provisionings: list[concurrent.futures.Future[None]] = []
+
         assert self.config.retrieval is not None
-        retrieval_algorithms = [job.retrieval_algorithm for job in self.config.retrieval.jobs]
+        retrieval_algorithms: list[types.RetrievalAlgorithm] = [
+            job.retrieval_algorithm for job in self.config.retrieval.jobs
+        ]
 
         if mode != "normal":
             self.logger.info(
@@ -59,6 +247,7 @@ class ContainerFactory:
         self.remove_all_containers(include_unknown=True)
         self.logger.info("All old containers have been removed")
 
+        binary_cache_dir = config.retrieval.general.binary_cache_dir
         for algorithm, initializer in [
             ("proffast-1.0", ContainerFactory.init_proffast10_code),
             ("proffast-2.2", ContainerFactory.init_proffast22_code),
@@ -68,23 +257,53 @@ class ContainerFactory:
         ]:
             if (algorithm in retrieval_algorithms) or (mode != "normal"):
                 self.logger.info(f"Initializing {algorithm} ContainerFactory")
-                initializer(self.logger.info, fast_compilation=(mode == "ci-tests"))
+                initializer(
+                    self.logger.info,
+                    fast_compilation=(mode == "ci-tests"),
+                    binary_cache_dir=(None if binary_cache_dir is None else binary_cache_dir.root),
+                )
             else:
                 self.logger.info(f"Not initializing {algorithm} ContainerFactory (unused)")
 
+        if self.pool_size > 0:
+            for algorithm in dict.fromkeys(retrieval_algorithms):
+                self.warm_containers[algorithm] = []
+                for _ in range(self.pool_size):
+                    self._provision_in_background(algorithm)
+            self.logger.info(f"Pre-warming {self.pool_size} container(s) per retrieval algorithm")
+
         self.logger.info("ContainerFactory is set up")
 
     def create_container(
         self,
         retrieval_algorithm: types.RetrievalAlgorithm,
+    ) -> types.RetrievalContainer:
+        """Return a pre-warmed container if one is ready, otherwise create
+        a new one. In both cases, the pool is refilled in the background."""
+
+        container: Optional[types.RetrievalContainer] = None
+        with self.lock:
+            warm_containers = self.warm_containers.get(retrieval_algorithm, [])
+            if len(warm_containers) > 0:
+                container = warm_containers.pop(0)
+        if retrieval_algorithm in self.warm_containers:
+            self._provision_in_background(retrieval_algorithm)
+        if container is not None:
+            return container
+        return self._provision_container(retrieval_algorithm)
+
+    def _provision_container(
+        self,
+        retrieval_algorithm: types.RetrievalAlgorithm,
     ) -> types.RetrievalContainer:
         """Create a new container and return it.
 
-        The container is created by copying the pylot code from the main
-        directory and compiling the fortran code. The container is then
-        initialized with empty input and output directories."""
+        The container is created by provisioning the pylot code and the
+        compiled fortran code from the main directory. The container is
+        then initialized with empty input and output directories."""
 
-        new_container_id = self.label_generator.generate()
+        with self.lock:
+            new_container_id = self.label_generator.generate()
         container: types.RetrievalContainer
 
         assert self.config.retrieval is not None
@@ -115,9 +334,9 @@ class ContainerFactory:
                     container_id=new_container_id,
                 )
 
-        # copy and install the retrieval code into the container
+        # provision the retrieval code into the container
         retrieval_code_root_dir = os.path.join(_RETRIEVAL_CODE_DIR, retrieval_algorithm)
-        shutil.copytree(
+        provision_code_tree(
             os.path.join(retrieval_code_root_dir, "main"),
             container.container_path,
         )
@@ -132,10 +351,29 @@ class ContainerFactory:
         os.mkdir(container.data_output_path)
 
         # bundle container paths together
-        self.containers.append(container)
+        with self.lock:
+            self.containers.append(container)
 
         return container
 
+    def _provision_in_background(self, retrieval_algorithm: types.RetrievalAlgorithm) -> None:
+        """Add a new container to the pool in a background thread. Errors
+        are logged but not raised - `create_container` falls back to
+        creating containers on demand."""
+
+        def _provision() -> None:
+            try:
+                container = self._provision_container(retrieval_algorithm)
+                with self.lock:
+                    self.warm_containers[retrieval_algorithm].append(container)
+            except Exception as e:
+                self.logger.exception(
+                    e, label=f"Pre-warming a {retrieval_algorithm} container failed"
+                )
+
+        self.pending_provisionings = [f for f in self.pending_provisionings if not f.done()]
+        self.pending_provisionings.append(self.provisioning_executor.submit(_provision))
+
     def remove_container(self, container_id: str) -> None:
         """Remove a container by its id.
 
@@ -143,31 +381,69 @@ class ContainerFactory:
         of the container. It raises an IndexError if no container with
         the given id exists.
         """
-        try:
-            container = [c for c in self.containers if c.container_id == container_id][0]
-            shutil.rmtree(container.container_path)
-            shutil.rmtree(container.data_input_path)
-            shutil.rmtree(container.data_output_path)
+        with self.lock:
+            try:
+                container = [c for c in self.containers if c.container_id == container_id][0]
+            except IndexError:
+                raise ValueError(f'no container with id "{container_id}"')
+
+        shutil.rmtree(container.container_path)
+        shutil.rmtree(container.data_input_path)
+        shutil.rmtree(container.data_output_path)
+
+        # only free the label after the directories are gone so that
+        # a new container cannot be created at the same path
+        with self.lock:
             self.containers.remove(container)
             self.label_generator.free(container_id)
-        except IndexError:
-            raise ValueError(f'no container with id "{container_id}"')
+
+    def remove_container_in_background(self, container_id: str) -> None:
+        """Remove a container by its id in a background thread.
+
+        Errors during the removal are logged but not raised. Use
+        `wait_for_background_removals` to wait for all pending removals."""
+
+        def _remove() -> None:
+            try:
+                self.remove_container(container_id)
+                self.logger.debug(f'Container "{container_id}": removed in background')
+            except Exception as e:
+                self.logger.exception(e, label=f'Container "{container_id}": removal failed')
+
+        self.pending_teardowns = [f for f in self.pending_teardowns if not f.done()]
+        self.pending_teardowns.append(self.teardown_executor.submit(_remove))
+
+    def wait_for_background_removals(self) -> None:
+        """Block until all containers scheduled for removal are removed."""
+
+        concurrent.futures.wait(self.pending_teardowns)
+        self.pending_teardowns = []
 
     def remove_all_containers(self, include_unknown: bool = False) -> None:
-        """Remove all containers."""
-        if include_unknown:
-            for d in os.listdir(self.container_dir):
-                subdir = os.path.join(self.container_dir, d)
-                if os.path.isdir(subdir):
-                    shutil.rmtree(subdir)
-        else:
-            for container in self.containers:
-                shutil.rmtree(container.container_path)
-        self.containers = []
-        self.label_generator = tum_esm_utils.text.RandomLabelGenerator()
+        """Remove all containers, including the pre-warmed ones."""
+        concurrent.futures.wait(self.pending_provisionings)
+        self.pending_provisionings = []
+        self.wait_for_background_removals()
+        with self.lock:
+            for warm_containers in self.warm_containers.values():
+                warm_containers.clear()
+            if include_unknown:
+                for d in os.listdir(self.container_dir):
+                    subdir = os.path.join(self.container_dir, d)
+                    if os.path.isdir(subdir):
+                        shutil.rmtree(subdir)
+            else:
+                for container in self.containers:
+                    shutil.rmtree(container.container_path)
+            self.containers = []
+            self.label_generator = tum_esm_utils.text.RandomLabelGenerator()
 
     @staticmethod
-    def init_proffast10_code(_print: Callable[[str], None], fast_compilation: bool = False) -> None:
+    def init_proffast10_code(
+        _print: Callable[[str], None],
+        fast_compilation: bool = False,
+        binary_cache_dir: Optional[str] = None,
+    ) -> None:
         """Initialize the Proffast 1.0 code"""
 
         KIT_BASE_URL = "https://www.coccon.kit.edu/downloads/Coccon-SW/"
@@ -185,10 +461,7 @@ class ContainerFactory:
                 shutil.rmtree(os.path.join(ROOT_DIR, "2021-03-08_prf96-EM27-fast"))
 
             _print("Downloading")
-            tum_esm_utils.shell.run_shell_command(
-                command=f"wget --quiet {KIT_BASE_URL}/{ZIPFILE_NAME}",
-                working_directory=ROOT_DIR,
-            )
+            download_code_archive(KIT_BASE_URL, ZIPFILE_NAME, ROOT_DIR, binary_cache_dir)
 
             _print("Unzipping")
             tum_esm_utils.shell.run_shell_command(
@@ -229,16 +502,26 @@ class ContainerFactory:
             os.system("rm " + os.path.join(ROOT_DIR, "prf", "invers10*"))  # pyright: ignore[reportDeprecated]
             os.system("rm " + os.path.join(ROOT_DIR, "prf", "pcxs10*"))  # pyright: ignore[reportDeprecated]
 
-        _print("Compiling")
-        tum_esm_utils.shell.run_shell_command(
-            command="./install.sh -O0" if fast_compilation else "./install.sh",
-            working_directory=ROOT_DIR,
+        compile_code(
+            ROOT_DIR,
+            [
+                os.path.join("prf", "preprocess", "preprocess4"),
+                os.path.join("prf", "pcxs10"),
+                os.path.join("prf", "invers10"),
+            ],
+            _print,
+            fast_compilation=fast_compilation,
+            binary_cache_dir=binary_cache_dir,
         )
 
         _print("Proffast 1.0 is set up")
 
     @staticmethod
-    def init_proffast22_code(_print: Callable[[str], None], fast_compilation: bool = False) -> None:
+    def init_proffast22_code(
+        _print: Callable[[str], None],
+        fast_compilation: bool = False,
+        binary_cache_dir: Optional[str] = None,
+    ) -> None:
         """Initialize the Proffast 2.2 and pylot 1.1 code.
 
         It will download the Proffast 2.2 code from the KIT website
@@ -258,10 +541,7 @@ class ContainerFactory:
                 os.remove(os.path.join(ROOT_DIR, ZIPFILE_NAME))
 
             _print("Downloading")
-            tum_esm_utils.shell.run_shell_command(
-                command=f"wget --quiet {KIT_BASE_URL}/{ZIPFILE_NAME}",
-                working_directory=ROOT_DIR,
-            )
+            download_code_archive(KIT_BASE_URL, ZIPFILE_NAME, ROOT_DIR, binary_cache_dir)
 
             _print("Unzipping")
             tum_esm_utils.shell.run_shell_command(
@@ -270,16 +550,26 @@ class ContainerFactory:
             )
             os.remove(os.path.join(ROOT_DIR, ZIPFILE_NAME))
 
-        _print("Compiling")
-        tum_esm_utils.shell.run_shell_command(
-            command="./install.sh -O0" if fast_compilation else "./install.sh",
-            working_directory=ROOT_DIR,
+        compile_code(
+            ROOT_DIR,
+            [
+                os.path.join("prf", "preprocess", "preprocess4"),
+                os.path.join("prf", "pcxs20"),
+                os.path.join("prf", "invers20"),
+            ],
+            _print,
+            fast_compilation=fast_compilation,
+            binary_cache_dir=binary_cache_dir,
         )
 
         _print("Proffast 2.2 is set up")
 
     @staticmethod
-    def init_proffast23_code(_print: Callable[[str], None], fast_compilation: bool = False) -> None:
+    def init_proffast23_code(
+        _print: Callable[[str], None],
+        fast_compilation: bool = False,
+        binary_cache_dir: Optional[str] = None,
+    ) -> None:
         """Initialize the Proffast 2.3 and pylot 1.2 code.
 
         It will download the Proffast 2.3 code from the KIT website
@@ -299,10 +589,7 @@ class ContainerFactory:
                 os.remove(os.path.join(ROOT_DIR, ZIPFILE_NAME))
 
             _print("Downloading")
-            tum_esm_utils.shell.run_shell_command(
-                command=f"wget --quiet {KIT_BASE_URL}/{ZIPFILE_NAME}",
-                working_directory=ROOT_DIR,
-            )
+            download_code_archive(KIT_BASE_URL, ZIPFILE_NAME, ROOT_DIR, binary_cache_dir)
 
             _print("Unzipping")
             tum_esm_utils.shell.run_shell_command(
@@ -311,16 +598,26 @@ class ContainerFactory:
             )
             os.remove(os.path.join(ROOT_DIR, ZIPFILE_NAME))
 
-        _print("Compiling")
-        tum_esm_utils.shell.run_shell_command(
-            command="./install.sh -O0" if fast_compilation else "./install.sh",
-            working_directory=ROOT_DIR,
+        compile_code(
+            ROOT_DIR,
+            [
+                os.path.join("prf", "preprocess", "preprocess5"),
+                os.path.join("prf", "pcxs20"),
+                os.path.join("prf", "invers20"),
+            ],
+            _print,
+            fast_compilation=fast_compilation,
+            binary_cache_dir=binary_cache_dir,
         )
 
         _print("Proffast 2.3 is set up")
 
     @staticmethod
-    def init_proffast24_code(_print: Callable[[str], None], fast_compilation: bool = False) -> None:
+    def init_proffast24_code(
+        _print: Callable[[str], None],
+        fast_compilation: bool = False,
+        binary_cache_dir: Optional[str] = None,
+    ) -> None:
         """Initialize the Proffast 2.4 and pylot 1.3 code.
 
         It will download the Proffast 2.4 code from the KIT website
@@ -340,10 +637,7 @@ class ContainerFactory:
                 os.remove(os.path.join(ROOT_DIR, ZIPFILE_NAME))
 
             _print("Downloading")
-            tum_esm_utils.shell.run_shell_command(
-                command=f"wget --quiet {KIT_BASE_URL}/{ZIPFILE_NAME}",
-                working_directory=ROOT_DIR,
-            )
+            download_code_archive(KIT_BASE_URL, ZIPFILE_NAME, ROOT_DIR, binary_cache_dir)
 
             _print("Unzipping")
             tum_esm_utils.shell.run_shell_command(
@@ -368,17 +662,25 @@ class ContainerFactory:
         os.remove(ORIGINAL_SOURCE_FILE)
         shutil.copyfile(ADAPTED_SOURCE_FILE, ORIGINAL_SOURCE_FILE)
 
-        _print("Compiling")
-        tum_esm_utils.shell.run_shell_command(
-            command="./install.sh -O0" if fast_compilation else "./install.sh",
-            working_directory=ROOT_DIR,
+        compile_code(
+            ROOT_DIR,
+            [
+                os.path.join("prf", "preprocess", "preprocess6"),
+                os.path.join("prf", "pcxs24"),
+                os.path.join("prf", "invers24"),
+            ],
+            _print,
+            fast_compilation=fast_compilation,
+            binary_cache_dir=binary_cache_dir,
         )
 
         _print("Proffast 2.4 is set up")
 
     @staticmethod
     def init_proffast241_code(
-        _print: Callable[[str], None], fast_compilation: bool = False
+        _print: Callable[[str], None],
+        fast_compilation: bool = False,
+        binary_cache_dir: Optional[str] = None,
     ) -> None:
         """Initialize the Proffast 2.4.1 and pylot 2.4.1-0 code.
 
@@ -399,10 +701,7 @@ class ContainerFactory:
                 os.remove(os.path.join(ROOT_DIR, ZIPFILE_NAME))
 
             _print("Downloading")
-            tum_esm_utils.shell.run_shell_command(
-                command=f"wget --quiet {KIT_BASE_URL}/{ZIPFILE_NAME}",
-                working_directory=ROOT_DIR,
-            )
+            download_code_archive(KIT_BASE_URL, ZIPFILE_NAME, ROOT_DIR, binary_cache_dir)
 
             _print("Unzipping")
             tum_esm_utils.shell.run_shell_command(
@@ -432,10 +731,16 @@ class ContainerFactory:
         os.remove(ORIGINAL_SOURCE_FILE)
         shutil.copyfile(ADAPTED_SOURCE_FILE, ORIGINAL_SOURCE_FILE)
 
-        _print("Compiling")
-        tum_esm_utils.shell.run_shell_command(
-            command="./install.sh -O0" if fast_compilation else "./install.sh",
-            working_directory=ROOT_DIR,
+        compile_code(
+            ROOT_DIR,
+            [
+                os.path.join("prf", "preprocess", "preprocess62"),
+                os.path.join("prf", "pcxs24"),
+                os.path.join("prf", "invers26"),
+            ],
+            _print,
+            fast_compilation=fast_compilation,
+            binary_cache_dir=binary_cache_dir,
         )
 
         _print("Proffast 2.4.1 is set up")
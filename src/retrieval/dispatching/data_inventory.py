@@ -0,0 +1,240 @@
+import datetime
+import os
+from typing import Iterable
+
+from src import types, utils
+
+
+def _list_entries(path: str) -> list[os.DirEntry[str]]:
+    try:
+        with os.scandir(path) as entries:
+            return list(entries)
+    except (FileNotFoundError, NotADirectoryError):
+        return []
+
+
+class DataInventory:
+    """In-memory inventory of the input and output data directories.
+
+    Every directory is scanned at most once using `os.scandir` and the
+    results are kept in sets keyed by sensor id, algorithm, etc. This
+    avoids thousands of individual `os.path.isdir`/`os.path.isfile` calls
+    when generating the retrieval queue on a network file system.
+
+    The inventory is a snapshot - create one per queue generation run and
+    share it across all retrieval jobs of that run.
+
+    On high-latency file systems, the `prefetch_*` methods can be used to
+    run the directory scans on a thread pool with `concurrency` threads.
+    The worker threads only perform the I/O, the results are stored by the
+    calling thread."""
+
+    def __init__(self, config: types.Config, concurrency: int = 1) -> None:
+        self.config = config
+        self.concurrency = concurrency
+
+        # sensor_id -> set of "YYYYMMDD" directory names
+        self.interferogram_dates: dict[str, set[str]] = {}
+
+        # (sensor_id, "YYYYMMDD") -> whether the directory contains a `.do-not-touch` file
+        self.locked_interferogram_dates: dict[tuple[str, str], bool] = {}
+
+        # (sensor_id, "YYYYMMDD") -> number of files matching the `ifg_file_regex`
+        self.interferogram_counts: dict[tuple[str, str], int] = {}
+
+        # (retrieval_algorithm, atmospheric_profile_model, sensor_id) -> set of output folders
+        self.successful_outputs: dict[tuple[str, str, str], set[str]] = {}
+        self.failed_outputs: dict[tuple[str, str, str], set[str]] = {}
+
+        # pressure_data_source -> index of the ground pressure files by date
+        self.ground_pressure_indices: dict[str, utils.file_index.DatedFileIndex] = {}
+
+        # atmospheric_profile_model -> inventory of the profile files
+        self.atmospheric_profiles: dict[
+            str, utils.profile_inventory.AtmosphericProfileInventory
+        ] = {}
+
+    def _scan_interferogram_dates(self, sensor_id: str) -> set[str]:
+        return set(
+            e.name
+            for e in _list_entries(
+                os.path.join(self.config.general.data.interferograms.root, sensor_id)
+            )
+            if (len(e.name) == 8) and e.name.isdigit() and e.is_dir()
+        )
+
+    def _scan_interferogram_day(self, key: tuple[str, str]) -> tuple[bool, int]:
+        assert self.config.retrieval is not None
+        _, ifg_file_pattern = utils.text.replace_regex_placeholders(
+            self.config.retrieval.general.ifg_file_regex,
+            key[0],
+            datetime.datetime.strptime(key[1], "%Y%m%d").date(),
+        )
+        entries = _list_entries(
+            os.path.join(self.config.general.data.interferograms.root, key[0], key[1])
+        )
+        return (
+            any((e.name == ".do-not-touch") and e.is_file() for e in entries),
+            len([e for e in entries if ifg_file_pattern.match(e.name) is not None]),
+        )
+
+    def _load_interferogram_day(self, sensor_id: str, date: datetime.date) -> tuple[str, str]:
+        key = (sensor_id, date.strftime("%Y%m%d"))
+        if key not in self.locked_interferogram_dates:
+            self.locked_interferogram_dates[key], self.interferogram_counts[key] = (
+                self._scan_interferogram_day(key)
+            )
+        return key
+
+    def _scan_outputs(self, key: tuple[str, str, str]) -> tuple[set[str], set[str]]:
+        results_dir = os.path.join(self.config.general.data.results.root, *key)
+        return (
+            set(
+                e.name for e in _list_entries(os.path.join(results_dir, "successful")) if e.is_dir()
+            ),
+            set(e.name for e in _list_entries(os.path.join(results_dir, "failed")) if e.is_dir()),
+        )
+
+    def prefetch_sensors(
+        self,
+        sensor_ids: list[str],
+        retrieval_algorithm: types.RetrievalAlgorithm,
+        atmospheric_profile_model: types.AtmosphericProfileModel,
+    ) -> None:
+        """Scan the interferogram and results directories of all given sensors
+        and the atmospheric profiles directory of the given model concurrently."""
+
+        new_sensor_ids = [s for s in sensor_ids if s not in self.interferogram_dates]
+        for sensor_id, dates in zip(
+            new_sensor_ids,
+            utils.functions.concurrent_map(
+                self._scan_interferogram_dates, new_sensor_ids, self.concurrency
+            ),
+        ):
+            self.interferogram_dates[sensor_id] = dates
+
+        new_output_keys = [
+            (retrieval_algorithm, atmospheric_profile_model, s)
+            for s in sensor_ids
+            if (retrieval_algorithm, atmospheric_profile_model, s) not in self.successful_outputs
+        ]
+        for key, (successful, failed) in zip(
+            new_output_keys,
+            utils.functions.concurrent_map(self._scan_outputs, new_output_keys, self.concurrency),
+        ):
+            self.successful_outputs[key] = successful
+            self.failed_outputs[key] = failed
+
+        self.get_atmospheric_profiles(atmospheric_profile_model)
+
+    def prefetch_locked_interferograms(
+        self, sensor_id: str, dates: Iterable[datetime.date]
+    ) -> None:
+        """Scan the interferogram directories of all given sensor-days
+        concurrently for their `.do-not-touch` file and their number of
+        interferograms."""
+
+        keys = [
+            (sensor_id, d.strftime("%Y%m%d"))
+            for d in sorted(dates)
+            if (sensor_id, d.strftime("%Y%m%d")) not in self.locked_interferogram_dates
+        ]
+        for key, (is_locked, ifg_count) in zip(
+            keys,
+            utils.functions.concurrent_map(self._scan_interferogram_day, keys, self.concurrency),
+        ):
+            self.locked_interferogram_dates[key] = is_locked
+            self.interferogram_counts[key] = ifg_count
+
+    def has_interferograms(self, sensor_id: str, date: datetime.date) -> bool:
+        """Whether the interferogram directory of this sensor-day exists."""
+
+        if sensor_id not in self.interferogram_dates:
+            self.interferogram_dates[sensor_id] = self._scan_interferogram_dates(sensor_id)
+        return date.strftime("%Y%m%d") in self.interferogram_dates[sensor_id]
+
+    def has_locked_interferograms(self, sensor_id: str, date: datetime.date) -> bool:
+        """Whether the interferogram directory of this sensor-day contains
+        a `.do-not-touch` file. Only looked up for dates with interferograms."""
+
+        return self.locked_interferogram_dates[self._load_interferogram_day(sensor_id, date)]
+
+    def get_interferogram_count(self, sensor_id: str, date: datetime.date) -> int:
+        """Number of files in the interferogram directory of this sensor-day
+        that match the `ifg_file_regex`. Counted in the same directory scan
+        as the `.do-not-touch` lookup."""
+
+        return self.interferogram_counts[self._load_interferogram_day(sensor_id, date)]
+
+    def _load_outputs(
+        self,
+        retrieval_algorithm: types.RetrievalAlgorithm,
+        atmospheric_profile_model: types.AtmosphericProfileModel,
+        sensor_id: str,
+    ) -> tuple[str, str, str]:
+        key = (retrieval_algorithm, atmospheric_profile_model, sensor_id)
+        if key not in self.successful_outputs:
+            self.successful_outputs[key], self.failed_outputs[key] = self._scan_outputs(key)
+        return key
+
+    def has_output(
+        self,
+        retrieval_algorithm: types.RetrievalAlgorithm,
+        atmospheric_profile_model: types.AtmosphericProfileModel,
+        sensor_id: str,
+        output_folder: str,
+    ) -> bool:
+        """Whether a successful or failed output folder with this name exists."""
+
+        key = self._load_outputs(retrieval_algorithm, atmospheric_profile_model, sensor_id)
+        return (output_folder in self.successful_outputs[key]) or (
+            output_folder in self.failed_outputs[key]
+        )
+
+    def get_ground_pressure_index(
+        self, pressure_data_source: str
+    ) -> utils.file_index.DatedFileIndex:
+        """Index of the ground pressure files of this data source by date."""
+
+        if pressure_data_source not in self.ground_pressure_indices:
+            self.ground_pressure_indices[pressure_data_source] = utils.file_index.DatedFileIndex(
+                os.path.join(
+                    self.config.general.data.ground_pressure.path.root, pressure_data_source
+                ),
+                pressure_data_source,
+                self.config.general.data.ground_pressure.file_regex,
+            )
+        return self.ground_pressure_indices[pressure_data_source]
+
+    def has_ground_pressure_files(self, pressure_data_source: str, date: datetime.date) -> bool:
+        """Whether any ground pressure file of this data source matches the
+        `file_regex` on this date."""
+
+        return self.get_ground_pressure_index(pressure_data_source).exists(date)
+
+    def get_atmospheric_profiles(
+        self,
+        atmospheric_profile_model: types.AtmosphericProfileModel,
+    ) -> utils.profile_inventory.AtmosphericProfileInventory:
+        """Inventory of the atmospheric profiles of this model in the flat
+        layout (`model/file`, before ERP 1.7.0) and the nested layout
+        (`model/YYYY/MM/file`, starting with ERP 1.7.0)."""
+
+        if atmospheric_profile_model not in self.atmospheric_profiles:
+            self.atmospheric_profiles[atmospheric_profile_model] = (
+                utils.profile_inventory.AtmosphericProfileInventory(
+                    self.config.general.data.atmospheric_profiles.root,
+                    atmospheric_profile_model,
+                    concurrency=self.concurrency,
+                )
+            )
+        return self.atmospheric_profiles[atmospheric_profile_model]
+
+    def has_atmospheric_profile(
+        self,
+        atmospheric_profile_model: types.AtmosphericProfileModel,
+        filename: str,
+    ) -> bool:
+        """Whether an atmospheric profile file exists in either layout."""
+
+        return self.get_atmospheric_profiles(atmospheric_profile_model).has_file(filename)
@@ -0,0 +1,228 @@
+import datetime
+import json
+import os
+import socket
+import time
+from typing import Literal, Optional
+
+from src import retrieval, types, utils
+
+
+class JobLeaseManager:
+    """Claims retrieval jobs via lease files in a directory shared by
+    several nodes (see `config.retrieval.general.distributed`).
+
+    A lease file is created atomically with `os.link`, which also works on
+    NFS. While a job is running, its node renews the lease by updating the
+    modification time of the lease file. If a node dies, its leases expire
+    after `lease_timeout` seconds and can be claimed by another node. After
+    claiming a lease, the node checks whether the output of the job exists
+    already - this way, a job that another node finished after this node
+    generated its queue is not processed twice.
+
+    Before renewing or releasing a lease, the node compares the content of
+    the lease file with the content it has written when claiming it. If
+    another node has taken over an expired lease in the meantime, the node
+    neither renews nor removes the lease of the other node."""
+
+    def __init__(
+        self,
+        config: types.Config,
+        logger: "retrieval.utils.logger.Logger",
+    ) -> None:
+        assert config.retrieval is not None
+        assert config.retrieval.general.distributed is not None
+        self.config = config
+        self.logger = logger
+        self.lease_dir = config.retrieval.general.distributed.lease_dir.root
+        self.lease_timeout = config.retrieval.general.distributed.lease_timeout
+        self.node_id = config.retrieval.general.distributed.node_id or socket.gethostname()
+
+        # lease filename -> (absolute path, content of the lease file) of
+        # all leases held by this node
+        self.held_leases: dict[str, tuple[str, str]] = {}
+
+    @property
+    def heartbeat_interval(self) -> float:
+        """How often the leases of this node should be renewed in seconds."""
+
+        return self.lease_timeout / 4
+
+    def _lease_filename(self, job: "retrieval.utils.job_queue.RetrievalJob") -> str:
+        output_folder_slug = utils.functions.get_output_folder_slug(
+            job.sensor_data_context, job.job_settings.output_suffix
+        )
+        return (
+            f"{job.retrieval_algorithm}_{job.atmospheric_profile_model}_"
+            + f"{job.sensor_data_context.sensor_id}_{output_folder_slug}.lease"
+        )
+
+    def _output_exists(self, job: "retrieval.utils.job_queue.RetrievalJob") -> bool:
+        output_dir = os.path.join(
+            self.config.general.data.results.root,
+            job.retrieval_algorithm,
+            job.atmospheric_profile_model,
+            job.sensor_data_context.sensor_id,
+        )
+        output_folder_slug = utils.functions.get_output_folder_slug(
+            job.sensor_data_context, job.job_settings.output_suffix
+        )
+        return os.path.isdir(
+            os.path.join(output_dir, "successful", output_folder_slug)
+        ) or os.path.isdir(os.path.join(output_dir, "failed", output_folder_slug))
+
+    def _create_lease_file(self, lease_path: str) -> Optional[str]:
+        """Create the lease file atomically. Returns its content if it was
+        created and `None` otherwise."""
+
+        tmp_path = f"{lease_path}.{self.node_id}-{os.getpid()}.tmp"
+        lease_content = json.dumps(
+            {
+                "node_id": self.node_id,
+                "pid": os.getpid(),
+                "claimed_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            }
+        )
+        with open(tmp_path, "w") as f:
+            f.write(lease_content)
+        try:
+            os.link(tmp_path, lease_path)
+            return lease_content
+        except FileExistsError:
+            return None
+        except OSError:
+            # on NFS, `link` can report an error although it succeeded
+            return lease_content if (os.stat(tmp_path).st_nlink == 2) else None
+        finally:
+            os.remove(tmp_path)
+
+    def _is_held(self, lease_filename: str) -> bool:
+        """Whether the lease file still is the one this node has created.
+        Forgets the lease if it is gone or has been taken over."""
+
+        lease_path, lease_content = self.held_leases[lease_filename]
+        try:
+            with open(lease_path, "r") as f:
+                if f.read() == lease_content:
+                    return True
+        except FileNotFoundError:
+            pass
+        self._forget_lease(lease_filename)
+        return False
+
+    def _forget_lease(self, lease_filename: str) -> None:
+        self.logger.warning(
+            f"Lease {lease_filename} has been taken over by another node "
+            + "(it was not renewed in time)"
+        )
+        del self.held_leases[lease_filename]
+
+    def _remove_expired_lease(self, lease_path: str) -> bool:
+        """Remove the lease file if it has expired. Returns whether the lease
+        is gone, i.e. whether it makes sense to try claiming it again."""
+
+        try:
+            if (time.time() - os.stat(lease_path).st_mtime) < self.lease_timeout:
+                return False
+        except FileNotFoundError:
+            return True
+
+        # only one node can move the expired lease out of the way
+        tombstone_path = f"{lease_path}.expired-{self.node_id}-{os.getpid()}"
+        try:
+            os.rename(lease_path, tombstone_path)
+        except FileNotFoundError:
+            return True
+
+        try:
+            # the owner renewed the lease right before it was moved
+            if (time.time() - os.stat(tombstone_path).st_mtime) < self.lease_timeout:
+                try:
+                    os.link(tombstone_path, lease_path)
+                except FileExistsError:
+                    pass
+                return False
+            with open(tombstone_path, "r") as f:
+                self.logger.info(
+                    f"Lease {os.path.basename(lease_path)} has expired, "
+                    + f"previous lease: {f.read()}"
+                )
+            return True
+        finally:
+            os.remove(tombstone_path)
+
+    def try_claim(
+        self, job: "retrieval.utils.job_queue.RetrievalJob"
+    ) -> Literal["claimed", "leased", "processed"]:
+        """Try to claim a job. Returns `claimed` if this node should process
+        it, `leased` if another node holds a live lease on it (see
+        `get_lease_expiry`) and `processed` if its output exists already."""
+
+        lease_filename = self._lease_filename(job)
+        lease_path = os.path.join(self.lease_dir, lease_filename)
+
+        lease_content: Optional[str] = None
+        for _ in range(2):
+            lease_content = self._create_lease_file(lease_path)
+            if lease_content is not None:
+                break
+            if not self._remove_expired_lease(lease_path):
+                break
+        if lease_content is None:
+            return "leased"
+
+        if self._output_exists(job):
+            os.remove(lease_path)
+            return "processed"
+
+        self.held_leases[lease_filename] = (lease_path, lease_content)
+        return "claimed"
+
+    def get_lease_expiry(self, job: "retrieval.utils.job_queue.RetrievalJob") -> float:
+        """Unix timestamp at which the current lease of a job expires if
+        its owner does not renew it. Returns the current time if there is
+        no lease."""
+
+        try:
+            return (
+                os.stat(os.path.join(self.lease_dir, self._lease_filename(job))).st_mtime
+                + self.lease_timeout
+            )
+        except FileNotFoundError:
+            return time.time()
+
+    def renew(self) -> None:
+        """Renew all leases held by this node."""
+
+        for lease_filename, (lease_path, _) in list(self.held_leases.items()):
+            if not self._is_held(lease_filename):
+                continue
+            try:
+                os.utime(lease_path)
+            except FileNotFoundError:
+                self._forget_lease(lease_filename)
+
+    def release(self, job: "retrieval.utils.job_queue.RetrievalJob") -> None:
+        """Release the lease of a job, after its output has been written or
+        when the node is stopped."""
+
+        lease_filename = self._lease_filename(job)
+        if (lease_filename not in self.held_leases) or (not self._is_held(lease_filename)):
+            return
+        lease_path, _ = self.held_leases.pop(lease_filename)
+        try:
+            os.remove(lease_path)
+        except FileNotFoundError:
+            pass
+
+    def release_all(self) -> None:
+        """Release all leases held by this node."""
+
+        for lease_filename in list(self.held_leases.keys()):
+            if not self._is_held(lease_filename):
+                continue
+            lease_path, _ = self.held_leases.pop(lease_filename)
+            try:
+                os.remove(lease_path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,149 @@
+import datetime
+import time
+from typing import Literal, Optional
+
+from src import retrieval, types, utils
+
+# the throughput gauges count the sessions that finished within this window
+_THROUGHPUT_WINDOW = datetime.timedelta(hours=1)
+_SESSION_DURATION_BUCKETS: list[float] = [60, 300, 600, 1800, 3600, 7200, 14400, 28800, 86400]
+
+
+def _as_utc(dt: datetime.datetime) -> datetime.datetime:
+    return dt.replace(tzinfo=datetime.timezone.utc) if dt.tzinfo is None else dt
+
+
+class RetrievalMetricsExporter:
+    """Writes the metrics of the retrieval to `em27_retrieval.prom` in
+    `config.general.metrics.textfile_dir` every `interval_seconds`: the
+    queue depth, the running sessions, the sessions and interferograms
+    processed within the last hour, the finished sessions per retrieval
+    algorithm and result, and the histogram of the session durations.
+
+    The dispatch loop calls `export` whenever it wakes up and includes
+    `poll_interval` in its wait timeout. Every export only loads the rows
+    of the status list that changed since the previous export (see
+    `RetrievalStatusList.load_changes`). Does nothing if
+    `config.general.metrics` is not set."""
+
+    def __init__(
+        self,
+        config: types.Config,
+        logger: "retrieval.utils.logger.Logger",
+        status_list: Optional[type["retrieval.utils.retrieval_status.RetrievalStatusList"]] = None,
+    ) -> None:
+        assert config.retrieval is not None
+        self.logger = logger
+        self.status_list = status_list or retrieval.utils.retrieval_status.RetrievalStatusList
+        self.registry = utils.metrics.MetricsRegistry.from_config(config, "retrieval")
+        self.poll_interval: Optional[float] = (
+            None if config.general.metrics is None else config.general.metrics.interval_seconds
+        )
+        self.last_export_time: Optional[float] = None
+
+        # status list row id -> (end time, duration in seconds, interferogram
+        # count) of every finished session, updated incrementally
+        self.status_generation: Optional[str] = None
+        self.status_version: int = 0
+        self.finished_sessions: dict[int, tuple[datetime.datetime, float, int]] = {}
+
+        # every configured algorithm has a series, also before its first session
+        for job in config.retrieval.jobs:
+            for result in ["successful", "failed"]:
+                self._inc_finished_sessions(job.retrieval_algorithm, result, 0)
+
+    def _inc_finished_sessions(
+        self,
+        retrieval_algorithm: types.RetrievalAlgorithm,
+        result: str,
+        value: float,
+    ) -> None:
+        self.registry.inc(
+            "em27_retrieval_finished_sessions_total",
+            "Retrieval sessions that have finished since the start of the retrieval.",
+            value,
+            retrieval_algorithm=retrieval_algorithm,
+            result=result,
+        )
+
+    def record_finished_session(
+        self,
+        retrieval_algorithm: types.RetrievalAlgorithm,
+        state: Literal["done", "failed"],
+    ) -> None:
+        self._inc_finished_sessions(
+            retrieval_algorithm, "successful" if state == "done" else "failed", 1
+        )
+
+    def _poll_status_list(self) -> None:
+        changes = self.status_list.load_changes(self.status_generation, self.status_version)
+        if (changes is None) or changes.full_reload:
+            self.finished_sessions = {}
+        if changes is None:
+            return
+        self.status_generation = changes.generation
+        self.status_version = changes.version
+        for rowid, s in changes.items.items():
+            if (s.process_start_time is None) or (s.process_end_time is None):
+                self.finished_sessions.pop(rowid, None)
+            else:
+                self.finished_sessions[rowid] = (
+                    _as_utc(s.process_end_time),
+                    (_as_utc(s.process_end_time) - _as_utc(s.process_start_time)).total_seconds(),
+                    s.ifg_count or 0,
+                )
+
+    def export(
+        self,
+        queue_depth: int,
+        running_session_count: int,
+        force: bool = False,
+    ) -> None:
+        """Write the metrics file if the last export is at least
+        `poll_interval` seconds ago (or if `force` is set)."""
+
+        if self.poll_interval is None:
+            return
+        if (
+            (not force)
+            and (self.last_export_time is not None)
+            and (time.time() - self.last_export_time < self.poll_interval)
+        ):
+            return
+        self.last_export_time = time.time()
+
+        try:
+            self._poll_status_list()
+            now = datetime.datetime.now(datetime.timezone.utc)
+            recent_sessions = [
+                f for f in self.finished_sessions.values() if f[0] >= now - _THROUGHPUT_WINDOW
+            ]
+            self.registry.set(
+                "em27_retrieval_queue_depth",
+                "Retrieval jobs in the queue that have not been started yet.",
+                queue_depth,
+            )
+            self.registry.set(
+                "em27_retrieval_running_sessions",
+                "Retrieval sessions that are currently running.",
+                running_session_count,
+            )
+            self.registry.set(
+                "em27_retrieval_sessions_per_hour",
+                "Retrieval sessions that have finished within the last hour.",
+                len(recent_sessions),
+            )
+            self.registry.set(
+                "em27_retrieval_interferograms_per_hour",
+                "Interferograms of the retrieval sessions that have finished within the last hour.",
+                sum(f[2] for f in recent_sessions),
+            )
+            self.registry.set_histogram(
+                "em27_retrieval_session_duration_seconds",
+                "Durations of the retrieval sessions that have finished since the start of the retrieval.",
+                [f[1] for f in self.finished_sessions.values()],
+                buckets=_SESSION_DURATION_BUCKETS,
+            )
+            self.registry.write()
+        except Exception as e:
+            self.logger.exception(e, "Could not export the retrieval metrics")
@@ -1,5 +1,4 @@
 import datetime
-import os
 from typing import Any, Optional
 
 import em27_metadata
@@ -7,6 +6,8 @@ import tum_esm_utils
 
 from src import retrieval, types, utils
 
+from .data_inventory import DataInventory
+
 
 # pprint outputs didn't look so great
 def _list_to_pretty_string(xs: list[Any]) -> str:
@@ -30,8 +31,17 @@ def generate_retrieval_queue(
     logger: "retrieval.utils.logger.Logger",
     em27_metadata_interface: em27_metadata.EM27MetadataInterface,
     retrieval_job_config: types.RetrievalJobConfig,
+    data_inventory: Optional[DataInventory] = None,
 ) -> list[em27_metadata.types.SensorDataContext]:
+    """Generate the list of sensor data contexts to process for one retrieval job.
+
+    All file existence checks are answered by the `data_inventory`. Pass the
+    same inventory for all retrieval jobs of a run so that every directory
+    is only scanned once. If not given, a new inventory is created."""
+
     assert config.retrieval is not None, "Config must have a retrieval section"
+    if data_inventory is None:
+        data_inventory = DataInventory(config)
 
     def _log_filtering_step_message(
         positive_message: str,
@@ -73,6 +83,16 @@ def generate_retrieval_queue(
             message += ": " + _list_to_pretty_string(sorted(pretty_items))
         logger.info(message)
 
+    data_inventory.prefetch_sensors(
+        [
+            s.sensor_id
+            for s in em27_metadata_interface.sensors.root
+            if s.sensor_id in retrieval_job_config.sensor_ids
+        ],
+        retrieval_job_config.retrieval_algorithm,
+        retrieval_job_config.atmospheric_profile_model,
+    )
+
     retrieval_queue: list[em27_metadata.types.SensorDataContext] = []
     for sensor in em27_metadata_interface.sensors.root:
         if sensor.sensor_id not in retrieval_job_config.sensor_ids:
@@ -119,10 +139,7 @@ def generate_retrieval_queue(
         dates_with_interferograms: set[datetime.date] = set()
         dates_without_interferograms: set[datetime.date] = set()
         for date in dates_with_location:
-            ifg_path = os.path.join(
-                config.general.data.interferograms.root, sensor.sensor_id, date.strftime("%Y%m%d")
-            )
-            if os.path.isdir(ifg_path):
+            if data_inventory.has_interferograms(sensor.sensor_id, date):
                 dates_with_interferograms.add(date)
             else:
                 dates_without_interferograms.add(date)
@@ -135,13 +152,9 @@ def generate_retrieval_queue(
 
         dates_with_unlocked_interferograms: set[datetime.date] = set()
         dates_with_locked_interferograms: set[datetime.date] = set()
+        data_inventory.prefetch_locked_interferograms(sensor.sensor_id, dates_with_interferograms)
         for date in dates_with_interferograms:
-            ifg_path = os.path.join(
-                config.general.data.interferograms.root, sensor.sensor_id, date.strftime("%Y%m%d")
-            )
-            assert os.path.isdir(ifg_path)
-            do_not_touch_indicator_file = os.path.join(ifg_path, ".do-not-touch")
-            if os.path.isfile(do_not_touch_indicator_file):
+            if data_inventory.has_locked_interferograms(sensor.sensor_id, date):
                 dates_with_locked_interferograms.add(date)
             else:
                 dates_with_unlocked_interferograms.add(date)
@@ -174,22 +187,16 @@ def generate_retrieval_queue(
         # i.e. there is a results directory for them
 
         unprocessed_sensor_data_contexts: list[em27_metadata.types.SensorDataContext] = []
-        results_dir = os.path.join(
-            config.general.data.results.root,
-            retrieval_job_config.retrieval_algorithm,
-            retrieval_job_config.atmospheric_profile_model,
-            sensor.sensor_id,
-        )
         for sdc in sensor_data_contexts:
-            output_folder = sdc.from_datetime.strftime("%Y%m%d")
-            if not utils.functions.sdc_covers_the_full_day(sdc):
-                output_folder += sdc.from_datetime.strftime("_%H%M%S")
-                output_folder += sdc.to_datetime.strftime("_%H%M%S")
-            if retrieval_job_config.settings.output_suffix is not None:
-                output_folder += f"_{retrieval_job_config.settings.output_suffix}"
-            success_dir = os.path.join(results_dir, "successful", output_folder)
-            failure_dir = os.path.join(results_dir, "failed", output_folder)
-            if not os.path.isdir(success_dir) and not os.path.isdir(failure_dir):
+            output_folder = utils.functions.get_output_folder_slug(
+                sdc, retrieval_job_config.settings.output_suffix
+            )
+            if not data_inventory.has_output(
+                retrieval_job_config.retrieval_algorithm,
+                retrieval_job_config.atmospheric_profile_model,
+                sensor.sensor_id,
+                output_folder,
+            ):
                 unprocessed_sensor_data_contexts.append(sdc)
         _log_filtering_step_message(
             positive_message="of these sensor data contexts have not been processed yet",
@@ -205,10 +212,8 @@ def generate_retrieval_queue(
             em27_metadata.types.SensorDataContext
         ] = []
         for sdc in unprocessed_sensor_data_contexts:
-            pressure_file_exists = retrieval.utils.pressure_loading.pressure_files_exist(
-                config.general.data.ground_pressure.path.root,
+            pressure_file_exists = data_inventory.has_ground_pressure_files(
                 sdc.pressure_data_source,
-                config.general.data.ground_pressure.file_regex,
                 sdc.from_datetime.date(),
             )
             if pressure_file_exists:
@@ -232,45 +237,13 @@ def generate_retrieval_queue(
             em27_metadata.types.SensorDataContext
         ] = []
         for sdc in unprocessed_sensor_data_contexts_with_ground_pressure_files:
-            profiles_dir = os.path.join(
-                config.general.data.atmospheric_profiles.root,
-                retrieval_job_config.atmospheric_profile_model,
-            )
             cd = utils.text.get_coordinates_slug(
                 sdc.atmospheric_profile_location.lat, sdc.atmospheric_profile_location.lon
             )
-            date_slugs = sdc.from_datetime.strftime("%Y%m%d")
-            datetime_slugs: list[str]
-            if retrieval_job_config.atmospheric_profile_model == "GGG2014":
-                datetime_slugs = [date_slugs]
-            else:
-                datetime_slugs = [f"{date_slugs}{d:02}" for d in [0, 3, 6, 9, 12, 15, 18, 21]]
-
-            # Using this logic instead of something like `all([... for ...])`
-            # so that it stops looking on the first encountered missing file
-            profiles_complete: bool = True
-            for datetime_slug in datetime_slugs:
-                if not (
-                    # before ERP 1.7.0
-                    os.path.isfile(
-                        os.path.join(
-                            profiles_dir,
-                            f"{datetime_slug}_{cd}.map",
-                        )
-                    )
-                    # starting with ERP 1.7.0
-                    or os.path.isfile(
-                        os.path.join(
-                            profiles_dir,
-                            datetime_slug[:4],
-                            datetime_slug[4:6],
-                            f"{datetime_slug}_{cd}.map",
-                        )
-                    )
-                ):
-                    profiles_complete = False
-                    break
-            if profiles_complete:
+            # the retrieval only uses the `.map` files
+            if data_inventory.get_atmospheric_profiles(
+                retrieval_job_config.atmospheric_profile_model
+            ).has_complete_day(cd, sdc.from_datetime.date(), extensions=["map"]):
                 unprocessed_sensor_data_contexts_with_atmospheric_profiles.append(sdc)
             else:
                 unprocessed_sensor_data_contexts_without_atmospheric_profiles.append(sdc)
@@ -1,10 +1,12 @@
+import datetime
 import multiprocessing
+import multiprocessing.connection
 import multiprocessing.context
 import os
 import signal
 import sys
 import time
-from typing import Any
+from typing import Any, NoReturn, Optional
 
 import em27_metadata
 import tum_esm_utils
@@ -35,10 +37,32 @@ def run() -> None:
     )
     processes: list[multiprocessing.context.SpawnProcess] = []
 
+    # in distributed mode, every job is claimed via a lease file before
+    # processing it; process name -> job of the process
+    lease_manager: Optional[retrieval.dispatching.job_leases.JobLeaseManager] = None
+    if config.retrieval.general.distributed is not None:
+        lease_manager = retrieval.dispatching.job_leases.JobLeaseManager(config, main_logger)
+        main_logger.info(f'Running in distributed mode as node "{lease_manager.node_id}"')
+    process_jobs: dict[str, retrieval.utils.job_queue.RetrievalJob] = {}
+    concurrency_controller = retrieval.dispatching.concurrency_controller.ConcurrencyController(
+        config, main_logger
+    )
+    metrics_exporter = retrieval.dispatching.metrics_exporter.RetrievalMetricsExporter(
+        config, main_logger
+    )
+
+    # the dispatch loop blocks until a process finishes or until a
+    # message arrives on this control pipe (e.g. a teardown request)
+    control_receiver, control_sender = multiprocessing.Pipe(duplex=False)
+    dispatch_loop_is_running: bool = False
+
     # tear down logger gracefully when process is killed
 
-    def _graceful_teardown(*args: Any) -> None:
+    def _graceful_teardown() -> NoReturn:
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
         main_logger.info("Automation was stopped by user")
+        container_factory.wait_for_background_removals()
         main_logger.info(f"Killing {len(processes)} container(s)")
         for process in processes:
             process.terminate()
@@ -64,67 +88,169 @@ def run() -> None:
             main_logger.info(f'Process "{process.name}": removed container')
 
         main_logger.info("Killed all containers")
+        if lease_manager is not None:
+            lease_manager.release_all()
+            main_logger.info("Released all job leases")
         retrieval.utils.retrieval_status.RetrievalStatusList.reset()
         main_logger.info("Reset retrieval status list")
         main_logger.info("Teardown is done")
         main_logger.archive()
         exit(0)
 
-    signal.signal(signal.SIGINT, _graceful_teardown)
-    signal.signal(signal.SIGTERM, _graceful_teardown)
+    def _request_teardown(*args: Any) -> None:
+        # the teardown never runs inside the signal handler, which might have
+        # interrupted the logger or a database transaction: inside the
+        # dispatch loop, the loop itself does the teardown so that it does
+        # not interrupt the bookkeeping of the processes
+        if dispatch_loop_is_running:
+            control_sender.send("teardown")
+        else:
+            raise KeyboardInterrupt()
+
+    signal.signal(signal.SIGINT, _request_teardown)
+    signal.signal(signal.SIGTERM, _request_teardown)
     main_logger.info("Established graceful teardown hook")
 
-    # load metadata interface
+    # before the dispatch loop, the teardown hook interrupts the queue
+    # generation with a KeyboardInterrupt and the teardown runs here
     try:
-        em27_metadata_interface = utils.metadata.load_local_em27_metadata_interface()
-        if em27_metadata_interface is not None:
-            print("Found local metadata")
-        else:
-            print("Did not find local metadata -> fetching metadata from GitHub")
-            assert config.general.metadata is not None, "Remote metadata not configured"
-            em27_metadata_interface = em27_metadata.load_from_github(
-                github_repository=config.general.metadata.github_repository,
-                access_token=config.general.metadata.access_token,
-            )
-            print("Successfully fetched metadata from GitHub")
-    except Exception as e:
-        main_logger.exception(e, "Error while loading local metadata")
-        main_logger.archive()
-        raise e
-
-    # generate retrieval queue
-    retrieval.utils.retrieval_status.RetrievalStatusList.reset()
-    job_queue = retrieval.utils.job_queue.RetrievalJobQueue()
+        # load metadata interface
+        try:
+            em27_metadata_interface = utils.metadata.load_local_em27_metadata_interface()
+            if em27_metadata_interface is not None:
+                print("Found local metadata")
+            else:
+                print("Did not find local metadata -> fetching metadata from GitHub")
+                assert config.general.metadata is not None, "Remote metadata not configured"
+                em27_metadata_interface = em27_metadata.load_from_github(
+                    github_repository=config.general.metadata.github_repository,
+                    access_token=config.general.metadata.access_token,
+                )
+                print("Successfully fetched metadata from GitHub")
+        except Exception as e:
+            main_logger.exception(e, "Error while loading local metadata")
+            main_logger.archive()
+            raise e
 
-    for job_index, job in enumerate(config.retrieval.jobs):
-        main_logger.info(
-            f"Generating retrieval queue for job {job_index+1}: {job.model_dump_json(indent=4)}"
-        )
-        retrieval_sdcs = retrieval.dispatching.retrieval_queue.generate_retrieval_queue(
-            config, main_logger, em27_metadata_interface, job
+        # resume the retrieval queue of the previous run if possible
+        queue_fingerprint = retrieval.utils.queue_state.compute_queue_fingerprint(
+            config, em27_metadata_interface
         )
-        main_logger.info(f"Found {len(retrieval_sdcs)} items for job {job_index+1}")
-        for sdc in retrieval_sdcs:
-            job_queue.push(
-                job.retrieval_algorithm,
-                job.atmospheric_profile_model,
-                sdc,
-                job.settings,
+        previous_queue_state: Optional[retrieval.utils.queue_state.QueueState] = None
+        if config.retrieval.general.resume_queue:
+            previous_queue_state = retrieval.utils.queue_state.QueueState.load()
+            if previous_queue_state is None:
+                main_logger.info("Found no queue state of a previous run")
+            elif previous_queue_state.queue_fingerprint != queue_fingerprint:
+                main_logger.info("Jobs, data paths or metadata have changed since the previous run")
+                previous_queue_state = None
+            elif previous_queue_state.is_finished():
+                main_logger.info("The queue of the previous run is finished")
+                previous_queue_state = None
+
+        seconds_per_ifg: dict[str, float] = {}
+        if (previous_queue_state is None) and (
+            config.retrieval.general.queue_ordering == "longest-first"
+        ):
+            seconds_per_ifg = retrieval.utils.job_queue.compute_seconds_per_ifg(
+                retrieval.utils.retrieval_status.RetrievalStatusList.load()
             )
-        retrieval.utils.retrieval_status.RetrievalStatusList.add_items(
-            retrieval_sdcs,
-            retrieval_algorithm=job.retrieval_algorithm,
-            atmospheric_profile_model=job.atmospheric_profile_model,
-            output_suffix=job.settings.output_suffix,
+            main_logger.info(f"Seconds per interferogram from the previous run: {seconds_per_ifg}")
+        retrieval.utils.retrieval_status.RetrievalStatusList.reset()
+        job_queue = retrieval.utils.job_queue.RetrievalJobQueue(
+            ordering=config.retrieval.general.queue_ordering
         )
-    main_logger.info(f"Generated retrieval queue with {len(job_queue)} items")
-    main_logger.horizontal_line(variant="=")
 
+        queue_state: Optional[retrieval.utils.queue_state.QueueState] = None
+        if previous_queue_state is not None:
+            queue_state = previous_queue_state
+            interrupted_jobs = queue_state.get_jobs("running")
+            pending_jobs = queue_state.get_jobs("pending")
+            main_logger.info(
+                f"Resuming the queue of the previous run with {len(interrupted_jobs)} "
+                + f"interrupted and {len(pending_jobs)} pending items"
+            )
+            status_items: dict[
+                tuple[types.RetrievalAlgorithm, types.AtmosphericProfileModel, Optional[str]],
+                list[em27_metadata.types.SensorDataContext],
+            ] = {}
+            for requeued, jobs in [(True, interrupted_jobs), (False, pending_jobs)]:
+                for j in jobs:
+                    job_queue.push(
+                        j.retrieval_algorithm,
+                        j.atmospheric_profile_model,
+                        j.sensor_data_context,
+                        j.job_settings,
+                        estimated_cost=j.estimated_cost,
+                        requeued=requeued,
+                        job_id=j.job_id,
+                    )
+                    status_items.setdefault(
+                        (
+                            j.retrieval_algorithm,
+                            j.atmospheric_profile_model,
+                            j.job_settings.output_suffix,
+                        ),
+                        [],
+                    ).append(j.sensor_data_context)
+            for status_key, sdcs in status_items.items():
+                retrieval.utils.retrieval_status.RetrievalStatusList.add_items(
+                    sdcs,
+                    retrieval_algorithm=status_key[0],
+                    atmospheric_profile_model=status_key[1],
+                    output_suffix=status_key[2],
+                )
+        else:
+            # every data directory is only scanned once for all jobs
+            data_inventory = retrieval.dispatching.data_inventory.DataInventory(
+                config, concurrency=config.retrieval.general.queue_probing_concurrency
+            )
+            for job_index, job in enumerate(config.retrieval.jobs):
+                main_logger.info(
+                    f"Generating retrieval queue for job {job_index+1}: {job.model_dump_json(indent=4)}"
+                )
+                retrieval_sdcs = retrieval.dispatching.retrieval_queue.generate_retrieval_queue(
+                    config, main_logger, em27_metadata_interface, job, data_inventory
+                )
+                main_logger.info(f"Found {len(retrieval_sdcs)} items for job {job_index+1}")
+                for sdc in retrieval_sdcs:
+                    estimated_cost: float = 0.0
+                    if config.retrieval.general.queue_ordering == "longest-first":
+                        estimated_cost = retrieval.utils.job_queue.estimate_job_cost(
+                            sdc,
+                            data_inventory.get_interferogram_count(
+                                sdc.sensor_id, sdc.from_datetime.date()
+                            ),
+                            seconds_per_ifg,
+                        )
+                    job_queue.push(
+                        job.retrieval_algorithm,
+                        job.atmospheric_profile_model,
+                        sdc,
+                        job.settings,
+                        estimated_cost=estimated_cost,
+                    )
+                retrieval.utils.retrieval_status.RetrievalStatusList.add_items(
+                    retrieval_sdcs,
+                    retrieval_algorithm=job.retrieval_algorithm,
+                    atmospheric_profile_model=job.atmospheric_profile_model,
+                    output_suffix=job.settings.output_suffix,
+                )
+            if config.retrieval.general.resume_queue:
+                queue_state = retrieval.utils.queue_state.QueueState.create(
+                    queue_fingerprint, job_queue.to_list()
+                )
+        main_logger.info(f"Generated retrieval queue with {len(job_queue)} items")
+        main_logger.horizontal_line(variant="=")
+    except KeyboardInterrupt:
+        _graceful_teardown()
+
+    dispatch_loop_is_running = True
     try:
         while True:
             # start as many new processes as possible
             while True:
-                if len(processes) == config.retrieval.general.max_process_count:
+                if not concurrency_controller.may_start_process(processes):
                     break
 
                 if job_queue.is_empty():
@@ -132,13 +258,51 @@ def run() -> None:
 
                 # start new processes
                 next_retrieval_job = job_queue.pop()
-                assert next_retrieval_job is not None
+                if next_retrieval_job is None:
+                    # only deferred jobs are left
+                    break
+                if lease_manager is not None:
+                    claim_result = lease_manager.try_claim(next_retrieval_job)
+                    if claim_result == "processed":
+                        main_logger.debug(
+                            f"Skipping {next_retrieval_job.sensor_data_context.sensor_id} "
+                            + f"{next_retrieval_job.sensor_data_context.from_datetime} "
+                            + "(processed by another node)"
+                        )
+                        if queue_state is not None:
+                            queue_state.set_state(next_retrieval_job, "done")
+                        continue
+                    if claim_result == "leased":
+                        # retried when the lease expires, i.e. after the
+                        # other node has finished it or has died
+                        lease_expiry = lease_manager.get_lease_expiry(next_retrieval_job)
+                        main_logger.debug(
+                            f"Deferring {next_retrieval_job.sensor_data_context.sensor_id} "
+                            + f"{next_retrieval_job.sensor_data_context.from_datetime} "
+                            + "(claimed by another node) until "
+                            + datetime.datetime.fromtimestamp(lease_expiry).isoformat()
+                        )
+                        job_queue.defer(next_retrieval_job, not_before=lease_expiry)
+                        continue
+                # proffast 1.0 does not support multiple processes per session
+                process_budget: int = 1
+                if next_retrieval_job.retrieval_algorithm != "proffast-1.0":
+                    process_budget = concurrency_controller.get_process_budget(
+                        processes, queued_job_count=len(job_queue)
+                    )
                 new_session = retrieval.session.create_session.run(
                     container_factory,
                     next_retrieval_job.sensor_data_context,
                     next_retrieval_job.retrieval_algorithm,
                     next_retrieval_job.atmospheric_profile_model,
                     next_retrieval_job.job_settings,
+                    process_budget=process_budget,
+                    invers_shard_count=min(
+                        process_budget, config.retrieval.general.max_invers_shards
+                    ),
+                    preprocess_slice_count=min(
+                        process_budget, config.retrieval.general.max_preprocess_slices
+                    ),
                 )
                 new_process = multiprocessing.get_context("spawn").Process(
                     target=retrieval.session.process_session.run,
@@ -151,29 +315,84 @@ def run() -> None:
                     daemon=True,
                 )
                 processes.append(new_process)
-                main_logger.info(f'process "{new_process.name}": starting')
+                process_jobs[new_process.name] = next_retrieval_job
+                concurrency_controller.set_process_budget(new_process.name, process_budget)
+                if queue_state is not None:
+                    queue_state.set_state(next_retrieval_job, "running")
+                main_logger.info(
+                    f'process "{new_process.name}": starting'
+                    + (f" with {process_budget} processes" if process_budget > 1 else "")
+                )
                 new_process.start()
 
-            # stop as many finished processes as possible
-            for finished_process in [p for p in processes if not p.is_alive()]:
-                finished_process.join()
-                processes.remove(finished_process)
-                main_logger.info(f'process "{finished_process.name}": finished processing')
-                container_factory.remove_container("-".join(finished_process.name.split("-")[-2:]))
-                main_logger.info(f'process "{finished_process.name}": removed container')
-
             if job_queue.is_empty() and (len(processes) == 0):
                 main_logger.info("No more things to process")
                 break
 
-            time.sleep(15)
+            # wait until at least one process has finished or a
+            # control message arrived - no polling interval needed
+            # except for renewing the job leases in distributed mode
+            # and for re-evaluating the adaptive process count
+            # and for exporting the metrics and for retrying the
+            # jobs deferred because of another node's lease
+            metrics_exporter.export(len(job_queue), len(processes))
+            wait_timeouts = [
+                t
+                for t in [
+                    None if lease_manager is None else lease_manager.heartbeat_interval,
+                    job_queue.get_deferral_timeout(),
+                    concurrency_controller.poll_interval,
+                    metrics_exporter.poll_interval,
+                ]
+                if t is not None
+            ]
+            ready_objects = multiprocessing.connection.wait(
+                [p.sentinel for p in processes] + [control_receiver],
+                timeout=(min(wait_timeouts) if len(wait_timeouts) > 0 else None),
+            )
+            if lease_manager is not None:
+                lease_manager.renew()
+            if control_receiver in ready_objects:
+                control_message = control_receiver.recv()
+                main_logger.info(f'Received control message "{control_message}"')
+                if control_message == "teardown":
+                    dispatch_loop_is_running = False
+                    _graceful_teardown()
+
+            # stop as many finished processes as possible, the
+            # containers are removed off the dispatch path
+            for finished_process in [p for p in processes if not p.is_alive()]:
+                finished_process.join()
+                processes.remove(finished_process)
+                finished_job = process_jobs.pop(finished_process.name)
+                finished_state = retrieval.utils.queue_state.get_finished_state(
+                    config, finished_job
+                )
+                if queue_state is not None:
+                    queue_state.set_state(finished_job, finished_state)
+                metrics_exporter.record_finished_session(
+                    finished_job.retrieval_algorithm, finished_state
+                )
+                if lease_manager is not None:
+                    lease_manager.release(finished_job)
+                main_logger.info(f'process "{finished_process.name}": finished processing')
+                container_factory.remove_container_in_background(
+                    "-".join(finished_process.name.split("-")[-2:])
+                )
+                main_logger.info(f'process "{finished_process.name}": scheduled container removal')
 
     except KeyboardInterrupt:
         main_logger.info("Keyboard interrupt")
     except Exception as e:
         main_logger.exception(e, "Unexpected error")
+    dispatch_loop_is_running = False
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
 
+    if lease_manager is not None:
+        lease_manager.release_all()
     container_factory.remove_all_containers()
+    metrics_exporter.export(len(job_queue), len(processes), force=True)
     main_logger.info("Automation is finished")
     main_logger.horizontal_line(variant="=")
     main_logger.archive()
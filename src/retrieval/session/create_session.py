@@ -68,8 +68,14 @@ def run(
     retrieval_algorithm: types.RetrievalAlgorithm,
     atmospheric_profile_model: types.AtmosphericProfileModel,
     job_settings: types.config.RetrievalJobSettingsConfig,
+    process_budget: int = 1,
+    invers_shard_count: int = 1,
+    preprocess_slice_count: int = 1,
 ) -> types.RetrievalSession:
-    """Create a new container and the pylot config files"""
+    """Create a new container and the pylot config files. `process_budget`
+    is the number of processes the Pylot of a Proffast 2.X session may use,
+    `invers_shard_count` and `preprocess_slice_count` the number of shards
+    its invers stage and the number of slices its preprocess stage may use."""
     new_session: types.RetrievalSession
 
     if retrieval_algorithm == "proffast-1.0":
@@ -85,6 +91,9 @@ def run(
             job_settings=job_settings,
             ctx=sensor_data_context,
             ctn=container_factory.create_container(retrieval_algorithm),  # pyright: ignore[reportArgumentType]
+            process_budget=process_budget,
+            invers_shard_count=invers_shard_count,
+            preprocess_slice_count=preprocess_slice_count,
         )
         _generate_pylot2_config(new_session)
         _generate_pylot2_log_format(new_session)
@@ -98,6 +107,7 @@ def run(
         from_datetime=sensor_data_context.from_datetime,
         output_suffix=job_settings.output_suffix,
         container_id=new_session.ctn.container_id,
+        process_count=(process_budget if retrieval_algorithm != "proffast-1.0" else 1),
         process_start_time=datetime.datetime.now(datetime.timezone.utc),
     )
     return new_session
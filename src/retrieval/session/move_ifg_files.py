@@ -1,12 +1,16 @@
+import csv
 import json
 import os
+import sqlite3
 import subprocess
-from typing import Optional
 
 import tum_esm_utils
 
 from src import retrieval, types, utils
 
+# reading the interferograms is I/O bound, especially on network file systems
+_STAGING_THREAD_COUNT = 8
+
 
 def run(
     config: types.Config,
@@ -61,54 +65,57 @@ def run(
     dst_date_path = os.path.join(session.ctn.data_input_path, "ifg", date_string[2:])
     os.mkdir(dst_date_path)
 
-    renamed_files: list[str] = []
-    instrument_vars = [
-        "ABP",
-        "LWN",
-        "RSN",
-        "TSC",
-        "DUR",
-        "MVD",
-        "PKA",
-        "PKL",
-        "PRA",
-        "PRL",
-        "P2A",
-        "P2L",
-        "P2R",
-        "P2K",
+    renamed_files = [f"{date_string[2:]}SN.{i + 1}" for i in range(len(ifg_filenames))]
+    for filename, renamed_file in zip(ifg_filenames, renamed_files):
+        os.symlink(
+            os.path.join(ifg_src_directory, filename), os.path.join(dst_date_path, renamed_file)
+        )
+
+    # COMPUTE CHECKSUMS AND READ OPUS HEADERS - ONLY FOR FILES
+    # THAT HAVE CHANGED SINCE THEY HAVE BEEN ADDED TO THE CATALOG
+
+    date = session.ctx.from_datetime.date()
+    catalog_entries = {
+        e.filename: e
+        for e in utils.ifg_catalog.InterferogramCatalog.get_day(session.ctx.sensor_id, date)
+    }
+    src_stats = [os.stat(os.path.join(ifg_src_directory, f)) for f in ifg_filenames]
+    new_filenames = [
+        f
+        for f, stat in zip(ifg_filenames, src_stats)
+        if (f not in catalog_entries) or (not catalog_entries[f].matches(stat))
     ]
-    file_checksums: list[str] = []
-    instrument_values: list[list[Optional[float]]] = []
-    for ifg_index, filename in enumerate(ifg_filenames):
-        src_path = os.path.join(ifg_src_directory, filename)
-        dst_path = os.path.join(dst_date_path, f"{date_string[2:]}SN.{ifg_index + 1}")
-        os.symlink(src_path, dst_path)
-        renamed_files.append(os.path.basename(dst_path))
-        file_checksums.append(tum_esm_utils.files.get_file_checksum(dst_path))
-
-        values: list[Optional[float]] = [None] * len(instrument_vars)
-        try:
-            opus_file = tum_esm_utils.opus.OpusFile.read(dst_path, interferogram_mode="skip")
-            for i, var in enumerate(instrument_vars):
-                values[i] = opus_file.channel_parameters[0].instrument.get(var, None)
-        except:
-            pass
-        instrument_values.append(values)
+    new_entries = utils.functions.concurrent_map(
+        lambda f: utils.ifg_catalog.read_interferogram(
+            os.path.join(ifg_src_directory, f), session.ctx.sensor_id, date
+        ),
+        new_filenames,
+        _STAGING_THREAD_COUNT,
+    )
+    logger.debug(
+        f"Read {len(new_entries)} ifg files, "
+        + f"{len(ifg_filenames) - len(new_entries)} were already in the catalog"
+    )
+    try:
+        utils.ifg_catalog.InterferogramCatalog.add_entries(new_entries)
+    except sqlite3.Error as e:
+        logger.warning(f"Could not add the ifg files to the catalog: {e}")
+    catalog_entries.update({e.filename: e for e in new_entries})
+    ifg_entries = [catalog_entries[f] for f in ifg_filenames]
 
     # SAVE STATISTICS ABOUT INTERFEROGRAMS
 
-    opus_files_content = "opus_filename,retrieval_filename,checksum," + ",".join(
-        [f"instrument_{var}" for var in instrument_vars]
-    )
-    for i in range(len(ifg_filenames)):
-        opus_files_content += f"\n{ifg_filenames[i]},{renamed_files[i]},{file_checksums[i]},"
-        opus_files_content += ",".join(
-            [str(v) if v is not None else "" for v in instrument_values[i]]
+    with open(os.path.join(session.ctn.container_path, "opus_file_stats.csv"), "w") as csv_file:
+        writer = csv.writer(csv_file, lineterminator="\n")
+        writer.writerow(
+            ["opus_filename", "retrieval_filename", "checksum"]
+            + [f"instrument_{var}" for var in utils.ifg_catalog.INSTRUMENT_VARS]
         )
-    tum_esm_utils.files.dump_file(
-        os.path.join(session.ctn.container_path, "opus_file_stats.csv"), opus_files_content
-    )
+        for renamed_file, entry in zip(renamed_files, ifg_entries):
+            writer.writerow(
+                [entry.filename, renamed_file, entry.checksum]
+                + [entry.instrument[var] for var in utils.ifg_catalog.INSTRUMENT_VARS]
+            )
 
     # OPTIONALLY EXCLUDE CORRUPT INTERFEROGRAM FILES
 
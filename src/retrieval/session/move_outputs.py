@@ -1,6 +1,7 @@
 import datetime
 import os
 import shutil
+from typing import Optional
 
 import tum_esm_utils
 
@@ -12,7 +13,10 @@ def run(
     logger: "retrieval.utils.logger.Logger",
     session: types.RetrievalSession,
     test_mode: bool = False,
+    timings: Optional[list[types.RetrievalStageTiming]] = None,
 ) -> None:
+    """Move the outputs of a session to the results directory. `timings`
+    are the stages of the session so far, stored in its `about.json`."""
     assert config.retrieval is not None
 
     date_string = session.ctx.from_datetime.strftime("%Y%m%d")
@@ -52,12 +56,9 @@ def run(
         logger.debug("Retrieval output csv is missing")
 
     # DETERMINE OUTPUT DIRECTORY PATHS
-    output_slug = session.ctx.from_datetime.strftime("%Y%m%d")
-    if not utils.functions.sdc_covers_the_full_day(session.ctx):
-        output_slug += session.ctx.from_datetime.strftime("_%H%M%S")
-        output_slug += session.ctx.to_datetime.strftime("_%H%M%S")
-    if session.job_settings.output_suffix is not None:
-        output_slug += f"_{session.job_settings.output_suffix}"
+    output_slug = utils.functions.get_output_folder_slug(
+        session.ctx, session.job_settings.output_suffix
+    )
 
     output_dst = os.path.join(
         config.general.data.results.root,
@@ -152,10 +153,16 @@ def run(
     # STORE AUTOMATION LOGS
 
     os.makedirs(os.path.join(output_dst_tmp, "logfiles"), exist_ok=True)
+    logger.flush()
     shutil.copyfile(
         logger.logfile_path,
         os.path.join(output_dst_tmp, "logfiles", "container.log"),
     )
+    if os.path.isfile(session.ctn.executable_usage_path):
+        shutil.copyfile(
+            session.ctn.executable_usage_path,
+            os.path.join(output_dst_tmp, "logfiles", "executable_usage.jsonl"),
+        )
     if isinstance(session.ctn, types.Proffast22Container):
         shutil.copyfile(
             session.ctn.pylot_log_format_path,
@@ -189,6 +196,7 @@ def run(
                 retrieval=dumped_config.retrieval,
             ),
             session=session,
+            timings=timings or [],
         )
         f.write(about.model_dump_json(indent=4))
 
@@ -14,11 +14,19 @@ from . import (
 )
 
 
+class _SessionKilled(BaseException):
+    """Raised by the teardown hook when the session process receives
+    SIGINT or SIGTERM - not an `Exception`, so that the stages do not
+    catch it."""
+
+
 def run(config: types.Config, session: types.RetrievalSession, test_mode: bool = False) -> None:
     signal.signal(signal.SIGINT, signal.SIG_IGN)
+    assert config.retrieval is not None
     logger = retrieval.utils.logger.Logger(
         container_id=session.ctn.container_id,
         # print_to_console=test_mode,
+        log_format=config.retrieval.general.log_format,
     )
     logger.info(f"Starting session in container id {session.ctn.container_id}")
     logger.info(
@@ -26,56 +34,122 @@ def run(config: types.Config, session: types.RetrievalSession, test_mode: bool =
         + f"from {session.ctx.from_datetime} to {session.ctx.to_datetime}"
     )
     logger.debug(f"Session object: {session.model_dump_json(indent=4)}")
+    timings: list[types.RetrievalStageTiming] = []
 
     def _last_will() -> None:
+        executable_usage = retrieval.utils.process_accounting.summarize_executable_usage(
+            retrieval.utils.process_accounting.load_executable_usage(
+                session.ctn.executable_usage_path
+            )
+        )
         retrieval.utils.retrieval_status.RetrievalStatusList.update_item(
             session.retrieval_algorithm,
             session.atmospheric_profile_model,
             session.ctx.sensor_id,
             session.ctx.from_datetime,
             session.job_settings.output_suffix,
+            executable_cpu_seconds=(
+                round(
+                    sum(u.user_time_seconds + u.system_time_seconds for u in executable_usage),
+                    3,
+                )
+                if len(executable_usage) > 0
+                else None
+            ),
+            executable_max_rss_mb=(
+                max(u.max_rss_mb for u in executable_usage) if len(executable_usage) > 0 else None
+            ),
             process_end_time=datetime.datetime.now(tz=datetime.timezone.utc),
         )
+        try:
+            retrieval.utils.telemetry.append_session_metrics(session, timings)
+        except Exception as e:
+            logger.exception(e, label="Could not write the session metrics")
         logger.archive()
 
-    def _graceful_teardown(*args: Any) -> None:
+    def _on_signal(*args: Any) -> None:
+        # the teardown runs outside of the signal handler, which might
+        # have interrupted the logger or a database transaction
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        raise _SessionKilled()
+
+    try:
+        signal.signal(signal.SIGINT, _on_signal)
+        signal.signal(signal.SIGTERM, _on_signal)
+        logger.info("Established graceful teardown hook")
+        _run_stages(config, logger, session, timings, test_mode)
+    except _SessionKilled:
         logger.info("Container was killed")
-        _last_will()
-        exit(0)
+    except Exception as e:
+        logger.exception(e, label="Session failed unexpectedly")
+    finally:
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        try:
+            _last_will()
+        finally:
+            # the buffered tail of the log must not be lost on crashes
+            logger.close()
 
-    signal.signal(signal.SIGINT, _graceful_teardown)
-    signal.signal(signal.SIGTERM, _graceful_teardown)
-    logger.info("Established graceful teardown hook")
 
+def _run_stages(
+    config: types.Config,
+    logger: "retrieval.utils.logger.Logger",
+    session: types.RetrievalSession,
+    timings: list[types.RetrievalStageTiming],
+    test_mode: bool,
+) -> None:
+    logger.set_stage("inputs")
     try:
         logger.debug("Moving atmospheric profiles")
-        move_profiles.run(config, session)
+        with retrieval.utils.telemetry.measure_stage("move_profiles", timings):
+            move_profiles.run(config, session)
 
         logger.debug("Moving ground pressure files")
-        move_log_files.run(config, logger, session)
+        with retrieval.utils.telemetry.measure_stage("move_log_files", timings):
+            move_log_files.run(config, logger, session)
 
         logger.debug("Moving interferograms")
-        valid_ifg_count = move_ifg_files.run(config, logger, session)
+        with retrieval.utils.telemetry.measure_stage("move_ifg_files", timings):
+            valid_ifg_count = move_ifg_files.run(config, logger, session)
     except Exception as e:
         logger.warning(f"Inputs incomplete: {e}")
-        _last_will()
         return
 
     if valid_ifg_count > 0:
+        logger.set_stage("templates")
         logger.info("Updating retrieval templates")
         try:
-            update_templates.run(logger, session)
+            with retrieval.utils.telemetry.measure_stage("update_templates", timings):
+                update_templates.run(logger, session)
         except Exception as e:
             logger.exception(e, label="Failed to update templates")
-            _last_will()
             return
 
+        logger.set_stage("proffast")
         logger.info("Running proffast")
         try:
-            run_retrieval.run(session, test_mode=test_mode)
+            with retrieval.utils.telemetry.measure_stage(
+                "run_retrieval", timings, session.ctn.executable_usage_path
+            ):
+                run_retrieval.run(config, session, test_mode=test_mode)
             logger.debug("Pylot execution was successful")
         except Exception as e:
             logger.exception(e, label="Proffast execution failed")
+        if isinstance(session.ctn, types.Proffast22Container):
+            timings.extend(
+                retrieval.utils.telemetry.load_stage_timings(session.ctn.pylot_timings_path)
+            )
+        for u in retrieval.utils.process_accounting.summarize_executable_usage(
+            retrieval.utils.process_accounting.load_executable_usage(
+                session.ctn.executable_usage_path
+            )
+        ):
+            logger.debug(
+                f"{u.executable}: {u.call_count} call(s), {u.user_time_seconds}s user, "
+                + f"{u.system_time_seconds}s system, max RSS {u.max_rss_mb} MB"
+            )
     else:
         logger.info("Skipping proffast execution because there are no valid interferograms")
 
@@ -83,11 +157,11 @@ def run(config: types.Config, session: types.RetrievalSession, test_mode: bool =
     # proffast outputs of one day in this working directory
     # return
 
+    logger.set_stage("outputs")
     logger.info("Moving the outputs")
     try:
-        move_outputs.run(config, logger, session, test_mode=test_mode)
+        with retrieval.utils.telemetry.measure_stage("move_outputs", timings):
+            move_outputs.run(config, logger, session, test_mode=test_mode, timings=timings)
         logger.info("Finished")
     except Exception as e:
         logger.exception(e, label="Moving outputs failed")
-
-    _last_will()
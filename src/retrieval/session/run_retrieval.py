@@ -1,6 +1,7 @@
 import json
 import os
 import sys
+from typing import Any
 
 import tum_esm_utils
 
@@ -9,7 +10,7 @@ from src import types
 _PROJECT_DIR = tum_esm_utils.files.get_parent_dir_path(__file__, current_depth=4)
 
 
-def run(session: types.RetrievalSession, test_mode: bool = False) -> None:
+def run(config: types.Config, session: types.RetrievalSession, test_mode: bool = False) -> None:
     if test_mode:
         _create_mock_outputs(session)
         return
@@ -25,6 +26,21 @@ def run(session: types.RetrievalSession, test_mode: bool = False) -> None:
             )
         )
     elif isinstance(session, types.Proffast2RetrievalSession):  # pyright: ignore[reportUnnecessaryIsInstance]
+        assert config.retrieval is not None
+        pylot_options: dict[str, Any] = {
+            "n_processes": session.process_budget,
+            "invers_shards": session.invers_shard_count,
+            "preprocess_slices": session.preprocess_slice_count,
+            "timings_path": session.ctn.pylot_timings_path,
+            "executable_usage_path": session.ctn.executable_usage_path,
+        }
+        for cache_name, cache_config in [
+            ("abscos_cache", config.retrieval.general.abscos_cache),
+            ("spectra_cache", config.retrieval.general.spectra_cache),
+        ]:
+            if cache_config is not None:
+                pylot_options[f"{cache_name}_dir"] = cache_config.directory
+                pylot_options[f"{cache_name}_max_size_gb"] = cache_config.max_size_gb
         tum_esm_utils.shell.run_shell_command(
             " ".join(
                 [
@@ -40,6 +56,7 @@ def run(session: types.RetrievalSession, test_mode: bool = False) -> None:
                     session.ctn.container_dir,
                     session.ctn.container_id,
                     session.ctn.pylot_config_path,
+                    '"' + json.dumps(pylot_options).replace('"', '\\"') + '"',
                 ]
             )
         )
@@ -1,8 +1,17 @@
+from . import abscos_cache as abscos_cache
+from . import file_cache as file_cache
 from . import ils as ils
+from . import invers_sharding as invers_sharding
 from . import invparms_files as invparms_files
 from . import job_queue as job_queue
 from . import logger as logger
+from . import preprocess_splitting as preprocess_splitting
 from . import pressure_averaging as pressure_averaging
 from . import pressure_loading as pressure_loading
+from . import process_accounting as process_accounting
+from . import queue_state as queue_state
 from . import queue_watcher as queue_watcher
 from . import retrieval_status as retrieval_status
+from . import spectra_cache as spectra_cache
+from . import telemetry as telemetry
+from . import throughput as throughput
@@ -0,0 +1,123 @@
+import hashlib
+import os
+from typing import Any, Optional, Sequence, cast
+
+from src import retrieval
+
+# the files pcxs writes for one date -> the Proffast directory they are written to
+PCXS_OUTPUT_FILES: dict[str, str] = {
+    "abscos.bin": "wrk_fast",
+    "pT_fast_out.dat": "wrk_fast",
+    "VMR_fast_out.dat": "wrk_fast",
+    "colsens.dat": "out_fast",
+}
+# without these, the outputs of a pcxs call are not cached
+_REQUIRED_OUTPUT_FILES = ["abscos.bin", "pT_fast_out.dat", "VMR_fast_out.dat"]
+
+# the pcxs parameters that only name the sensor or point into its
+# container - they do not change the content of the outputs
+_SESSION_SPECIFIC_PARAMETERS = ["SITE", "DATAPATH", "MAPPATH", "MAPPATH_WITH_MAPFILE"]
+
+
+class AbscosCacheMixin:
+    """Mixin for the `Pylot` class of any Proffast 2.X version that skips
+    pcxs calls whose outputs are already in the `FileCache` at
+    `abscos_cache_dir`, and adds the outputs of all other pcxs calls to it.
+
+    The cache key is the hash of the pcxs input file with the sensor- and
+    container-specific paths left out, the content of the map file and the
+    pcxs executable. Hence, co-located sensors and reruns of the same day
+    share the pcxs outputs, while any change to the location, the pressure,
+    the atmospheric profile or the Proffast version leads to a new entry.
+
+    Use it as `class ShardedPylot(AbscosCacheMixin, Pylot)` at module level,
+    so that the Pylot's multiprocessing pool can pickle it."""
+
+    abscos_cache_dir: Optional[str] = None
+    abscos_cache_max_size_gb: float = 50
+    proffast_path: str
+    logger: Any
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        # pcxs input file -> (cache key, prefix of the output file names)
+        self.abscos_cache_keys: dict[str, tuple[str, str]] = {}
+
+    def replace_params_in_template(
+        self,
+        parameters: dict[str, Any],
+        template_type: str,
+        prf_input_file: str,
+    ) -> None:
+        super().replace_params_in_template(parameters, template_type, prf_input_file)  # type: ignore
+        if (template_type != "pcxs") or (self.abscos_cache_dir is None):
+            return
+
+        key_input_file = prf_input_file + ".cachekey"
+        super().replace_params_in_template(  # type: ignore
+            {
+                **parameters,
+                **{p: f"$({p})" for p in _SESSION_SPECIFIC_PARAMETERS if p in parameters},
+            },
+            template_type,
+            key_input_file,
+        )
+        with open(key_input_file, "rb") as f:
+            key_input = f.read()
+        os.remove(key_input_file)
+
+        if "MAPPATH_WITH_MAPFILE" in parameters:
+            map_file = str(parameters["MAPPATH_WITH_MAPFILE"])
+        else:
+            map_file = os.path.join(
+                str(parameters["MAPPATH"]),
+                f"{parameters['SITE_ABBREV']}{parameters['DATE_LONG']}.map",
+            )
+        executable = cast(str, self._get_executable("pcxs"))  # type: ignore
+
+        hasher = hashlib.sha256(key_input)
+        hasher.update(retrieval.utils.file_cache.get_file_digest(map_file).encode())
+        hasher.update(retrieval.utils.file_cache.get_executable_digest(executable).encode())
+        self.abscos_cache_keys[prf_input_file] = (
+            hasher.hexdigest(),
+            f"{parameters['SITE']}{parameters['DATE']}-",
+        )
+
+    def run_prf_with_inputfile(
+        self,
+        prf_inputfile: str,
+        executable: str,
+        popen_kwargs: dict[str, Any] = {},
+    ) -> Any:
+        if (prf_inputfile not in self.abscos_cache_keys) or (self.abscos_cache_dir is None):
+            return super().run_prf_with_inputfile(  # type: ignore
+                prf_inputfile, executable, popen_kwargs=popen_kwargs
+            )
+
+        key, prefix = self.abscos_cache_keys[prf_inputfile]
+        # abscos.bin files are large and deleted by the Pylot after invers
+        cache = retrieval.utils.file_cache.FileCache(
+            self.abscos_cache_dir,
+            int(self.abscos_cache_max_size_gb * 1e9),
+            hardlink=lambda filename: filename == "abscos.bin",
+        )
+        output_paths = {
+            filename: os.path.join(self.proffast_path, dirname, prefix + filename)
+            for filename, dirname in PCXS_OUTPUT_FILES.items()
+        }
+        if cache.restore(key, lambda filename: output_paths[filename]):
+            message = f"Restored the pcxs outputs {prefix}* from the abscos cache ({key[:12]})"
+            self.logger.info(message)
+            return message, "", "0", f"abscos cache {key}"
+
+        output = cast(
+            Sequence[str],
+            super().run_prf_with_inputfile(  # type: ignore
+                prf_inputfile, executable, popen_kwargs=popen_kwargs
+            ),
+        )
+        if (output[2] == "0") and all(
+            os.path.isfile(output_paths[f]) for f in _REQUIRED_OUTPUT_FILES
+        ):
+            cache.store(key, output_paths)
+        return output
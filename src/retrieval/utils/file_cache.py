@@ -0,0 +1,136 @@
+import functools
+import hashlib
+import os
+import shutil
+import time
+import uuid
+from typing import Callable
+
+# temporary directories older than this are left over from crashed sessions
+_STALE_TMP_DIR_AGE = 24 * 3600
+
+
+def get_file_digest(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def get_executable_digest(path: str) -> str:
+    """The Proffast executables do not change while the retrieval is running."""
+
+    return get_file_digest(path)
+
+
+def _link_or_copy(src: str, dst: str) -> None:
+    """Hardlink `src` to `dst` and fall back to copying when they are on
+    different file systems."""
+
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+class FileCache:
+    """Host-level cache of Proffast outputs. Every entry is a flat directory
+    of files named by the hash of all inputs that produced them. Entries are
+    populated in a temporary directory and renamed into place, so concurrent
+    sessions only ever see complete entries. Restoring an entry touches it,
+    and the least recently used entries are removed whenever the cache
+    grows beyond `max_size` bytes.
+
+    Files for which `hardlink` returns `True` are hardlinked into and out of
+    the cache (if possible) instead of copied - this is only safe for files
+    that are never modified in place."""
+
+    def __init__(
+        self,
+        directory: str,
+        max_size: int,
+        hardlink: Callable[[str], bool] = lambda filename: False,
+    ) -> None:
+        self.directory = directory
+        self.max_size = max_size
+        self.hardlink = hardlink
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def _add_file(self, filename: str, src: str, dst: str) -> None:
+        if self.hardlink(filename):
+            _link_or_copy(src, dst)
+        else:
+            shutil.copyfile(src, dst)
+
+    def restore(self, key: str, destination: Callable[[str], str]) -> bool:
+        """Link or copy every file of an entry to `destination(filename)`.
+        Returns `False` if the entry does not exist or was evicted while
+        restoring it."""
+
+        entry_path = self._entry_path(key)
+        restored: list[str] = []
+        try:
+            for filename in os.listdir(entry_path):
+                self._add_file(filename, os.path.join(entry_path, filename), destination(filename))
+                restored.append(destination(filename))
+            os.utime(entry_path)
+        except FileNotFoundError:
+            for path in restored:
+                os.remove(path)
+            return False
+        return True
+
+    def store(self, key: str, sources: dict[str, str]) -> None:
+        """Add the existing files of `sources` (file name -> path) as a new
+        entry. If another session stored the same entry in the meantime,
+        the new one is discarded."""
+
+        entry_path = self._entry_path(key)
+        if os.path.isdir(entry_path):
+            os.utime(entry_path)
+            return
+
+        tmp_path = os.path.join(self.directory, f".tmp-{key}-{uuid.uuid4().hex}")
+        os.mkdir(tmp_path)
+        for filename, src in sources.items():
+            if os.path.isfile(src):
+                self._add_file(filename, src, os.path.join(tmp_path, filename))
+        try:
+            os.rename(tmp_path, entry_path)
+        except OSError:
+            shutil.rmtree(tmp_path)
+        self.evict()
+
+    def evict(self) -> None:
+        """Remove the least recently used entries until the cache fits into
+        `max_size` and remove stale temporary directories."""
+
+        entries: list[tuple[float, int, str]] = []
+        for e in os.scandir(self.directory):
+            if not e.is_dir():
+                continue
+            if e.name.startswith(".tmp-"):
+                if (time.time() - e.stat().st_mtime) > _STALE_TMP_DIR_AGE:
+                    shutil.rmtree(e.path, ignore_errors=True)
+                continue
+            try:
+                size = sum(f.stat().st_size for f in os.scandir(e.path))
+                entries.append((e.stat().st_mtime, size, e.path))
+            except FileNotFoundError:
+                continue
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            # renamed first so that no session restores a half-deleted entry
+            tmp_path = os.path.join(self.directory, f".tmp-evicted-{uuid.uuid4().hex}")
+            try:
+                os.rename(path, tmp_path)
+            except FileNotFoundError:
+                continue
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            total_size -= size
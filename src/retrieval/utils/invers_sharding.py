@@ -0,0 +1,281 @@
+import concurrent.futures
+import os
+import string
+import struct
+from typing import Any, Optional, cast
+
+# spectra at the end of the previous shard that are retrieved again at
+# the beginning of a shard, so that the retrieval parameter persistence
+# of invers has settled when the first spectrum of the shard is reached
+WARMUP_SPECTRA = 10
+
+# shards with fewer spectra are not worth the additional invers call
+MIN_SPECTRA_PER_SHARD = 100
+
+# the Pylot only picks up output files with a single character suffix
+_SHARD_SUFFIXES = string.ascii_lowercase
+
+
+class InversShard:
+    """One invers call of a sharded spectra list.
+
+    `spectra_pT_input` are the lines of the invers input file, the first
+    `warmup_spectra` of which only serve as a warm-up and are removed from
+    the output."""
+
+    def __init__(self, suffix: str, spectra_pT_input: list[str], warmup_spectra: int) -> None:
+        self.suffix = suffix
+        self.spectra_pT_input = spectra_pT_input
+        self.warmup_spectra = warmup_spectra
+
+    @property
+    def warmup_spectrum_names(self) -> set[str]:
+        return set(
+            line.split(",")[0].strip() for line in self.spectra_pT_input[: self.warmup_spectra]
+        )
+
+
+def split_spectra_pT_input(
+    spectra_pT_input: list[str],
+    shard_count: int,
+    suffixes: list[str],
+) -> list[InversShard]:
+    """Split the spectra of one invers call into at most `shard_count`
+    time-contiguous shards (the spectra are sorted by time already). Every
+    shard but the first starts with `WARMUP_SPECTRA` spectra of the previous
+    shard."""
+
+    shard_count = max(
+        1, min(shard_count, len(suffixes), len(spectra_pT_input) // MIN_SPECTRA_PER_SHARD)
+    )
+    bounds = [round(i * len(spectra_pT_input) / shard_count) for i in range(shard_count + 1)]
+    shards: list[InversShard] = []
+    for i in range(shard_count):
+        start = bounds[i] if i == 0 else max(0, bounds[i] - WARMUP_SPECTRA)
+        shards.append(
+            InversShard(
+                suffix=suffixes[i],
+                spectra_pT_input=spectra_pT_input[start : bounds[i + 1]],
+                warmup_spectra=bounds[i] - start,
+            )
+        )
+    return shards
+
+
+def merge_invparms_files(
+    shards: list[InversShard],
+    input_paths: list[str],
+    output_path: str,
+) -> None:
+    """Concatenate the `invparms` files of the shards of one invers call.
+    The header is taken from the first file, the rows of the warm-up
+    spectra are dropped."""
+
+    header: Optional[str] = None
+    rows: list[str] = []
+    for shard, input_path in zip(shards, input_paths):
+        with open(input_path, "r") as f:
+            lines = f.read().splitlines(keepends=True)
+        if len(lines) == 0:
+            continue
+        header = header or lines[0]
+        spectrum_column = [c.strip() for c in header.split(",")].index("spectrum")
+        warmup_spectrum_names = shard.warmup_spectrum_names
+        rows.extend(
+            line
+            for line in lines[1:]
+            if line.split(",")[spectrum_column].strip() not in warmup_spectrum_names
+        )
+    with open(output_path, "w") as f:
+        f.write(header or "")
+        f.writelines(rows)
+
+
+def merge_spc_files(
+    shards: list[InversShard],
+    input_paths: list[str],
+    output_path: str,
+) -> None:
+    """Concatenate the `jobXX.spc` files of the shards of one invers call,
+    dropping the spectra of the warm-up spectra.
+
+    These files start with the number of spectra and the number of spectral
+    points (two int32), followed by one fixed-size record per spectrum that
+    starts with the name of the spectrum."""
+
+    point_count: Optional[int] = None
+    records: list[bytes] = []
+    for shard, input_path in zip(shards, input_paths):
+        with open(input_path, "rb") as f:
+            content = f.read()
+        spectrum_count, file_point_count = struct.unpack("<ii", content[:8])
+        assert (point_count is None) or (point_count == file_point_count), (
+            f"inconsistent number of spectral points in {input_path}"
+        )
+        point_count = file_point_count
+        if spectrum_count == 0:
+            continue
+        record_size = (len(content) - 8) // spectrum_count
+        warmup_spectrum_names = set(n.encode() for n in shard.warmup_spectrum_names)
+        for i in range(spectrum_count):
+            record = content[8 + i * record_size : 8 + (i + 1) * record_size]
+            if not any(record.startswith(n) for n in warmup_spectrum_names):
+                records.append(record)
+    with open(output_path, "wb") as f:
+        f.write(struct.pack("<ii", len(records), point_count or 0))
+        f.writelines(records)
+
+
+class InversShardingMixin:
+    """Mixin for the `Pylot` class of any Proffast 2.X version that splits
+    every invers call with at least `2 * MIN_SPECTRA_PER_SHARD` spectra into
+    up to `invers_shard_count` shards. The shards are run as separate invers
+    calls (in parallel when the Pylot is run with `n_processes > 1`) and
+    their outputs are merged back into the files of the unsharded call
+    before the Pylot moves the results, so the rest of the pipeline does
+    not see any difference.
+
+    The `run_inv` of Proffast 2.4 only runs the last input file of every
+    local date. Hence, when a call of a local date has been sharded, the
+    input files of that date are collected into a single batch (see
+    `generate_invers_input`), whose invers calls are run by
+    `run_prf_with_inputfile` with up to `n_processes` at a time. Local
+    dates without sharded calls are run exactly like by the plain Pylot.
+
+    Use it as `class ShardedPylot(InversShardingMixin, Pylot)` at module
+    level, so that the Pylot's multiprocessing pool can pickle it."""
+
+    invers_shard_count: int = 1
+    proffast_path: str
+    logger: Any
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+
+    def get_inv_parameters(self, *args: Any, **kwargs: Any) -> Any:
+        # Proffast 2.4 and later also return the skipped spectra
+        result: Any = super().get_inv_parameters(*args, **kwargs)  # type: ignore
+        parameter_list = cast(
+            list[Optional[dict[str, Any]]], result[0] if isinstance(result, tuple) else result
+        )
+
+        # the shards of all invers calls of a day need distinct suffixes
+        original_suffixes = [p["SUFFIX"] for p in parameter_list if p is not None]
+        available_suffixes = [s for s in _SHARD_SUFFIXES if s not in original_suffixes]
+        shards_per_call = min(
+            self.invers_shard_count,
+            1 + len(available_suffixes) // max(1, len(original_suffixes)),
+        )
+        sharded_parameter_list: list[Any] = []
+        for parameters in parameter_list:
+            if parameters is None:
+                sharded_parameter_list.append(None)
+                continue
+            shards = split_spectra_pT_input(
+                parameters["SPECTRA_PT_INPUT"].split("\n"),
+                shards_per_call,
+                [parameters["SUFFIX"], *available_suffixes],
+            )
+            if len(shards) == 1:
+                sharded_parameter_list.append(parameters)
+                continue
+            for shard in shards:
+                if shard.suffix != parameters["SUFFIX"]:
+                    available_suffixes.remove(shard.suffix)
+                sharded_parameter_list.append(
+                    {
+                        **parameters,
+                        "SUFFIX": shard.suffix,
+                        "SPECTRA_PT_INPUT": "\n".join(shard.spectra_pT_input),
+                    }
+                )
+            self.invers_shards.append((parameters, shards))
+
+        if isinstance(result, tuple):
+            return (sharded_parameter_list, *result[1:])
+        return sharded_parameter_list
+
+    def generate_invers_input(self, *args: Any, **kwargs: Any) -> Any:
+        # Proffast 2.4 and later also return the skipped spectra
+        sharded_call_count = len(self.invers_shards)
+        result: Any = super().generate_invers_input(*args, **kwargs)  # type: ignore
+        input_files = cast(list[Optional[str]], result[0] if isinstance(result, tuple) else result)
+        batch = [f for f in input_files if f is not None]
+        if (len(self.invers_shards) > sharded_call_count) and (len(batch) > 1):
+            self.invers_input_batches[batch[0]] = batch
+            input_files = [batch[0]]
+        if isinstance(result, tuple):
+            return (input_files, *result[1:])
+        return input_files
+
+    def run_prf_with_inputfile(self, prf_inputfile: str, *args: Any, **kwargs: Any) -> Any:
+        batch = self.invers_input_batches.get(prf_inputfile)
+        if batch is None:
+            return super().run_prf_with_inputfile(prf_inputfile, *args, **kwargs)  # type: ignore
+
+        def run_invers(input_file: str) -> tuple[str, str, str, str]:
+            return cast(
+                tuple[str, str, str, str],
+                super(InversShardingMixin, self).run_prf_with_inputfile(  # type: ignore
+                    input_file, *args, **kwargs
+                ),
+            )
+
+        # invers runs as a separate process, so threads suffice
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, min(len(batch), self.invers_n_processes))
+        ) as executor:
+            outputs = list(executor.map(run_invers, batch))
+        return (
+            "\n".join(o[0] for o in outputs),
+            "\n".join(o[1] for o in outputs if o[1] != ""),
+            next((o[2] for o in outputs if o[2] != "0"), "0"),
+            "\n".join(o[3] for o in outputs),
+        )
+
+    def run_inv(self, n_processes: int = 1) -> None:
+        # list of (parameters of the unsharded call, its shards)
+        self.invers_shards: list[tuple[dict[str, Any], list[InversShard]]] = []
+        # first input file of a local date -> all input files of that date
+        self.invers_input_batches: dict[str, list[str]] = {}
+        self.invers_n_processes = n_processes
+        super().run_inv(n_processes=n_processes)  # type: ignore
+        for parameters, shards in self.invers_shards:
+            self._merge_invers_shards(parameters, shards)
+
+    def _merge_invers_shards(self, parameters: dict[str, Any], shards: list[InversShard]) -> None:
+        prefix = os.path.join(
+            self.proffast_path, "out_fast", f"{parameters['SITE']}{parameters['LOCAL_DATE']}-"
+        )
+        suffix = parameters["SUFFIX"]
+
+        def shard_files(filename_pattern: str) -> list[str]:
+            return [prefix + filename_pattern.replace("?", s.suffix) for s in shards]
+
+        invparms_paths = shard_files("invparms_?.dat")
+        missing_paths = [p for p in invparms_paths if not os.path.isfile(p)]
+        if len(missing_paths) > 0:
+            raise RuntimeError(
+                f"Not all invers shards of {prefix}*_{suffix} produced an "
+                + f"invparms file, missing: {missing_paths}"
+            )
+
+        self.logger.info(f"Merging {len(shards)} invers shards into {prefix}*_{suffix}")
+        merged_files: list[tuple[list[str], str]] = []
+        merge_invparms_files(shards, invparms_paths, prefix + f"invparms_{suffix}.dat.merged")
+        merged_files.append((invparms_paths, prefix + f"invparms_{suffix}.dat.merged"))
+        for job_index in range(1, 10):
+            spc_paths = shard_files(f"job0{job_index}_?.spc")
+            if all(os.path.isfile(p) for p in spc_paths):
+                merge_spc_files(shards, spc_paths, prefix + f"job0{job_index}_{suffix}.spc.merged")
+                merged_files.append((spc_paths, prefix + f"job0{job_index}_{suffix}.spc.merged"))
+
+        # replace the shard files by the merged files, the version
+        # file of the first shard already has the original suffix
+        for shard_paths, merged_path in merged_files:
+            for p in shard_paths:
+                os.remove(p)
+            os.rename(merged_path, merged_path.removesuffix(".merged"))
+        for p in shard_files("version_?.dat")[1:]:
+            if os.path.isfile(p):
+                os.remove(p)
@@ -1,22 +1,57 @@
-from typing import Optional
+import heapq
+import statistics
+import time
+from typing import Literal, Optional
 
 import em27_metadata
 import pydantic
 
 from src import types
 
+from .retrieval_status import RetrievalStatus
+
 
 class RetrievalJob(pydantic.BaseModel):
     retrieval_algorithm: types.RetrievalAlgorithm
     atmospheric_profile_model: types.AtmosphericProfileModel
     sensor_data_context: em27_metadata.types.SensorDataContext
     job_settings: types.config.RetrievalJobSettingsConfig
+    job_id: int = 0
+    estimated_cost: float = 0.0
 
 
 class RetrievalJobQueue:
-    def __init__(self) -> None:
-        self.queue: list[RetrievalJob] = []
-        self.current_job_index: int = 0
+    """Queue of retrieval jobs.
+
+    With the ordering `newest-first`, the jobs are popped in the order in
+    which they were pushed (the retrieval queue is already sorted by date).
+    With the ordering `longest-first`, the jobs with the highest estimated
+    cost are popped first (longest-processing-time-first scheduling), so
+    that a very long sensor-day does not start at the end of the run and
+    stretch the total processing time. Jobs with the same cost are popped
+    in the order in which they were pushed.
+
+    Jobs pushed with `requeued=True` (sessions that were interrupted in a
+    previous run) are popped before all other jobs.
+
+    Jobs can be deferred until a given time with `defer` (e.g. while
+    another node holds a lease on them). They are popped again in their
+    original order once that time has passed.
+
+    Every job gets a job id that identifies it even if two jobs have the
+    same inputs: the number of jobs pushed before it, or the id it had in
+    the queue of a previous run."""
+
+    def __init__(
+        self,
+        ordering: Literal["newest-first", "longest-first"] = "newest-first",
+    ) -> None:
+        self.ordering = ordering
+        self.queue: list[tuple[int, float, int, RetrievalJob]] = []
+        self.deferred: list[tuple[float, tuple[int, float, int, RetrievalJob]]] = []
+        self.push_count: int = 0
+        # the heap entry of the last popped job, so that it can be deferred
+        self.last_popped_entry: Optional[tuple[int, float, int, RetrievalJob]] = None
 
     def push(
         self,
@@ -24,31 +59,112 @@ class RetrievalJobQueue:
         atmospheric_profile_model: types.AtmosphericProfileModel,
         sensor_data_context: em27_metadata.types.SensorDataContext,
         job_settings: types.config.RetrievalJobSettingsConfig,
+        estimated_cost: float = 0.0,
+        requeued: bool = False,
+        job_id: Optional[int] = None,
     ) -> None:
-        self.queue.append(
-            RetrievalJob(
-                retrieval_algorithm=retrieval_algorithm,
-                atmospheric_profile_model=atmospheric_profile_model,
-                sensor_data_context=sensor_data_context,
-                job_settings=job_settings,
-            )
+        job = RetrievalJob(
+            retrieval_algorithm=retrieval_algorithm,
+            atmospheric_profile_model=atmospheric_profile_model,
+            sensor_data_context=sensor_data_context,
+            job_settings=job_settings,
+            job_id=self.push_count if job_id is None else job_id,
+            estimated_cost=estimated_cost,
         )
+        priority = -estimated_cost if self.ordering == "longest-first" else 0.0
+        heapq.heappush(self.queue, (0 if requeued else 1, priority, self.push_count, job))
+        self.push_count += 1
+
+    def defer(self, job: RetrievalJob, not_before: float) -> None:
+        """Put the job that has just been popped back into the queue, but
+        do not pop it again before the unix timestamp `not_before`."""
+
+        assert (self.last_popped_entry is not None) and (self.last_popped_entry[3] is job)
+        heapq.heappush(self.deferred, (not_before, self.last_popped_entry))
+        self.last_popped_entry = None
+
+    def _release_deferred_jobs(self) -> None:
+        while (len(self.deferred) > 0) and (self.deferred[0][0] <= time.time()):
+            heapq.heappush(self.queue, heapq.heappop(self.deferred)[1])
+
+    def get_deferral_timeout(self) -> Optional[float]:
+        """Seconds until the next deferred job can be popped, `None` if
+        there are no deferred jobs."""
+
+        if len(self.deferred) == 0:
+            return None
+        return max(0.0, self.deferred[0][0] - time.time())
 
     def peek(self) -> Optional[RetrievalJob]:
-        if self.current_job_index < len(self.queue):
-            return self.queue[self.current_job_index]
+        self._release_deferred_jobs()
+        if len(self.queue) > 0:
+            return self.queue[0][3]
         else:
             return None
 
     def pop(self) -> Optional[RetrievalJob]:
-        if self.current_job_index < len(self.queue):
-            self.current_job_index += 1
-            return self.queue[self.current_job_index - 1]
+        """Pop the next job. Returns `None` if the queue is empty or
+        only contains deferred jobs that cannot be popped yet."""
+
+        self._release_deferred_jobs()
+        if len(self.queue) > 0:
+            self.last_popped_entry = heapq.heappop(self.queue)
+            return self.last_popped_entry[3]
         else:
             return None
 
+    def to_list(self) -> list[RetrievalJob]:
+        """All jobs in the order in which they will be popped (ignoring
+        the deferral of deferred jobs)."""
+
+        return [entry[3] for entry in sorted(self.queue + [e for _, e in self.deferred])]
+
     def __len__(self) -> int:
-        return len(self.queue) - self.current_job_index
+        return len(self.queue) + len(self.deferred)
 
     def is_empty(self) -> bool:
         return len(self) == 0
+
+
+def compute_seconds_per_ifg(
+    retrieval_statuses: list[RetrievalStatus],
+) -> dict[str, float]:
+    """Compute the mean processing time per interferogram for each sensor
+    from the finished items of a (previous) retrieval status list.
+
+    Returns: dict mapping sensor ids to seconds per interferogram"""
+
+    durations: dict[str, float] = {}
+    ifg_counts: dict[str, int] = {}
+    for s in retrieval_statuses:
+        if (
+            (s.process_start_time is None)
+            or (s.process_end_time is None)
+            or (s.ifg_count is None)
+            or (s.ifg_count == 0)
+        ):
+            continue
+        duration = (s.process_end_time - s.process_start_time).total_seconds()
+        if duration <= 0:
+            continue
+        durations[s.sensor_id] = durations.get(s.sensor_id, 0.0) + duration
+        ifg_counts[s.sensor_id] = ifg_counts.get(s.sensor_id, 0) + s.ifg_count
+
+    return {sensor_id: durations[sensor_id] / ifg_counts[sensor_id] for sensor_id in durations}
+
+
+def estimate_job_cost(
+    sensor_data_context: em27_metadata.types.SensorDataContext,
+    ifg_count: int,
+    seconds_per_ifg: dict[str, float],
+) -> float:
+    """Estimate the processing time of a sensor data context in seconds.
+
+    Uses the number of interferograms and the past seconds per interferogram
+    of the sensor. If there is no history for the sensor, the median of all
+    known sensors is used (or 1 second if there is no history at all)."""
+
+    default_seconds_per_ifg = (
+        statistics.median(seconds_per_ifg.values()) if len(seconds_per_ifg) > 0 else 1.0
+    )
+    return ifg_count * seconds_per_ifg.get(sensor_data_context.sensor_id, default_seconds_per_ifg)
@@ -1,8 +1,11 @@
 import datetime
+import json
 import os
 import shutil
+import threading
+import time
 import traceback
-from typing import Literal, Optional
+from typing import Literal, Optional, TextIO
 
 import tum_esm_utils
 
@@ -16,33 +19,132 @@ _LOGS_DIR = os.path.join(_PROJECT_DIR, "data", "logs", "retrieval")
 # the logfile name will have the time when the script has been started
 logfile_time = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%d-%H-%M")
 
+# buffered lines are written to the logfile at least this often while logging
+_FLUSH_INTERVAL_SECONDS = 5
+
 
 class Logger:
+    """Writes log lines to `data/logs/retrieval/<start time>_<container id>.log`.
+
+    The logfile is kept open and written through a buffer. The buffer is
+    flushed with the first line logged `_FLUSH_INTERVAL_SECONDS` after the
+    previous flush, at every stage boundary (`set_stage`), on errors and
+    exceptions, and when archiving the logfile.
+
+    With `log_format="json"`, every line is a JSON record with the time,
+    level, container id, current stage and the seconds since the logger
+    has been created, instead of the plain text format.
+
+    The teardown hooks log from signal handlers, which may interrupt a
+    logging call of the same thread. The buffered writer must not be
+    re-entered, so lines logged while a write is in progress go straight
+    to the file descriptor, and flushing and closing are left to the
+    interrupted call or the interpreter exit."""
+
     def __init__(
         self,
         container_id: str,
         write_to_file: bool = True,
         print_to_console: bool = False,
+        log_format: Literal["text", "json"] = "text",
     ) -> None:
         self.container_id = container_id
         self.logfile_name = f"{logfile_time}_{self.container_id}.log"
         self.logfile_path = os.path.join(_LOGS_DIR, self.logfile_name)
         self.write_to_file = write_to_file
         self.print_to_console = print_to_console
+        self.log_format: Literal["text", "json"] = log_format
+        self.stage: Optional[str] = None
+        self.start_time = time.time()
+        self.logfile: Optional[TextIO] = None
+        self.last_flush_time = time.time()
+        # reentrant, because a signal handler may log while the same thread
+        # holds the lock - `writing` tells whether the writer is in use
+        self.lock = threading.RLock()
+        self.writing = False
+
+    def _format(
+        self,
+        m: str,
+        level: Literal["DEBUG", "INFO", "WARNING", "ERROR", "EXCEPTION"],
+    ) -> str:
+        now = datetime.datetime.now(datetime.timezone.utc)
+        if self.log_format == "json":
+            record = {
+                "time": now.isoformat(),
+                "level": level,
+                "container_id": self.container_id,
+                "stage": self.stage,
+                "elapsed_seconds": round(time.time() - self.start_time, 3),
+                "message": m,
+            }
+            return json.dumps(record) + "\n"
+        return f"{now.strftime('%Y%m%d %H:%M:%S')} - {level} - {m}\n"
 
     def _log(
         self,
         m: str,
         level: Literal["DEBUG", "INFO", "WARNING", "ERROR", "EXCEPTION"],
     ) -> None:
-        t = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%d %H:%M:%S")
-        log_line = f"{t} - {level} - {m}\n"
+        log_line = self._format(m, level)
         if self.write_to_file:
-            with open(self.logfile_path, "a") as f:
-                f.write(log_line)
+            with self.lock:
+                if self.writing:
+                    self._write_unbuffered(log_line)
+                else:
+                    self.writing = True
+                    try:
+                        if self.logfile is None:
+                            self.logfile = open(self.logfile_path, "a")
+                        self.logfile.write(log_line)
+                        if (level in ["ERROR", "EXCEPTION"]) or (
+                            (time.time() - self.last_flush_time) > _FLUSH_INTERVAL_SECONDS
+                        ):
+                            self._flush()
+                    finally:
+                        self.writing = False
         if self.print_to_console:
             print(log_line, end="")
 
+    def _write_unbuffered(self, log_line: str) -> None:
+        fd = os.open(self.logfile_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, log_line.encode())
+        finally:
+            os.close(fd)
+
+    def _flush(self) -> None:
+        if self.logfile is not None:
+            self.logfile.flush()
+        self.last_flush_time = time.time()
+
+    def flush(self) -> None:
+        """Write all buffered lines to the logfile."""
+        with self.lock:
+            if not self.writing:
+                self.writing = True
+                try:
+                    self._flush()
+                finally:
+                    self.writing = False
+
+    def close(self) -> None:
+        """Flush and close the logfile. Logging again reopens it."""
+        with self.lock:
+            if (self.logfile is not None) and (not self.writing):
+                self.writing = True
+                try:
+                    self.logfile.close()
+                    self.logfile = None
+                finally:
+                    self.writing = False
+
+    def set_stage(self, stage: str) -> None:
+        """Mark the beginning of a new stage of the session - included in the
+        JSON records and a flush point of the buffer."""
+        self.flush()
+        self.stage = stage
+
     def exception(
         self,
         e: Exception,
@@ -99,13 +201,16 @@ class Logger:
 
     def archive(self) -> None:
         """move the used log file into the archive"""
-        shutil.copyfile(
-            self.logfile_path,
-            os.path.join(
-                _LOGS_DIR,
-                "archive",
-                "main" if self.container_id == "main" else "containers",
-                self.logfile_name,
-            ),
+        self.close()
+        archive_path = os.path.join(
+            _LOGS_DIR,
+            "archive",
+            "main" if self.container_id == "main" else "containers",
+            self.logfile_name,
         )
-        os.remove(self.logfile_path)
+        try:
+            os.replace(self.logfile_path, archive_path)
+        except OSError:
+            # the archive is on another file system
+            shutil.copyfile(self.logfile_path, archive_path)
+            os.remove(self.logfile_path)
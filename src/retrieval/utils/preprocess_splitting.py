@@ -0,0 +1,172 @@
+import concurrent.futures
+import os
+import re
+import shutil
+from typing import Any
+
+# slices with fewer interferograms are not worth the additional preprocess call
+MIN_IFGS_PER_SLICE = 50
+
+
+class PreprocessSlice:
+    """One preprocess call of a split interferogram list. Each slice writes
+    to its own spectra directory, because preprocess truncates the
+    `logfile.dat` in its output directory when it starts. For the same
+    reason, each slice writes its internal preprocess log to its own
+    log directory."""
+
+    def __init__(self, input_file: str, ifgs: list[str], spectra_dir: str, log_dir: str) -> None:
+        self.input_file = input_file
+        self.ifgs = ifgs
+        self.spectra_dir = spectra_dir
+        self.log_dir = log_dir
+
+
+def split_ifgs(ifgs: list[str], slice_count: int) -> list[list[str]]:
+    """Split the interferograms of one preprocess call into at most
+    `slice_count` contiguous slices, keeping their order."""
+
+    slice_count = max(1, min(slice_count, len(ifgs) // MIN_IFGS_PER_SLICE))
+    bounds = [round(i * len(ifgs) / slice_count) for i in range(slice_count + 1)]
+    return [ifgs[bounds[i] : bounds[i + 1]] for i in range(slice_count)]
+
+
+def merge_preprocess_slices(slices: list[PreprocessSlice], spectra_dir: str, log_dir: str) -> None:
+    """Move the spectra of all slices into `spectra_dir` and concatenate
+    their `logfile.dat` in slice order, which yields the same logfile as
+    one preprocess call over all interferograms: the running index in the
+    first column of every line is renumbered, because every slice starts
+    counting at 1. The files in the log directories of the slices are
+    concatenated in slice order into `log_dir`."""
+
+    os.makedirs(spectra_dir, exist_ok=True)
+    with open(os.path.join(spectra_dir, "logfile.dat"), "w") as logfile:
+        line_index = 0
+        for s in slices:
+            for filename in sorted(os.listdir(s.spectra_dir)):
+                if filename == "logfile.dat":
+                    with open(os.path.join(s.spectra_dir, filename), "r") as f:
+                        for line in f.read().splitlines(keepends=True):
+                            index_match = re.match(r"\s*\d+", line)
+                            if index_match is not None:
+                                line_index += 1
+                                line = (
+                                    str(line_index).rjust(index_match.end())
+                                    + line[index_match.end() :]
+                                )
+                            logfile.write(line)
+                else:
+                    os.replace(
+                        os.path.join(s.spectra_dir, filename), os.path.join(spectra_dir, filename)
+                    )
+            shutil.rmtree(s.spectra_dir)
+
+    log_contents: dict[str, list[bytes]] = {}
+    for s in slices:
+        for filename in sorted(os.listdir(s.log_dir)):
+            with open(os.path.join(s.log_dir, filename), "rb") as f:
+                log_contents.setdefault(filename, []).append(f.read())
+        shutil.rmtree(s.log_dir)
+    os.makedirs(log_dir, exist_ok=True)
+    for filename, contents in log_contents.items():
+        with open(os.path.join(log_dir, filename), "wb") as f:
+            f.writelines(contents)
+
+
+class PreprocessSplittingMixin:
+    """Mixin for the `Pylot` class of any Proffast 2.X version that splits
+    the interferogram list of every measurement date with at least
+    `2 * MIN_IFGS_PER_SLICE` interferograms into up to
+    `preprocess_slice_count` slices. The slices are preprocessed by
+    concurrent calls of the preprocess executable and their spectra,
+    logfiles and internal preprocess logs are merged into the directories
+    of the date, so the following stages do not see any difference.
+
+    Use it as `class ShardedPylot(PreprocessSplittingMixin, Pylot)` at
+    module level, so that the Pylot's multiprocessing pool can pickle it."""
+
+    preprocess_slice_count: int = 1
+    global_inputfile_list: list[str]
+    logger: Any
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        # input file of a measurement date -> (its spectra directory,
+        # its log directory, its slices)
+        self.preprocess_slices: dict[str, tuple[str, str, list[PreprocessSlice]]] = {}
+
+    def replace_params_in_template(
+        self,
+        parameters: dict[str, Any],
+        template_type: str,
+        prf_input_file: str,
+    ) -> None:
+        super().replace_params_in_template(parameters, template_type, prf_input_file)  # type: ignore
+        if template_type != "prep":
+            return
+
+        ifg_slices = split_ifgs(parameters["igrams"].split("\n"), self.preprocess_slice_count)
+        if len(ifg_slices) == 1:
+            return
+        slices: list[PreprocessSlice] = []
+        for i, ifgs in enumerate(ifg_slices):
+            s = PreprocessSlice(
+                input_file=prf_input_file[:-4] + f"_slice{i + 1}.inp",
+                ifgs=ifgs,
+                spectra_dir=parameters["path_spectra"].rstrip(os.sep) + f"-slice{i + 1}",
+                log_dir=parameters["path_preprocess_log"].rstrip(os.sep) + f"-slice{i + 1}",
+            )
+            super().replace_params_in_template(  # type: ignore
+                {
+                    **parameters,
+                    "igrams": "\n".join(ifgs),
+                    "path_spectra": s.spectra_dir,
+                    "path_preprocess_log": s.log_dir,
+                },
+                template_type,
+                s.input_file,
+            )
+            self.global_inputfile_list.append(s.input_file)
+            slices.append(s)
+        self.preprocess_slices[prf_input_file] = (
+            parameters["path_spectra"],
+            parameters["path_preprocess_log"],
+            slices,
+        )
+        self.logger.info(
+            f"Splitting {os.path.basename(prf_input_file)} into {len(slices)} slices "
+            + f"of {', '.join(str(len(s.ifgs)) for s in slices)} interferograms"
+        )
+
+    def run_prf_with_inputfile(
+        self,
+        prf_inputfile: str,
+        executable: str,
+        popen_kwargs: dict[str, Any] = {},
+    ) -> Any:
+        if prf_inputfile not in self.preprocess_slices:
+            return super().run_prf_with_inputfile(  # type: ignore
+                prf_inputfile, executable, popen_kwargs=popen_kwargs
+            )
+        spectra_dir, log_dir, slices = self.preprocess_slices[prf_inputfile]
+        for s in slices:
+            os.makedirs(s.spectra_dir, exist_ok=True)
+            os.makedirs(s.log_dir, exist_ok=True)
+
+        def run_slice(s: PreprocessSlice) -> Any:
+            return super(PreprocessSplittingMixin, self).run_prf_with_inputfile(  # type: ignore
+                s.input_file, executable, popen_kwargs=popen_kwargs
+            )
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(slices)) as executor:
+            outputs: list[Any] = list(executor.map(run_slice, slices))
+        merge_preprocess_slices(slices, spectra_dir, log_dir)
+
+        # one output entry for the logfile of the Pylot, like an unsplit call
+        return_codes = [o[2] for o in outputs]
+        return (
+            "\n".join(o[0] for o in outputs),
+            "".join(o[1] for o in outputs),
+            next((c for c in return_codes if c != "0"), "0"),
+            " && ".join(o[3] for o in outputs),
+        )
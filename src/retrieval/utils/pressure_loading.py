@@ -16,20 +16,10 @@ def find_pressure_files(
 
     Returns: tuple[list of all files for that sensor, list of all files following the given pattern, list of all matching files for that date]"""
 
-    d = os.path.join(root_dir, sensor_id)
-    if not os.path.exists(d):
-        return [], [], []
-
-    all_files = sorted(os.listdir(d))
-
-    general_file_pattern, specific_file_pattern = utils.text.replace_regex_placeholders(
-        file_regex, sensor_id, date
+    index = utils.file_index.DatedFileIndex(
+        os.path.join(root_dir, sensor_id), sensor_id, file_regex
     )
-
-    general_matching_files = [f for f in all_files if general_file_pattern.match(f) is not None]
-    specific_matching_files = [f for f in all_files if specific_file_pattern.match(f) is not None]
-
-    return all_files, general_matching_files, specific_matching_files
+    return index.all_files, index.general_matching_files, index.find(date)
 
 
 def pressure_files_exist(
@@ -38,18 +28,15 @@ def pressure_files_exist(
     file_regex: str,
     date: datetime.date,
 ) -> bool:
-    """Check if pressure files for a given sensor and date exist. Like `find_pressure_files`, but more efficient. Use in the retrieval queue.
+    """Check if pressure files for a given sensor and date exist. When checking
+    many dates, build one `utils.file_index.DatedFileIndex` instead (like the
+    retrieval queue does) - this function lists the whole directory on every call.
 
     Returns: bool indicating if any matching files exist."""
 
-    d = os.path.join(root_dir, sensor_id)
-    try:
-        _, specific_file_pattern = utils.text.replace_regex_placeholders(
-            file_regex, sensor_id, date
-        )
-        return any([specific_file_pattern.match(f) is not None for f in os.listdir(d)])
-    except FileNotFoundError:
-        return False
+    return utils.file_index.DatedFileIndex(
+        os.path.join(root_dir, sensor_id), sensor_id, file_regex
+    ).exists(date)
 
 
 def load_pressure_file(
@@ -0,0 +1,179 @@
+import os
+import subprocess
+import threading
+import time
+from typing import IO, Any, Optional, Union
+
+import pydantic
+
+# getrusage counts block I/O in units of 512 bytes
+_BLOCK_SIZE = 512
+
+
+class ExecutableUsage(pydantic.BaseModel):
+    """Resources used by one call of a Proffast executable, as reported by
+    `os.wait4` for the executable and all of its waited-for subprocesses.
+    For shell commands, `arguments` is the whole command."""
+
+    executable: str
+    arguments: list[str]
+    return_code: int
+    wall_time_seconds: float
+    user_time_seconds: float
+    system_time_seconds: float
+    max_rss_mb: float
+    read_bytes: int
+    write_bytes: int
+    voluntary_context_switches: int
+    involuntary_context_switches: int
+
+
+class ExecutableUsageSummary(pydantic.BaseModel):
+    """The usage of all calls of one executable within a session."""
+
+    executable: str
+    call_count: int
+    wall_time_seconds: float
+    user_time_seconds: float
+    system_time_seconds: float
+    max_rss_mb: float
+    read_bytes: int
+    write_bytes: int
+    voluntary_context_switches: int
+    involuntary_context_switches: int
+
+
+def _read_pipe(pipe: IO[Any], chunks: list[bytes]) -> None:
+    chunks.append(pipe.read())
+    pipe.close()
+
+
+def run_accounted(
+    command: Union[str, list[str]],
+    executable_name: Optional[str] = None,
+    **popen_kwargs: Any,
+) -> tuple[str, str, ExecutableUsage]:
+    """Run a command like `Popen.communicate` and reap it with `os.wait4`
+    to collect its resource usage. `command` is either an argument list or,
+    with `shell=True`, a shell command - in that case the usage includes
+    all commands of the shell.
+
+    Returns:
+        The stdout, the stderr and the usage of the command."""
+
+    if isinstance(command, str):
+        program, arguments = command.split(maxsplit=1)[0], [command]
+    else:
+        program, arguments = str(command[0]), [str(a) for a in command[1:]]
+    if executable_name is None:
+        executable_name = os.path.basename(program)
+
+    start_time = time.perf_counter()
+    process = subprocess.Popen(
+        command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, **popen_kwargs
+    )
+    assert (process.stdout is not None) and (process.stderr is not None)
+
+    # stderr is read in a thread, so that the executable never blocks on a full pipe
+    stderr_chunks: list[bytes] = []
+    stderr_thread = threading.Thread(target=_read_pipe, args=(process.stderr, stderr_chunks))
+    stderr_thread.start()
+    stdout_chunks: list[bytes] = []
+    _read_pipe(process.stdout, stdout_chunks)
+    stderr_thread.join()
+
+    # reaping the process ourselves is the only way to get its rusage,
+    # setting the return code keeps `Popen` from waiting for it again
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+
+    return (
+        stdout_chunks[0].decode("utf-8", errors="replace"),
+        stderr_chunks[0].decode("utf-8", errors="replace"),
+        ExecutableUsage(
+            executable=executable_name,
+            arguments=arguments,
+            return_code=process.returncode,
+            wall_time_seconds=round(time.perf_counter() - start_time, 3),
+            user_time_seconds=round(usage.ru_utime, 3),
+            system_time_seconds=round(usage.ru_stime, 3),
+            # in kilobytes on Linux
+            max_rss_mb=round(usage.ru_maxrss / 1024, 1),
+            read_bytes=usage.ru_inblock * _BLOCK_SIZE,
+            write_bytes=usage.ru_oublock * _BLOCK_SIZE,
+            voluntary_context_switches=usage.ru_nvcsw,
+            involuntary_context_switches=usage.ru_nivcsw,
+        ),
+    )
+
+
+def append_executable_usage(path: str, usage: ExecutableUsage) -> None:
+    """Append one usage record to a JSON lines file. Each record is written
+    with a single `write` to a file opened in append mode, so the records
+    of parallel executables do not interleave."""
+
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, (usage.model_dump_json() + "\n").encode())
+    finally:
+        os.close(fd)
+
+
+def load_executable_usage(path: str) -> list[ExecutableUsage]:
+    """Load all records of a usage file, skipping invalid lines."""
+
+    usages: list[ExecutableUsage] = []
+    if not os.path.isfile(path):
+        return usages
+    with open(path, "r") as f:
+        for line in f:
+            try:
+                usages.append(ExecutableUsage.model_validate_json(line))
+            except pydantic.ValidationError:
+                continue
+    return usages
+
+
+def summarize_executable_usage(usages: list[ExecutableUsage]) -> list[ExecutableUsageSummary]:
+    """Sum up the usage per executable. Times, I/O and context switches are
+    summed, `max_rss_mb` is the largest of all calls."""
+
+    groups: dict[str, list[ExecutableUsage]] = {}
+    for u in usages:
+        groups.setdefault(u.executable, []).append(u)
+    return [
+        ExecutableUsageSummary(
+            executable=executable,
+            call_count=len(group),
+            wall_time_seconds=round(sum(u.wall_time_seconds for u in group), 3),
+            user_time_seconds=round(sum(u.user_time_seconds for u in group), 3),
+            system_time_seconds=round(sum(u.system_time_seconds for u in group), 3),
+            max_rss_mb=max(u.max_rss_mb for u in group),
+            read_bytes=sum(u.read_bytes for u in group),
+            write_bytes=sum(u.write_bytes for u in group),
+            voluntary_context_switches=sum(u.voluntary_context_switches for u in group),
+            involuntary_context_switches=sum(u.involuntary_context_switches for u in group),
+        )
+        for executable, group in sorted(groups.items())
+    ]
+
+
+class PylotAccountingMixin:
+    """Mixin for the `Pylot` class of any Proffast 2.X version that runs the
+    preprocess, pcxs and invers executables through `run_accounted` and
+    appends their usage to `executable_usage_path`.
+
+    The Pylot runs the executables in a multiprocessing pool, so the
+    subclass has to be defined at module level."""
+
+    executable_usage_path: Optional[str] = None
+
+    def _call_external_program(
+        self,
+        command_list: list[str],
+        **kwargs: Any,
+    ) -> tuple[str, str, int]:
+        out, err, usage = run_accounted(command_list, **kwargs)
+        if self.executable_usage_path is not None:
+            append_executable_usage(self.executable_usage_path, usage)
+        return out, err, usage.return_code
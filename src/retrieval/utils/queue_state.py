@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import os
+import sqlite3
+from typing import ClassVar, Generator, Literal, Optional
+
+import em27_metadata
+import tum_esm_utils
+
+from src import types, utils
+
+from .job_queue import RetrievalJob
+
+_PROJECT_DIR = tum_esm_utils.files.get_parent_dir_path(__file__, current_depth=4)
+_QUEUE_STATE_DATABASE = os.path.join(_PROJECT_DIR, "data", "logs", "retrieval-queue-state.sqlite")
+
+# bumped whenever the table layout changes - outdated databases
+# are not resumed but replaced by a newly generated queue
+_SCHEMA_VERSION = 2
+_SCHEMA = [
+    "DROP TABLE IF EXISTS queue_meta",
+    "DROP TABLE IF EXISTS queue_jobs",
+    "CREATE TABLE queue_meta (queue_fingerprint TEXT NOT NULL)",
+    """CREATE TABLE queue_jobs (
+        job_id INTEGER PRIMARY KEY,
+        job TEXT NOT NULL,
+        state TEXT NOT NULL
+    )""",
+    "CREATE INDEX queue_jobs_state ON queue_jobs (state)",
+    f"PRAGMA user_version = {_SCHEMA_VERSION}",
+]
+
+
+def compute_queue_fingerprint(
+    config: types.Config,
+    em27_metadata_interface: em27_metadata.interfaces.EM27MetadataInterface,
+) -> str:
+    """Fingerprint of everything the retrieval queue is generated from
+    besides the data directories: the retrieval jobs, the data paths, the
+    metadata and the pipeline version."""
+
+    assert config.retrieval is not None
+    h = hashlib.sha256()
+    for part in [
+        utils.functions.get_pipeline_version(),
+        config.general.data.model_dump_json(),
+        config.retrieval.general.ifg_file_regex,
+        *[job.model_dump_json() for job in config.retrieval.jobs],
+        em27_metadata_interface.locations.model_dump_json(),
+        em27_metadata_interface.sensors.model_dump_json(),
+        em27_metadata_interface.campaigns.model_dump_json(),
+        em27_metadata_interface.events.model_dump_json(),
+    ]:
+        h.update(part.encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def get_finished_state(config: types.Config, job: RetrievalJob) -> Literal["done", "failed"]:
+    """Whether a finished job is `done` or `failed`, depending on the output
+    folder the session has moved its results to."""
+
+    output_dir = os.path.join(
+        config.general.data.results.root,
+        job.retrieval_algorithm,
+        job.atmospheric_profile_model,
+        job.sensor_data_context.sensor_id,
+        "successful",
+        utils.functions.get_output_folder_slug(
+            job.sensor_data_context, job.job_settings.output_suffix
+        ),
+    )
+    return "done" if os.path.isdir(output_dir) else "failed"
+
+
+class QueueState:
+    """Durable state of the retrieval queue of the current run, stored in
+    an SQLite database.
+
+    Every job is stored with its job id and its state. A state change only
+    updates the row of that job, independent of the size of the queue. When
+    the automation is restarted with `config.retrieval.general.resume_queue`,
+    the unfinished jobs of the previous run are taken from this database
+    instead of regenerating the queue from the data directories - as long
+    as the queue fingerprint (see `compute_queue_fingerprint`) is unchanged.
+    Jobs that were `running` when the previous run was stopped are
+    re-queued first."""
+
+    database_path: ClassVar[str] = _QUEUE_STATE_DATABASE
+
+    def __init__(self, queue_fingerprint: str) -> None:
+        self.queue_fingerprint = queue_fingerprint
+
+    @classmethod
+    @contextlib.contextmanager
+    def connect(cls) -> Generator[sqlite3.Connection, None, None]:
+        """Open the queue state database and commit the transaction on exit."""
+
+        connection = sqlite3.connect(cls.database_path)
+        connection.execute("PRAGMA journal_mode=WAL")
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    @classmethod
+    def create(cls, queue_fingerprint: str, jobs: list[RetrievalJob]) -> QueueState:
+        """Replace the stored queue state with a new queue in which all
+        jobs are `pending`."""
+
+        with cls.connect() as connection:
+            for statement in _SCHEMA:
+                connection.execute(statement)
+            connection.execute("INSERT INTO queue_meta VALUES (?)", (queue_fingerprint,))
+            connection.executemany(
+                "INSERT INTO queue_jobs VALUES (?, ?, 'pending')",
+                [(job.job_id, job.model_dump_json()) for job in jobs],
+            )
+        return cls(queue_fingerprint)
+
+    @classmethod
+    def load(cls) -> Optional[QueueState]:
+        """Load the queue state of the previous run from disk."""
+
+        if not os.path.isfile(cls.database_path):
+            return None
+        try:
+            with cls.connect() as connection:
+                if connection.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+                    return None
+                queue_fingerprint: str = connection.execute(
+                    "SELECT queue_fingerprint FROM queue_meta"
+                ).fetchone()[0]
+        except (sqlite3.DatabaseError, TypeError):
+            return None
+        return cls(queue_fingerprint)
+
+    def get_jobs(
+        self, state: Literal["pending", "running", "done", "failed"]
+    ) -> list[RetrievalJob]:
+        with self.connect() as connection:
+            rows = connection.execute(
+                "SELECT job FROM queue_jobs WHERE state = ? ORDER BY job_id", (state,)
+            ).fetchall()
+        return [RetrievalJob.model_validate_json(row[0]) for row in rows]
+
+    def is_finished(self) -> bool:
+        with self.connect() as connection:
+            return (
+                connection.execute(
+                    "SELECT 1 FROM queue_jobs WHERE state IN ('pending', 'running') LIMIT 1"
+                ).fetchone()
+                is None
+            )
+
+    def set_state(
+        self,
+        job: RetrievalJob,
+        state: Literal["pending", "running", "done", "failed"],
+    ) -> None:
+        """Update the state of a job (identified by its job id) on disk."""
+
+        with self.connect() as connection:
+            connection.execute(
+                "UPDATE queue_jobs SET state = ? WHERE job_id = ?", (state, job.job_id)
+            )
@@ -1,4 +1,5 @@
 import datetime
+import time
 from typing import Any, Optional
 
 import rich.align
@@ -11,10 +12,70 @@ import rich.table
 import rich.spinner
 import tum_esm_utils
 
-from .retrieval_status import RetrievalStatusList
+from .retrieval_status import RetrievalStatus, RetrievalStatusList
+from .throughput import QueueEstimate, estimate_queue
 
 _RETRIEVAL_ENTRYPOINT = tum_esm_utils.files.rel_to_abs_path("../main.py")
 
+# lines of the watch window that are not part of the process table
+_NON_TABLE_LINES = 14
+
+# estimating the remaining time looks at all items, so it is not redone every second
+_ESTIMATE_INTERVAL_SECONDS = 10
+
+
+class QueueView:
+    """The retrieval queue as seen by the watcher. Every `poll` only loads
+    the status rows that changed since the previous one, and the counts
+    are updated incrementally from these changes. The items themselves
+    are kept for the throughput and ETA estimation."""
+
+    def __init__(self, status_list: type[RetrievalStatusList] = RetrievalStatusList) -> None:
+        self.status_list = status_list
+        self.clear()
+
+    def clear(self) -> None:
+        self.generation: Optional[str] = None
+        self.version: int = 0
+        self.items: dict[int, RetrievalStatus] = {}
+        self.running_processes: dict[int, RetrievalStatus] = {}
+        self.pending_process_count: int = 0
+        self.done_process_count: int = 0
+
+    @property
+    def process_count(self) -> int:
+        return len(self.items)
+
+    @property
+    def in_progress_process_count(self) -> int:
+        return len(self.running_processes)
+
+    def poll(self) -> None:
+        changes = self.status_list.load_changes(self.generation, self.version)
+        if (changes is None) or changes.full_reload:
+            self.clear()
+        if changes is None:
+            return
+        self.generation = changes.generation
+        self.version = changes.version
+
+        for rowid, p in changes.items.items():
+            previous = self.items.get(rowid)
+            if previous is not None:
+                if previous.process_start_time is None:
+                    self.pending_process_count -= 1
+                elif previous.process_end_time is not None:
+                    self.done_process_count -= 1
+            self.running_processes.pop(rowid, None)
+            self.items[rowid] = p
+
+            if p.process_start_time is None:
+                self.pending_process_count += 1
+            elif p.process_end_time is None:
+                self.running_processes[rowid] = p
+            else:
+                self.done_process_count += 1
+
 
 def _prettify_timedelta(dt: datetime.timedelta) -> str:
     out: str = ""
@@ -36,17 +97,22 @@ def _prettify_timedelta(dt: datetime.timedelta) -> str:
     return out.strip()
 
 
-def _render(cluster_mode: bool) -> Any:
-    processes = RetrievalStatusList.load()
-    pending_process_count = len([x for x in processes if x.process_start_time is None])
-    done_process_count = len([x for x in processes if x.process_end_time is not None])
-    in_progress_process_count = len(processes) - pending_process_count - done_process_count
+def _render(
+    cluster_mode: bool,
+    view: QueueView,
+    max_table_rows: int,
+    estimate: Optional[QueueEstimate] = None,
+) -> Any:
+    process_count = view.process_count
+    pending_process_count = view.pending_process_count
+    done_process_count = view.done_process_count
+    in_progress_process_count = view.in_progress_process_count
 
     if cluster_mode:
         message: Optional[str] = None
-        if len(processes) == 0:
+        if process_count == 0:
             message = "[white]No Processes In the Queue[/white]"
-        elif len(processes) == done_process_count:
+        elif process_count == done_process_count:
             message = "[green]All Processes Done[/green]"
         if message is not None:
             grid = rich.table.Table.grid(expand=True)
@@ -58,12 +124,12 @@ def _render(cluster_mode: bool) -> Any:
             )
             return grid
     else:
-        if len(processes) == done_process_count:
+        if process_count == done_process_count:
             pipeline_pids = tum_esm_utils.processes.get_process_pids(_RETRIEVAL_ENTRYPOINT)
             if len(pipeline_pids) == 0:
                 return rich.panel.Panel("[white]Pipeline is not running[/white]", height=3)
             else:
-                if len(processes) == 0:
+                if process_count == 0:
                     return rich.panel.Panel(
                         "[white]Pipeline is spinning up - wait a bit[/white]", height=3
                     )
@@ -81,36 +147,33 @@ def _render(cluster_mode: bool) -> Any:
     table.add_column("IFG Count")
     table.add_column("Run Time")
 
-    first_start_time: Optional[datetime.datetime] = None
-    last_end_time: Optional[datetime.datetime] = None
-
-    for p in processes:
-        # process not started
-        if p.process_start_time is None:
-            continue
-
-        if (first_start_time is None) or (p.process_start_time < first_start_time):
-            first_start_time = p.process_start_time
-
-        # process is running
-        if p.process_end_time is None:
-            dt = datetime.datetime.now(tz=datetime.timezone.utc) - p.process_start_time.replace(
-                tzinfo=datetime.timezone.utc
-            )
-            table.add_row(
-                p.container_id,
-                "-" if p.output_suffix is None else p.output_suffix,
-                p.sensor_id,
-                f"{p.from_datetime} - {p.to_datetime}",
-                p.location_id,
-                "N/A" if p.ifg_count is None else str(p.ifg_count),
-                f"{dt.seconds // 60}m {str(dt.seconds % 60).zfill(2)}s",
-            )
-            continue
-
-        # process is done
-        if (last_end_time is None) or (p.process_end_time > last_end_time):
-            last_end_time = p.process_end_time
+    # only the rows that fit into the terminal are rendered
+    show_job_estimates = (estimate is not None) and (len(estimate.jobs) > 1)
+    if show_job_estimates:
+        assert estimate is not None
+        max_table_rows -= len(estimate.jobs)
+    running_processes = sorted(
+        view.running_processes.values(), key=lambda p: p.process_start_time or p.from_datetime
+    )
+    visible_row_count = max(max_table_rows, 1)
+    if len(running_processes) > visible_row_count:
+        visible_row_count -= 1
+    for p in running_processes[:visible_row_count]:
+        assert p.process_start_time is not None
+        dt = datetime.datetime.now(tz=datetime.timezone.utc) - p.process_start_time.replace(
+            tzinfo=datetime.timezone.utc
+        )
+        table.add_row(
+            p.container_id,
+            "-" if p.output_suffix is None else p.output_suffix,
+            p.sensor_id,
+            f"{p.from_datetime} - {p.to_datetime}",
+            p.location_id,
+            "N/A" if p.ifg_count is None else str(p.ifg_count),
+            f"{dt.seconds // 60}m {str(dt.seconds % 60).zfill(2)}s",
+        )
+    if len(running_processes) > visible_row_count:
+        table.add_row(f"... and {len(running_processes) - visible_row_count} more")
 
     grid = rich.table.Table.grid(expand=True)
     grid.add_row(
@@ -127,24 +190,42 @@ def _render(cluster_mode: bool) -> Any:
         )
     )
     grid.add_row(table)
-    if (first_start_time is not None) and (last_end_time is not None) and (done_process_count > 0):
-        avg_time_per_job = (
-            last_end_time.replace(tzinfo=datetime.timezone.utc)
-            - first_start_time.replace(tzinfo=datetime.timezone.utc)
-        ) / done_process_count
-        estimated_end_time = (avg_time_per_job * len(processes)) + first_start_time
-        estimated_remaining_time = estimated_end_time - datetime.datetime.now(datetime.timezone.utc)
+    if (
+        (estimate is not None)
+        and (estimate.estimated_remaining_seconds is not None)
+        and (estimate.estimated_end_time is not None)
+        and (estimate.ifgs_per_core_second is not None)
+        and (done_process_count > 0)
+    ):
+        estimated_remaining_time = datetime.timedelta(seconds=estimate.estimated_remaining_seconds)
         grid.add_row(
             rich.align.Align.center(
                 rich.columns.Columns(
                     [
                         "[yellow]Pipeline is estimated to finish in "
                         + f"{_prettify_timedelta(estimated_remaining_time)} "
-                        + f"({estimated_end_time.strftime('%Y-%m-%d %H:%M UTC')})[/yellow]\n",
+                        + f"({estimate.estimated_end_time.strftime('%Y-%m-%d %H:%M UTC')}) - "
+                        + f"{estimate.ifgs_per_core_second:.2f} interferograms per core-second "
+                        + f"on {estimate.max_process_count} cores[/yellow]\n",
                     ]
                 ),
             )
         )
+        if show_job_estimates:
+            for j in estimate.jobs:
+                if j.remaining_core_seconds is None:
+                    continue
+                job_remaining_time = datetime.timedelta(
+                    seconds=j.remaining_core_seconds / estimate.max_process_count
+                )
+                grid.add_row(
+                    rich.align.Align.center(
+                        f"[white]{j.retrieval_algorithm} | {j.atmospheric_profile_model} | "
+                        + f"{'-' if j.output_suffix is None else j.output_suffix}: "
+                        + f"{j.done_count}/{j.pending_count + j.running_count + j.done_count} "
+                        + f"done, {_prettify_timedelta(job_remaining_time)} of work left[/white]"
+                    )
+                )
 
     grid.add_row(
         rich.align.Align.center(
@@ -163,14 +244,39 @@ def _render(cluster_mode: bool) -> Any:
     return grid
 
 
-def start_retrieval_watcher(cluster_mode: bool = False) -> None:
+def start_retrieval_watcher(
+    cluster_mode: bool = False,
+    max_process_count: Optional[int] = None,
+) -> None:
+    """Watch the retrieval queue. Without a `max_process_count` (from the
+    config), the ETA assumes that the cores of all running sessions stay
+    in use."""
+
     console = rich.console.Console()
     console.clear()
+    view = QueueView()
+    estimate: Optional[QueueEstimate] = None
+    last_estimate_time: float = 0
     with rich.live.Live(refresh_per_second=1) as live:
         try:
             while True:
                 with tum_esm_utils.timing.ensure_section_duration(1):
-                    live.update(_render(cluster_mode))
+                    view.poll()
+                    if (time.time() - last_estimate_time) > _ESTIMATE_INTERVAL_SECONDS:
+                        estimate = estimate_queue(
+                            list(view.items.values()),
+                            max_process_count=(
+                                max_process_count
+                                or sum(
+                                    p.process_count or 1 for p in view.running_processes.values()
+                                )
+                                or 1
+                            ),
+                        )
+                        last_estimate_time = time.time()
+                    live.update(
+                        _render(cluster_mode, view, console.height - _NON_TABLE_LINES, estimate)
+                    )
         except KeyboardInterrupt:
             console.clear()
             live.update("[white]Stopped watching.[/white]")
@@ -1,17 +1,68 @@
 import contextlib
 import datetime
 import os
-from typing import Generator, Optional
+import sqlite3
+from typing import Any, ClassVar, Generator, Optional
 
 import em27_metadata
-import filelock
 import pydantic
 import tum_esm_utils
 
 from src import types
 
 _PROJECT_DIR = tum_esm_utils.files.get_parent_dir_path(__file__, current_depth=4)
-_ACTIVE_PROCESS_LIST = os.path.join(_PROJECT_DIR, "data", "logs", "active-processes.json")
+_STATUS_DATABASE = os.path.join(_PROJECT_DIR, "data", "logs", "active-processes.sqlite")
+
+# concurrent writers wait for each other instead of dropping their update
+_BUSY_TIMEOUT_SECONDS = 60
+
+_COLUMNS = [
+    "retrieval_algorithm",
+    "atmospheric_profile_model",
+    "sensor_id",
+    "from_datetime",
+    "to_datetime",
+    "output_suffix",
+    "location_id",
+    "container_id",
+    "ifg_count",
+    "process_count",
+    "executable_cpu_seconds",
+    "executable_max_rss_mb",
+    "process_start_time",
+    "process_end_time",
+]
+# bumped whenever the table layout changes - the status list only
+# describes the current run, so outdated databases are recreated
+_SCHEMA_VERSION = 4
+_SCHEMA = [
+    "DROP TABLE IF EXISTS retrieval_status",
+    "DROP TABLE IF EXISTS status_meta",
+    """CREATE TABLE retrieval_status (
+        retrieval_algorithm TEXT NOT NULL,
+        atmospheric_profile_model TEXT NOT NULL,
+        sensor_id TEXT NOT NULL,
+        from_datetime TEXT NOT NULL,
+        to_datetime TEXT NOT NULL,
+        output_suffix TEXT,
+        location_id TEXT NOT NULL,
+        container_id TEXT,
+        ifg_count INTEGER,
+        process_count INTEGER,
+        executable_cpu_seconds REAL,
+        executable_max_rss_mb REAL,
+        process_start_time TEXT,
+        process_end_time TEXT,
+        version INTEGER NOT NULL
+    )""",
+    """CREATE INDEX retrieval_status_item ON retrieval_status (
+        sensor_id, from_datetime, retrieval_algorithm, atmospheric_profile_model, output_suffix
+    )""",
+    "CREATE INDEX retrieval_status_version ON retrieval_status (version)",
+    "CREATE TABLE status_meta (generation TEXT NOT NULL, version INTEGER NOT NULL)",
+    "INSERT INTO status_meta VALUES (lower(hex(randomblob(16))), 0)",
+    f"PRAGMA user_version = {_SCHEMA_VERSION}",
+]
 
 
 class RetrievalStatus(pydantic.BaseModel):
@@ -24,74 +75,158 @@ class RetrievalStatus(pydantic.BaseModel):
     location_id: str
     container_id: Optional[str] = None
     ifg_count: Optional[int] = None
+    process_count: Optional[int] = None
+    executable_cpu_seconds: Optional[float] = None
+    executable_max_rss_mb: Optional[float] = None
     process_start_time: Optional[datetime.datetime] = None
     process_end_time: Optional[datetime.datetime] = None
 
 
+class RetrievalStatusChanges(pydantic.BaseModel):
+    """The rows of the status list that changed since a given version."""
+
+    generation: str
+    version: int
+    full_reload: bool
+    items: dict[int, RetrievalStatus]
+
+
 class RetrievalStatusList(pydantic.RootModel[list[RetrievalStatus]]):
+    """The status of all items in the retrieval queue, stored in an SQLite
+    database in WAL mode: every session updates its own row in a separate
+    transaction, while `load` (used by `retrieval watch`) reads a
+    consistent snapshot without blocking the writers.
+
+    Every change stamps the affected rows with a new, monotonically
+    increasing version, so readers can fetch only the rows that changed
+    since their last read with `load_changes`. `reset` starts a new
+    generation of the list."""
+
     root: list[RetrievalStatus]
+    database_path: ClassVar[str] = _STATUS_DATABASE
 
-    @staticmethod
+    @classmethod
     @contextlib.contextmanager
-    def with_filelock() -> Generator[None, None, None]:
+    def connect(cls, read_only: bool = False) -> Generator[sqlite3.Connection, None, None]:
+        """Open the status database and commit the transaction on exit."""
+
+        if read_only:
+            connection = sqlite3.connect(
+                f"file:{cls.database_path}?mode=ro", uri=True, timeout=_BUSY_TIMEOUT_SECONDS
+            )
+        else:
+            connection = sqlite3.connect(
+                cls.database_path, timeout=_BUSY_TIMEOUT_SECONDS, isolation_level="IMMEDIATE"
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            if connection.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+                with connection:
+                    # checked again, another process might have created it meanwhile
+                    connection.execute("BEGIN IMMEDIATE")
+                    if connection.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+                        for statement in _SCHEMA:
+                            connection.execute(statement)
         try:
-            with filelock.FileLock(
-                os.path.join(_PROJECT_DIR, "data", "logs", "active-processes.json.lock"),
-                timeout=15,
-            ):
-                yield
-        except TimeoutError:
-            pass
+            with connection:
+                yield connection
+        finally:
+            connection.close()
 
-    @staticmethod
-    def load() -> list[RetrievalStatus]:
-        with RetrievalStatusList.with_filelock():
-            try:
-                with open(_ACTIVE_PROCESS_LIST, "r") as f:
-                    return RetrievalStatusList.model_validate_json(f.read()).root
-            except pydantic.ValidationError:
-                return []
+    @classmethod
+    def load(cls) -> list[RetrievalStatus]:
+        if not os.path.isfile(cls.database_path):
+            return []
+        try:
+            with cls.connect(read_only=True) as connection:
+                rows = connection.execute(
+                    f"SELECT {', '.join(_COLUMNS)} FROM retrieval_status ORDER BY rowid"
+                ).fetchall()
+        except sqlite3.OperationalError:
+            return []
+        return [RetrievalStatus.model_validate(dict(zip(_COLUMNS, row))) for row in rows]
 
-    @staticmethod
-    def reset() -> None:
-        with RetrievalStatusList.with_filelock():
-            with open(_ACTIVE_PROCESS_LIST, "w") as f:
-                f.write("[]")
+    @classmethod
+    def load_changes(
+        cls,
+        generation: Optional[str] = None,
+        version: int = 0,
+    ) -> Optional[RetrievalStatusChanges]:
+        """Load the rows (by row id) that changed after `version`. If the
+        list has been reset since `generation`, all rows are loaded and
+        `full_reload` is set. Returns `None` if the list does not exist."""
+
+        if not os.path.isfile(cls.database_path):
+            return None
+        try:
+            with cls.connect(read_only=True) as connection:
+                current_generation, current_version = connection.execute(
+                    "SELECT generation, version FROM status_meta"
+                ).fetchone()
+                full_reload = current_generation != generation
+                rows = connection.execute(
+                    f"SELECT rowid, {', '.join(_COLUMNS)} FROM retrieval_status "
+                    + "WHERE version > ? AND version <= ? ORDER BY rowid",
+                    (-1 if full_reload else version, current_version),
+                ).fetchall()
+        except (sqlite3.OperationalError, TypeError):
+            return None
+        return RetrievalStatusChanges(
+            generation=current_generation,
+            version=current_version,
+            full_reload=full_reload,
+            items={
+                row[0]: RetrievalStatus.model_validate(dict(zip(_COLUMNS, row[1:]))) for row in rows
+            },
+        )
 
     @staticmethod
+    def _next_version(connection: sqlite3.Connection) -> int:
+        connection.execute("UPDATE status_meta SET version = version + 1")
+        version: int = connection.execute("SELECT version FROM status_meta").fetchone()[0]
+        return version
+
+    @classmethod
+    def reset(cls) -> None:
+        with cls.connect() as connection:
+            connection.execute("DELETE FROM retrieval_status")
+            connection.execute("UPDATE status_meta SET generation = lower(hex(randomblob(16)))")
+
+    @classmethod
     def add_items(
+        cls,
         items: list[em27_metadata.types.SensorDataContext],
         retrieval_algorithm: types.RetrievalAlgorithm,
         atmospheric_profile_model: types.AtmosphericProfileModel,
         output_suffix: Optional[str] = None,
     ) -> None:
-        """Add items to the active process list.
+        """Add items to the active process list in a single transaction.
 
         Args:
             items: A list of tuples of the form (sensor_id, date, location_id)."""
-        with RetrievalStatusList.with_filelock():
-            try:
-                with open(_ACTIVE_PROCESS_LIST, "r") as f:
-                    process_list = RetrievalStatusList.model_validate_json(f.read())
-            except pydantic.ValidationError:
-                return
-            for sdc in items:
-                process_list.root.append(
-                    RetrievalStatus(
-                        retrieval_algorithm=retrieval_algorithm,
-                        atmospheric_profile_model=atmospheric_profile_model,
-                        sensor_id=sdc.sensor_id,
-                        from_datetime=sdc.from_datetime,
-                        to_datetime=sdc.to_datetime,
-                        location_id=sdc.location.location_id,
-                        output_suffix=output_suffix,
+        with cls.connect() as connection:
+            version = RetrievalStatusList._next_version(connection)
+            connection.executemany(
+                "INSERT INTO retrieval_status (retrieval_algorithm, atmospheric_profile_model, "
+                + "sensor_id, from_datetime, to_datetime, output_suffix, location_id, version) "
+                + "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        retrieval_algorithm,
+                        atmospheric_profile_model,
+                        sdc.sensor_id,
+                        sdc.from_datetime.isoformat(),
+                        sdc.to_datetime.isoformat(),
+                        output_suffix,
+                        sdc.location.location_id,
+                        version,
                     )
-                )
-            with open(_ACTIVE_PROCESS_LIST, "w") as f:
-                f.write(process_list.model_dump_json(indent=4))
+                    for sdc in items
+                ],
+            )
 
-    @staticmethod
+    @classmethod
     def update_item(
+        cls,
         retrieval_algorithm: types.RetrievalAlgorithm,
         atmospheric_profile_model: types.AtmosphericProfileModel,
         sensor_id: str,
@@ -99,33 +234,40 @@ class RetrievalStatusList(pydantic.RootModel[list[RetrievalStatus]]):
         output_suffix: Optional[str],
         container_id: Optional[str] = None,
         ifg_count: Optional[int] = None,
+        process_count: Optional[int] = None,
+        executable_cpu_seconds: Optional[float] = None,
+        executable_max_rss_mb: Optional[float] = None,
         process_start_time: Optional[datetime.datetime] = None,
         process_end_time: Optional[datetime.datetime] = None,
     ) -> None:
-        with RetrievalStatusList.with_filelock():
-            try:
-                with open(_ACTIVE_PROCESS_LIST, "r") as f:
-                    process_list = RetrievalStatusList.model_validate_json(f.read())
-            except pydantic.ValidationError:
-                return
-            for p in process_list.root:
-                if all(
-                    [
-                        p.retrieval_algorithm == retrieval_algorithm,
-                        p.atmospheric_profile_model == atmospheric_profile_model,
-                        p.sensor_id == sensor_id,
-                        p.from_datetime == from_datetime,
-                        p.output_suffix == output_suffix,
-                    ]
-                ):
-                    if container_id is not None:
-                        p.container_id = container_id
-                    if ifg_count is not None:
-                        p.ifg_count = ifg_count
-                    if process_start_time is not None:
-                        p.process_start_time = process_start_time
-                    if process_end_time is not None:
-                        p.process_end_time = process_end_time
-                    break
-            with open(_ACTIVE_PROCESS_LIST, "w") as f:
-                f.write(process_list.model_dump_json(indent=4))
+        updates: dict[str, Any] = {
+            "container_id": container_id,
+            "ifg_count": ifg_count,
+            "process_count": process_count,
+            "executable_cpu_seconds": executable_cpu_seconds,
+            "executable_max_rss_mb": executable_max_rss_mb,
+            "process_start_time": (
+                None if process_start_time is None else process_start_time.isoformat()
+            ),
+            "process_end_time": None if process_end_time is None else process_end_time.isoformat(),
+        }
+        updates = {k: v for k, v in updates.items() if v is not None}
+        if len(updates) == 0:
+            return
+        with cls.connect() as connection:
+            updates["version"] = RetrievalStatusList._next_version(connection)
+            connection.execute(
+                f"UPDATE retrieval_status SET {', '.join(f'{k} = ?' for k in updates)} "
+                + "WHERE rowid = (SELECT rowid FROM retrieval_status WHERE sensor_id = ? "
+                + "AND from_datetime = ? AND retrieval_algorithm = ? "
+                + "AND atmospheric_profile_model = ? AND output_suffix IS ? "
+                + "ORDER BY rowid LIMIT 1)",
+                [
+                    *updates.values(),
+                    sensor_id,
+                    from_datetime.isoformat(),
+                    retrieval_algorithm,
+                    atmospheric_profile_model,
+                    output_suffix,
+                ],
+            )
@@ -0,0 +1,59 @@
+"""The `Pylot` class with all mixins of the pipeline, used by the
+`run_pylot_container.py` scripts of all Proffast 2.X versions.
+
+The class lives in an importable module so that the Pylot's
+multiprocessing pool can pickle it with every start method (also with
+`spawn` and `forkserver`, which import the class by name). This module
+imports `prfpylot` from the container, so it can only be imported once
+the container directory is in `sys.path` - it is therefore not imported
+by `src.retrieval.utils`."""
+
+from typing import Any, Optional
+
+from prfpylot.pylot import Pylot  # type: ignore
+
+from .abscos_cache import AbscosCacheMixin
+from .invers_sharding import InversShardingMixin
+from .preprocess_splitting import PreprocessSplittingMixin
+from .process_accounting import PylotAccountingMixin
+from .spectra_cache import SpectraCacheMixin
+from .telemetry import PylotTelemetryMixin
+
+
+class ShardedPylot(
+    PylotTelemetryMixin,
+    SpectraCacheMixin,
+    PreprocessSplittingMixin,
+    InversShardingMixin,
+    AbscosCacheMixin,
+    PylotAccountingMixin,
+    Pylot,  # type: ignore[misc]
+):
+    """The options are stored on the instance, so that they are pickled
+    together with it into the processes of the Pylot's pool."""
+
+    def __init__(
+        self,
+        *args: Any,
+        invers_shard_count: int = 1,
+        preprocess_slice_count: int = 1,
+        abscos_cache_dir: Optional[str] = None,
+        abscos_cache_max_size_gb: float = 50,
+        spectra_cache_dir: Optional[str] = None,
+        spectra_cache_max_size_gb: float = 50,
+        timings_path: Optional[str] = None,
+        executable_usage_path: Optional[str] = None,
+        **kwargs: Any,
+    ) -> None:
+        self.invers_shard_count = invers_shard_count
+        self.preprocess_slice_count = preprocess_slice_count
+        self.abscos_cache_dir = abscos_cache_dir
+        self.abscos_cache_max_size_gb = abscos_cache_max_size_gb
+        self.spectra_cache_dir = spectra_cache_dir
+        self.spectra_cache_max_size_gb = spectra_cache_max_size_gb
+        self.timings_path = timings_path
+        self.executable_usage_path = executable_usage_path
+        super().__init__(*args, **kwargs)
+
+    def run(self, n_processes: int = 1) -> None:
+        super().run(n_processes=n_processes)  # type: ignore
@@ -0,0 +1,142 @@
+import csv
+import hashlib
+import json
+import os
+from typing import Any, Optional, Sequence, cast
+
+from src import retrieval
+
+# the preprocess parameters that point into the container of a session -
+# they do not change the content of the spectra
+_SESSION_SPECIFIC_PARAMETERS = ["igrams", "path_preprocess_log", "path_spectra"]
+
+
+class SpectraCacheMixin:
+    """Mixin for the `Pylot` class of any Proffast 2.X version that skips
+    preprocess calls whose spectra are already in the `FileCache` at
+    `spectra_cache_dir`, and adds the spectra of all other preprocess calls
+    to it. On a cache hit, the spectra directory of the date is seeded from
+    the cache, so the following stages run as if the Pylot had been started
+    with `start_with_spectra`.
+
+    The cache key is the hash of the preprocess template, the preprocess
+    parameters without the container paths, the names and checksums of the
+    interferograms and the preprocess executable. Hence, rerunning a day
+    with a different profile model or `output_suffix` reuses the spectra,
+    while new interferograms, a different ILS or different DC thresholds
+    lead to a new entry.
+
+    Use it as `class ShardedPylot(SpectraCacheMixin, Pylot)` at module
+    level, so that the Pylot's multiprocessing pool can pickle it. It has
+    to come before the `PreprocessSplittingMixin`, so that the spectra of a
+    date are cached as a whole, regardless of how many slices they were
+    preprocessed in."""
+
+    spectra_cache_dir: Optional[str] = None
+    spectra_cache_max_size_gb: float = 50
+    proffast_path: str
+    logger: Any
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        # preprocess input file -> (cache key, spectra directory, preprocess log file)
+        self.spectra_cache_keys: dict[str, tuple[str, str, str]] = {}
+        self.ifg_checksums: Optional[dict[str, str]] = None
+
+    def _get_ifg_checksum(self, ifg_path: str) -> str:
+        """Use the checksums computed by `move_ifg_files` and stored in the
+        `opus_file_stats.csv` next to the Proffast directory."""
+
+        if self.ifg_checksums is None:
+            self.ifg_checksums = {}
+            stats_path = os.path.join(os.path.dirname(self.proffast_path), "opus_file_stats.csv")
+            if os.path.isfile(stats_path):
+                with open(stats_path, "r") as f:
+                    for row in csv.DictReader(f):
+                        self.ifg_checksums[row["retrieval_filename"]] = row["checksum"]
+
+        checksum = self.ifg_checksums.get(os.path.basename(ifg_path))
+        if checksum is None:
+            checksum = retrieval.utils.file_cache.get_file_digest(ifg_path)
+        return checksum
+
+    def replace_params_in_template(
+        self,
+        parameters: dict[str, Any],
+        template_type: str,
+        prf_input_file: str,
+    ) -> None:
+        super().replace_params_in_template(parameters, template_type, prf_input_file)  # type: ignore
+        if (template_type != "prep") or (self.spectra_cache_dir is None):
+            return
+
+        template_path = cast(str, self.get_template_path(template_type))  # type: ignore
+        executable = cast(str, self._get_executable("prep"))  # type: ignore
+        hasher = hashlib.sha256()
+        hasher.update(retrieval.utils.file_cache.get_file_digest(template_path).encode())
+        hasher.update(retrieval.utils.file_cache.get_executable_digest(executable).encode())
+        hasher.update(
+            json.dumps(
+                {k: v for k, v in parameters.items() if k not in _SESSION_SPECIFIC_PARAMETERS},
+                sort_keys=True,
+                default=str,
+            ).encode()
+        )
+        for ifg_path in str(parameters["igrams"]).split("\n"):
+            hasher.update(
+                f"{os.path.basename(ifg_path)} {self._get_ifg_checksum(ifg_path)}\n".encode()
+            )
+
+        self.spectra_cache_keys[prf_input_file] = (
+            hasher.hexdigest(),
+            str(parameters["path_spectra"]),
+            os.path.join(
+                str(parameters["path_preprocess_log"]), str(parameters["filename_logfile"])
+            ),
+        )
+
+    def run_prf_with_inputfile(
+        self,
+        prf_inputfile: str,
+        executable: str,
+        popen_kwargs: dict[str, Any] = {},
+    ) -> Any:
+        if (prf_inputfile not in self.spectra_cache_keys) or (self.spectra_cache_dir is None):
+            return super().run_prf_with_inputfile(  # type: ignore
+                prf_inputfile, executable, popen_kwargs=popen_kwargs
+            )
+
+        key, spectra_dir, preprocess_log_path = self.spectra_cache_keys[prf_inputfile]
+        # spectra are never modified after preprocessing
+        cache = retrieval.utils.file_cache.FileCache(
+            self.spectra_cache_dir,
+            int(self.spectra_cache_max_size_gb * 1e9),
+            hardlink=lambda filename: filename.upper().endswith(".BIN"),
+        )
+        preprocess_log_name = os.path.basename(preprocess_log_path)
+
+        def destination(filename: str) -> str:
+            if filename == preprocess_log_name:
+                return preprocess_log_path
+            return os.path.join(spectra_dir, filename)
+
+        os.makedirs(spectra_dir, exist_ok=True)
+        if cache.restore(key, destination):
+            message = (
+                f"Restored {len(os.listdir(spectra_dir))} files of {spectra_dir} "
+                + f"from the spectra cache ({key[:12]})"
+            )
+            self.logger.info(message)
+            return message, "", "0", f"spectra cache {key}"
+
+        output = cast(
+            Sequence[str],
+            super().run_prf_with_inputfile(  # type: ignore
+                prf_inputfile, executable, popen_kwargs=popen_kwargs
+            ),
+        )
+        if (output[2] == "0") and os.path.isdir(spectra_dir):
+            sources = {f: os.path.join(spectra_dir, f) for f in os.listdir(spectra_dir)}
+            sources[preprocess_log_name] = preprocess_log_path
+            cache.store(key, sources)
+        return output
@@ -0,0 +1,246 @@
+import contextlib
+import datetime
+import json
+import math
+import os
+import resource
+import time
+from typing import Any, Callable, Generator, Optional
+
+import pydantic
+import tum_esm_utils
+
+from src import types
+
+from .process_accounting import load_executable_usage
+
+_PROJECT_DIR = tum_esm_utils.files.get_parent_dir_path(__file__, current_depth=4)
+_METRICS_FILE = os.path.join(_PROJECT_DIR, "data", "logs", "retrieval-metrics.jsonl")
+
+# getrusage counts block I/O in units of 512 bytes
+_BLOCK_SIZE = 512
+
+
+class SessionMetrics(pydantic.BaseModel):
+    """One line of the node-level metrics file."""
+
+    time: datetime.datetime
+    container_id: str
+    retrieval_algorithm: types.RetrievalAlgorithm
+    atmospheric_profile_model: types.AtmosphericProfileModel
+    sensor_id: str
+    from_datetime: datetime.datetime
+    output_suffix: Optional[str]
+    timings: list[types.RetrievalStageTiming]
+
+
+class StageStatistics(pydantic.BaseModel):
+    """Percentiles of the resources used by a stage over many sessions.
+    `peak_rss_mb` only covers the sessions in which the stage has called a
+    Proffast executable and is empty if there are none."""
+
+    retrieval_algorithm: types.RetrievalAlgorithm
+    sensor_id: str
+    stage: str
+    session_count: int
+    wall_time_seconds: dict[str, float]
+    cpu_time_seconds: dict[str, float]
+    peak_rss_mb: dict[str, float]
+    read_bytes: dict[str, float]
+    write_bytes: dict[str, float]
+
+
+def _get_usage() -> tuple[float, int, int]:
+    """CPU seconds and block I/O bytes (read, written) of this process and
+    all of its terminated subprocesses."""
+
+    self_usage = resource.getrusage(resource.RUSAGE_SELF)
+    children_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return (
+        self_usage.ru_utime
+        + self_usage.ru_stime
+        + children_usage.ru_utime
+        + children_usage.ru_stime,
+        (self_usage.ru_inblock + children_usage.ru_inblock) * _BLOCK_SIZE,
+        (self_usage.ru_oublock + children_usage.ru_oublock) * _BLOCK_SIZE,
+    )
+
+
+@contextlib.contextmanager
+def measure_stage(
+    stage: str,
+    timings: list[types.RetrievalStageTiming],
+    executable_usage_path: Optional[str] = None,
+) -> Generator[None, None, None]:
+    """Append the resources used inside the context to `timings` - also
+    when the stage raises an exception.
+
+    `getrusage` only knows the peak RSS since the start of the process, so
+    the peak RSS of the stage is taken from the records that the Proffast
+    executables append to `executable_usage_path` during the stage. Without
+    a path or without any executable call, it is `None`."""
+
+    start_wall_time = time.perf_counter()
+    start_cpu_time, start_read_bytes, start_write_bytes = _get_usage()
+    start_usage_count = (
+        0 if executable_usage_path is None else len(load_executable_usage(executable_usage_path))
+    )
+    try:
+        yield
+    finally:
+        cpu_time, read_bytes, write_bytes = _get_usage()
+        peak_rss_mb: Optional[float] = None
+        if executable_usage_path is not None:
+            stage_usages = load_executable_usage(executable_usage_path)[start_usage_count:]
+            if len(stage_usages) > 0:
+                peak_rss_mb = max(u.max_rss_mb for u in stage_usages)
+        timings.append(
+            types.RetrievalStageTiming(
+                stage=stage,
+                wall_time_seconds=round(time.perf_counter() - start_wall_time, 3),
+                cpu_time_seconds=round(cpu_time - start_cpu_time, 3),
+                peak_rss_mb=peak_rss_mb,
+                read_bytes=read_bytes - start_read_bytes,
+                write_bytes=write_bytes - start_write_bytes,
+            )
+        )
+
+
+def load_stage_timings(path: str) -> list[types.RetrievalStageTiming]:
+    """Load the timings written by the `PylotTelemetryMixin`."""
+
+    try:
+        with open(path, "r") as f:
+            return pydantic.TypeAdapter(list[types.RetrievalStageTiming]).validate_json(f.read())
+    except (FileNotFoundError, pydantic.ValidationError):
+        return []
+
+
+def append_session_metrics(
+    session: types.RetrievalSession,
+    timings: list[types.RetrievalStageTiming],
+    path: str = _METRICS_FILE,
+) -> None:
+    """Append the timings of a session to the node-level metrics file. Each
+    record is written with a single `write` to a file opened in append mode,
+    so the records of concurrent sessions do not interleave."""
+
+    record = SessionMetrics(
+        time=datetime.datetime.now(datetime.timezone.utc),
+        container_id=session.ctn.container_id,
+        retrieval_algorithm=session.retrieval_algorithm,
+        atmospheric_profile_model=session.atmospheric_profile_model,
+        sensor_id=session.ctx.sensor_id,
+        from_datetime=session.ctx.from_datetime,
+        output_suffix=session.job_settings.output_suffix,
+        timings=timings,
+    )
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, (record.model_dump_json() + "\n").encode())
+    finally:
+        os.close(fd)
+
+
+def load_session_metrics(path: str = _METRICS_FILE) -> list[SessionMetrics]:
+    """Load all records of the metrics file, skipping invalid lines."""
+
+    records: list[SessionMetrics] = []
+    if not os.path.isfile(path):
+        return records
+    with open(path, "r") as f:
+        for line in f:
+            try:
+                records.append(SessionMetrics.model_validate_json(line))
+            except pydantic.ValidationError:
+                continue
+    return records
+
+
+def _percentiles(values: list[float]) -> dict[str, float]:
+    """Nearest-rank percentiles."""
+
+    if len(values) == 0:
+        return {}
+    sorted_values = sorted(values)
+    return {
+        f"p{q}": sorted_values[max(math.ceil(q / 100 * len(sorted_values)) - 1, 0)]
+        for q in [50, 90, 99]
+    } | {"max": sorted_values[-1]}
+
+
+def compute_stage_statistics(records: list[SessionMetrics]) -> list[StageStatistics]:
+    """Aggregate the timings per retrieval algorithm, sensor and stage."""
+
+    groups: dict[tuple[types.RetrievalAlgorithm, str, str], list[types.RetrievalStageTiming]] = {}
+    for r in records:
+        for t in r.timings:
+            groups.setdefault((r.retrieval_algorithm, r.sensor_id, t.stage), []).append(t)
+
+    return [
+        StageStatistics(
+            retrieval_algorithm=algorithm,
+            sensor_id=sensor_id,
+            stage=stage,
+            session_count=len(timings),
+            wall_time_seconds=_percentiles([t.wall_time_seconds for t in timings]),
+            cpu_time_seconds=_percentiles([t.cpu_time_seconds for t in timings]),
+            peak_rss_mb=_percentiles([t.peak_rss_mb for t in timings if t.peak_rss_mb is not None]),
+            read_bytes=_percentiles([t.read_bytes for t in timings]),
+            write_bytes=_percentiles([t.write_bytes for t in timings]),
+        )
+        for (algorithm, sensor_id, stage), timings in sorted(groups.items())
+    ]
+
+
+class PylotTelemetryMixin:
+    """Mixin for the `Pylot` class of any Proffast 2.X version that measures
+    its preprocess, pcxs, invers and combine stages and writes the timings
+    to `timings_path` after every stage. The peak RSS of a stage is taken
+    from the records in `executable_usage_path` (see `PylotAccountingMixin`).
+
+    Use it as the first base class of the Pylot subclass at module level,
+    so that it measures the stages including all other mixins."""
+
+    timings_path: Optional[str] = None
+    executable_usage_path: Optional[str] = None
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.stage_timings: list[types.RetrievalStageTiming] = []
+
+    def _run_measured(self, stage: str, method: Callable[..., Any], **kwargs: Any) -> Any:
+        try:
+            with measure_stage(f"pylot.{stage}", self.stage_timings, self.executable_usage_path):
+                return method(**kwargs)
+        finally:
+            if self.timings_path is not None:
+                with open(self.timings_path, "w") as f:
+                    json.dump([t.model_dump() for t in self.stage_timings], f, indent=4)
+
+    def run_preprocess(self, n_processes: int = 1) -> Any:
+        return self._run_measured(
+            "preprocess",
+            super().run_preprocess,  # type: ignore
+            n_processes=n_processes,
+        )
+
+    def run_pcxs(self, n_processes: int = 1) -> Any:
+        return self._run_measured(
+            "pcxs",
+            super().run_pcxs,  # type: ignore
+            n_processes=n_processes,
+        )
+
+    def run_inv(self, n_processes: int = 1) -> Any:
+        return self._run_measured(
+            "invers",
+            super().run_inv,  # type: ignore
+            n_processes=n_processes,
+        )
+
+    def combine_results(self) -> Any:
+        return self._run_measured(
+            "combine",
+            super().combine_results,  # type: ignore
+        )
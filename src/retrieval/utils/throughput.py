@@ -0,0 +1,182 @@
+import datetime
+import statistics
+from typing import Iterable, Optional
+
+import pydantic
+
+from src import types
+
+from .retrieval_status import RetrievalStatus
+
+# the throughput is estimated from this many most recently finished sessions
+_RECENT_SESSION_COUNT = 50
+
+
+class JobEstimate(pydantic.BaseModel):
+    """Progress and projected remaining time of one retrieval job."""
+
+    retrieval_algorithm: types.RetrievalAlgorithm
+    atmospheric_profile_model: types.AtmosphericProfileModel
+    output_suffix: Optional[str]
+    pending_count: int
+    running_count: int
+    done_count: int
+    ifgs_per_core_second: Optional[float]
+    remaining_ifg_count: Optional[float]
+    remaining_core_seconds: Optional[float]
+
+
+class QueueEstimate(pydantic.BaseModel):
+    """Progress and projected end time of the whole retrieval queue, given
+    that `max_process_count` cores work through it."""
+
+    generated_at: datetime.datetime
+    max_process_count: int
+    pending_count: int
+    running_count: int
+    done_count: int
+    ifgs_per_core_second: Optional[float]
+    remaining_core_seconds: Optional[float]
+    estimated_remaining_seconds: Optional[float]
+    estimated_end_time: Optional[datetime.datetime]
+    jobs: list[JobEstimate]
+
+
+def _as_utc(dt: datetime.datetime) -> datetime.datetime:
+    return dt.replace(tzinfo=datetime.timezone.utc) if dt.tzinfo is None else dt
+
+
+def _core_seconds(s: RetrievalStatus, until: datetime.datetime) -> float:
+    assert s.process_start_time is not None
+    duration = (_as_utc(until) - _as_utc(s.process_start_time)).total_seconds()
+    return max(duration, 0.0) * (s.process_count or 1)
+
+
+def estimate_ifgs_per_core_second(statuses: Iterable[RetrievalStatus]) -> Optional[float]:
+    """The number of interferograms processed per core-second by the most
+    recently finished sessions. Returns `None` if no session has finished
+    yet."""
+
+    finished = sorted(
+        [
+            s
+            for s in statuses
+            if (s.process_start_time is not None)
+            and (s.process_end_time is not None)
+            and (s.ifg_count is not None)
+            and (s.ifg_count > 0)
+        ],
+        key=lambda s: _as_utc(s.process_end_time or s.from_datetime),
+    )[-_RECENT_SESSION_COUNT:]
+    ifg_count = sum(s.ifg_count or 0 for s in finished)
+    core_seconds = sum(_core_seconds(s, s.process_end_time or s.from_datetime) for s in finished)
+    if core_seconds <= 0:
+        return None
+    return ifg_count / core_seconds
+
+
+def _estimate_remaining_ifgs(
+    statuses: list[RetrievalStatus],
+    ifgs_per_core_second: Optional[float],
+    default_ifg_count: Optional[float],
+    now: datetime.datetime,
+) -> Optional[float]:
+    """Items that have not moved their interferograms yet are assumed to
+    have the mean interferogram count of the other items."""
+
+    known_ifg_counts = [s.ifg_count for s in statuses if s.ifg_count is not None]
+    mean_ifg_count = (
+        statistics.mean(known_ifg_counts) if len(known_ifg_counts) > 0 else default_ifg_count
+    )
+    remaining_ifg_count: float = 0.0
+    for s in statuses:
+        if s.process_end_time is not None:
+            continue
+        ifg_count = s.ifg_count if s.ifg_count is not None else mean_ifg_count
+        if ifg_count is None:
+            return None
+        if (s.process_start_time is not None) and (ifgs_per_core_second is not None):
+            ifg_count -= _core_seconds(s, now) * ifgs_per_core_second
+        remaining_ifg_count += max(ifg_count, 0.0)
+    return remaining_ifg_count
+
+
+def estimate_queue(
+    statuses: list[RetrievalStatus],
+    max_process_count: int,
+    now: Optional[datetime.datetime] = None,
+) -> QueueEstimate:
+    """Project the remaining time of each job and of the whole queue from the
+    throughput (interferograms per core-second) of recently finished
+    sessions. Jobs without finished sessions use the throughput of all
+    jobs. The remaining time of a job is its remaining core-seconds
+    spread over `max_process_count` cores."""
+
+    if now is None:
+        now = datetime.datetime.now(datetime.timezone.utc)
+    overall_throughput = estimate_ifgs_per_core_second(statuses)
+    known_ifg_counts = [s.ifg_count for s in statuses if s.ifg_count is not None]
+    overall_mean_ifg_count = (
+        statistics.mean(known_ifg_counts) if len(known_ifg_counts) > 0 else None
+    )
+
+    statuses_per_job: dict[
+        tuple[types.RetrievalAlgorithm, types.AtmosphericProfileModel, Optional[str]],
+        list[RetrievalStatus],
+    ] = {}
+    for s in statuses:
+        statuses_per_job.setdefault(
+            (s.retrieval_algorithm, s.atmospheric_profile_model, s.output_suffix), []
+        ).append(s)
+
+    jobs: list[JobEstimate] = []
+    for (algorithm, profile_model, output_suffix), job_statuses in statuses_per_job.items():
+        throughput = estimate_ifgs_per_core_second(job_statuses) or overall_throughput
+        remaining_ifg_count = _estimate_remaining_ifgs(
+            job_statuses, throughput, overall_mean_ifg_count, now
+        )
+        jobs.append(
+            JobEstimate(
+                retrieval_algorithm=algorithm,
+                atmospheric_profile_model=profile_model,
+                output_suffix=output_suffix,
+                pending_count=len([s for s in job_statuses if s.process_start_time is None]),
+                running_count=len(
+                    [
+                        s
+                        for s in job_statuses
+                        if (s.process_start_time is not None) and (s.process_end_time is None)
+                    ]
+                ),
+                done_count=len([s for s in job_statuses if s.process_end_time is not None]),
+                ifgs_per_core_second=throughput,
+                remaining_ifg_count=remaining_ifg_count,
+                remaining_core_seconds=(
+                    None
+                    if (remaining_ifg_count is None) or (throughput is None)
+                    else remaining_ifg_count / throughput
+                ),
+            )
+        )
+
+    remaining_core_seconds: Optional[float] = None
+    if all(j.remaining_core_seconds is not None for j in jobs):
+        remaining_core_seconds = sum(j.remaining_core_seconds or 0.0 for j in jobs)
+    estimated_remaining_seconds: Optional[float] = None
+    estimated_end_time: Optional[datetime.datetime] = None
+    if remaining_core_seconds is not None:
+        estimated_remaining_seconds = remaining_core_seconds / max(max_process_count, 1)
+        estimated_end_time = now + datetime.timedelta(seconds=estimated_remaining_seconds)
+
+    return QueueEstimate(
+        generated_at=now,
+        max_process_count=max_process_count,
+        pending_count=sum(j.pending_count for j in jobs),
+        running_count=sum(j.running_count for j in jobs),
+        done_count=sum(j.done_count for j in jobs),
+        ifgs_per_core_second=overall_throughput,
+        remaining_core_seconds=remaining_core_seconds,
+        estimated_remaining_seconds=estimated_remaining_seconds,
+        estimated_end_time=estimated_end_time,
+        jobs=jobs,
+    )
@@ -130,42 +130,25 @@ if __name__ == "__main__":
                         )
                         continue
 
-                    renamed_files: list[str] = []
-                    instrument_vars = [
-                        "ABP",
-                        "LWN",
-                        "RSN",
-                        "TSC",
-                        "DUR",
-                        "MVD",
-                        "PKA",
-                        "PKL",
-                        "PRA",
-                        "PRL",
-                        "P2A",
-                        "P2L",
-                        "P2R",
-                        "P2K",
+                    # read only the files that are not in the catalog yet
+                    utils.ifg_catalog.InterferogramCatalog.update(
+                        IFG_PATH, sensor_ids=[sensor_id], dates=[date]
+                    )
+                    catalog_entries = {
+                        e.filename: e
+                        for e in utils.ifg_catalog.InterferogramCatalog.get_day(sensor_id, date)
+                    }
+                    renamed_files = [
+                        f"{date_string[2:]}SN.{i + 1}" for i in range(len(filtered_filenames))
+                    ]
+                    instrument_vars = utils.ifg_catalog.INSTRUMENT_VARS
+                    file_checksums: list[str] = [
+                        catalog_entries[f].checksum for f in filtered_filenames
+                    ]
+                    instrument_values: list[list[Optional[float]]] = [
+                        [catalog_entries[f].instrument[var] for var in instrument_vars]
+                        for f in filtered_filenames
                     ]
-                    file_checksums: list[str] = []
-                    instrument_values: list[list[Optional[float]]] = []
-                    for ifg_index, filename in enumerate(filtered_filenames):
-                        filepath = os.path.join(ifg_dir, filename)
-                        renamed_files.append(f"{date_string[2:]}SN.{ifg_index + 1}")
-                        file_checksums.append(tum_esm_utils.files.get_file_checksum(filepath))
-
-                        values: list[Optional[float]] = [None] * len(instrument_vars)
-                        try:
-                            opus_file = tum_esm_utils.opus.OpusFile.read(
-                                filepath, interferogram_mode="skip"
-                            )
-                            for i, var in enumerate(instrument_vars):
-                                values[i] = opus_file.channel_parameters[0].instrument.get(
-                                    var, None
-                                )
-                        except:
-                            pass
-                        instrument_values.append(values)
 
                     # SAVE STATISTICS ABOUT INTERFEROGRAMS
 
@@ -25,5 +25,6 @@ from .retrieval_containers import Proffast24Container as Proffast24Container
 from .retrieval_containers import Proffast241Container as Proffast241Container
 from .retrieval_containers import RetrievalContainer as RetrievalContainer
 from .retrieval_containers import RetrievalSession as RetrievalSession
+from .retrieval_containers import RetrievalStageTiming as RetrievalStageTiming
 from .retrieval_containers import AboutRetrieval as AboutRetrieval
 from .retrieval_containers import AboutRetrievalConfig as AboutRetrievalConfig
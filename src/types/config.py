@@ -257,6 +257,72 @@ class ProfilesGGG2020StandardSitesItemConfig(pydantic.BaseModel):
         return self
 
 
+class RetrievalDistributedConfig(pydantic.BaseModel):
+    """Settings for running the retrieval on several nodes at once. Every node generates the full retrieval queue and claims each sensor-day via a lease file in a shared directory before processing it. Every node needs its own copy of the pipeline."""
+
+    model_config = pydantic.ConfigDict(extra="forbid")
+
+    lease_dir: tum_esm_utils.validators.StrictDirectoryPath = pydantic.Field(
+        ...,
+        description="Directory on a file system shared by all nodes (e.g. NFS or Lustre) in which the nodes store their job leases.",
+    )
+    lease_timeout: int = pydantic.Field(
+        default=900,
+        ge=60,
+        le=86400,
+        description="After how many seconds without a heartbeat a lease is considered expired and its sensor-day can be claimed by another node. Every node renews its leases every `lease_timeout / 4` seconds.",
+    )
+    node_id: Optional[str] = pydantic.Field(
+        default=None,
+        min_length=1,
+        description="Identifier of this node written into the lease files. If not set, the hostname is used.",
+    )
+
+
+class RetrievalAdaptiveProcessCountConfig(pydantic.BaseModel):
+    """Settings for adapting the number of parallel retrieval sessions to the available memory and CPU load."""
+
+    model_config = pydantic.ConfigDict(extra="forbid")
+
+    min_process_count: int = pydantic.Field(
+        default=1,
+        ge=1,
+        le=128,
+        description="This many sessions are always allowed to run in parallel, regardless of the memory and CPU load.",
+    )
+    min_available_memory_gb: float = pydantic.Field(
+        default=4.0,
+        ge=0,
+        description="A new session is only started if at least this much memory (in GB) remains available after subtracting the memory of one session and the memory that the running sessions have not allocated yet. The memory of one session is the largest memory usage of any finished session (`session_memory_gb` until the first session has finished). When using `/dev/shm` as the `container_dir`, the containers count as used memory.",
+    )
+    session_memory_gb: float = pydantic.Field(
+        default=2.0,
+        ge=0,
+        description="Estimated memory (in GB) of one session, used until the first session has finished. Freshly started sessions use almost no memory yet, so this much memory is reserved for each of them.",
+    )
+    max_load_per_core: float = pydantic.Field(
+        default=1.0,
+        gt=0,
+        description="A new session is only started if the 1-minute load average divided by the number of CPU cores is below this value. Sessions started within the last minute count as one unit of load each, because the load average lags behind.",
+    )
+
+
+class RetrievalFileCacheConfig(pydantic.BaseModel):
+    """Settings for a cache of Proffast outputs that is shared between the sessions of Proffast 2.X."""
+
+    model_config = pydantic.ConfigDict(extra="forbid")
+
+    directory: tum_esm_utils.validators.StrictDirectoryPath = pydantic.Field(
+        default=...,
+        description="Directory to store the cached files in. All retrieval processes on this host can share it. If it is on the same file system as the `container_dir`, large files are hardlinked instead of copied.",
+    )
+    max_size_gb: float = pydantic.Field(
+        default=50.0,
+        ge=0.1,
+        description="When the cache grows beyond this size (in GB), the least recently used entries are removed.",
+    )
+
+
 class RetrievalGeneralConfig(pydantic.BaseModel):
     model_config = pydantic.ConfigDict(extra="forbid")
 
@@ -275,14 +341,86 @@ class RetrievalGeneralConfig(pydantic.BaseModel):
             r"^$(SENSOR_ID)-$(YYYY)-$(MM)-$(DD).*\.nc$",
         ],
     )
+    adaptive_process_count: Optional[RetrievalAdaptiveProcessCountConfig] = pydantic.Field(
+        None,
+        description="If set, the number of parallel processes is adapted to the available memory and CPU load, between `min_process_count` and `max_process_count`. If not set, `max_process_count` processes are used.",
+    )
+    max_processes_per_session: int = pydantic.Field(
+        1,
+        ge=1,
+        le=128,
+        description="How many processes a single retrieval session of Proffast 2.X may use. A sensor-day only has one preprocess, pcxs and invers call, so the additional processes are only used for the invers shards (see `max_invers_shards`) and the preprocess slices (see `max_preprocess_slices`): a session is never given more processes than the larger of these two values, i.e. only one process if both are 1. A session is only given more than one process when there are more free process slots than sensor-days left in the queue - i.e. towards the end of a run, when a few long sessions would otherwise leave most cores idle. All sessions together never use more than `max_process_count` processes. Proffast 1.0 always uses one process.",
+    )
+    max_invers_shards: int = pydantic.Field(
+        1,
+        ge=1,
+        le=16,
+        description="Experimental, leave at 1 if the results have to be identical to an unsharded run. Into how many time-contiguous shards the spectra of a day may be split for the invers stage of Proffast 2.X. The shards run as separate invers calls in parallel, so this only has an effect on sessions that were given several processes (see `max_processes_per_session`), and only days with at least 200 spectra are split. Every shard starts with a few spectra of the previous shard to warm up the retrieval; their results are discarded and the outputs of the shards are merged back into the files of an unsharded run. The warm-up does not guarantee identical results: the rows of the spectra right after a shard boundary can differ slightly from those of an unsharded run. With 1, days are retrieved exactly like by the plain Pylot.",
+    )
+    max_preprocess_slices: int = pydantic.Field(
+        1,
+        ge=1,
+        le=16,
+        description="Into how many slices the interferograms of a day may be split for the preprocessing stage of Proffast 2.X. The slices are preprocessed by concurrent preprocess calls, so this only has an effect on sessions that were given several processes (see `max_processes_per_session`), and only days with at least 100 interferograms are split. The spectra and logfiles of the slices are merged into the spectra directory of the day.",
+    )
     queue_verbosity: Literal["compact", "verbose"] = pydantic.Field(
         "compact",
         description="How much information the retrieval queue should print out. In `verbose` mode it will print out the full list of sensor-days for each step of the filtering process. This can help when figuring out why a certain sensor-day is not processed.",
     )
+    queue_ordering: Literal["newest-first", "longest-first"] = pydantic.Field(
+        "newest-first",
+        description="In which order to process the retrieval queue. `newest-first` processes the newest sensor-days first. `longest-first` processes the sensor-days with the highest estimated processing time first (estimated from the number of interferograms and the runtimes per interferogram of the previous run). This reduces the total processing time when the queue contains a few very long sensor-days.",
+    )
+    queue_probing_concurrency: int = pydantic.Field(
+        1,
+        ge=1,
+        le=64,
+        description="How many threads to use for the file system lookups when generating the retrieval queue. On network file systems (NFS, CIFS) with a high latency, a value like 16 can speed up the queue generation considerably. The resulting queue does not depend on this value.",
+    )
+    resume_queue: bool = pydantic.Field(
+        False,
+        description="If true, a restarted retrieval continues with the unfinished sensor-days of the previous run instead of regenerating the queue from the data directories. Sensor-days that were running when the previous run was stopped are processed first. The previous queue is only resumed if the retrieval jobs, data paths, metadata and pipeline version are unchanged. New data is only picked up once the previous queue is finished.",
+    )
     container_dir: Optional[str] = pydantic.Field(
         None,
         description="Directory to store the containers in. If not set, it will use `./data/containers` inside the pipeline directory. If your system has enough memory, you could also use `/dev/shm` which is a memory-based file system where files are stored in memory and never written to disk.",
     )
+    log_format: Literal["text", "json"] = pydantic.Field(
+        "text",
+        description="Format of the logfiles of the retrieval sessions. `text` writes one line per message, `json` writes one JSON record per line with the time, level, container id, session stage (`inputs`, `templates`, `proffast`, `outputs`) and the seconds since the start of the session.",
+    )
+    container_pool_size: int = pydantic.Field(
+        0,
+        ge=0,
+        le=64,
+        description="Number of containers per retrieval algorithm to keep ready in advance. New containers are provisioned in the background, reflinking or hardlinking the compiled Proffast code instead of copying it where possible. The pre-warmed containers count as used memory when using `/dev/shm` as the `container_dir`.",
+    )
+    binary_cache_dir: Optional[tum_esm_utils.validators.StrictDirectoryPath] = pydantic.Field(
+        None,
+        description="Directory to cache the downloaded Proffast code archives and the compiled Proffast executables in. The executables are keyed by a hash of the Fortran sources, the compilation flags and the compiler version, so the retrieval only compiles the code if no node has compiled the same code before. The directory can be shared between nodes, also read-only.",
+    )
+    distributed: Optional[RetrievalDistributedConfig] = pydantic.Field(
+        None,
+        description="If set, several nodes can work through the same retrieval jobs at once by claiming sensor-days via lease files in a shared directory. If not set, this node processes the whole queue by itself.",
+    )
+    abscos_cache: Optional[RetrievalFileCacheConfig] = pydantic.Field(
+        None,
+        description="If set, the outputs of pcxs are cached by a hash of all pcxs inputs (location, date, pressure, atmospheric profile and Proffast version). Sessions with the same inputs - e.g. reruns of a day or co-located sensors - reuse them instead of running pcxs again. An `abscos.bin` file is usually between 100 and 500 MB. Only used by Proffast 2.X.",
+    )
+    spectra_cache: Optional[RetrievalFileCacheConfig] = pydantic.Field(
+        None,
+        description="If set, the spectra of each day are cached by a hash of the interferogram checksums, the preprocessing parameters (ILS, DC thresholds, location, etc.) and the Proffast version. Reruns of a day with a different atmospheric profile model or output suffix reuse them instead of preprocessing the interferograms again. The spectra of a day need about as much space as its interferograms. Only used by Proffast 2.X.",
+    )
+
+    @pydantic.model_validator(mode="after")
+    def check_process_count_bounds(self) -> RetrievalGeneralConfig:
+        if (self.adaptive_process_count is not None) and (
+            self.adaptive_process_count.min_process_count > self.max_process_count
+        ):
+            raise ValueError(
+                "adaptive_process_count.min_process_count must be <= max_process_count"
+            )
+        return self
 
 
 class RetrievalJobSettingsILSConfig(pydantic.BaseModel):
@@ -381,6 +519,23 @@ class RetrievalJobConfig(pydantic.BaseModel):
         return self
 
 
+class MetricsConfig(pydantic.BaseModel):
+    """Export of the pipeline metrics as textfiles in the Prometheus text format."""
+
+    model_config = pydantic.ConfigDict(extra="forbid")
+
+    textfile_dir: tum_esm_utils.validators.StrictDirectoryPath = pydantic.Field(
+        default=...,
+        description="Directory to write the metrics files `em27_retrieval.prom`, `em27_profiles.prom` and `em27_bundle.prom` to. Point the textfile collector of a local node_exporter (`--collector.textfile.directory`) to this directory.",
+    )
+    interval_seconds: int = pydantic.Field(
+        default=30,
+        ge=1,
+        le=3600,
+        description="How often the retrieval updates its metrics file (in seconds).",
+    )
+
+
 class GeneralConfig(pydantic.BaseModel):
     model_config = pydantic.ConfigDict(extra="forbid")
     metadata: Optional[MetadataConfig] = pydantic.Field(
@@ -388,6 +543,10 @@ class GeneralConfig(pydantic.BaseModel):
         description="If not set, the pipeline will use local metadata files or abort if the local files are not found. If local files are found, they will always be preferred over the remote data even if the remote source is configured.",
     )
     data: DataConfig
+    metrics: Optional[MetricsConfig] = pydantic.Field(
+        default=None,
+        description="If set, the retrieval, profiles and bundle commands export their metrics as textfiles, e.g. queue depth, throughput, failures, downloaded bytes and bundled rows.",
+    )
 
 
 class ProfilesConfig(pydantic.BaseModel):
@@ -33,6 +33,14 @@ class RetrievalContainerBase(pydantic.BaseModel):
             f"retrieval-container-{self.container_id}-outputs",
         )
 
+    @property
+    def executable_usage_path(self) -> str:
+        return os.path.join(
+            self.container_dir,
+            f"retrieval-container-{self.container_id}-inputs",
+            "executable_usage.jsonl",
+        )
+
 
 class Proffast10Container(RetrievalContainerBase):
     pass
@@ -55,6 +63,14 @@ class Proffast22Container(RetrievalContainerBase):
             "pylot_log_format.yml",
         )
 
+    @property
+    def pylot_timings_path(self) -> str:
+        return os.path.join(
+            self.container_dir,
+            f"retrieval-container-{self.container_id}-inputs",
+            "pylot_timings.json",
+        )
+
 
 class Proffast23Container(Proffast22Container):
     """No difference to `Proffast22Container`."""
@@ -96,11 +112,29 @@ class Proffast2RetrievalSession(pydantic.BaseModel):
     job_settings: RetrievalJobSettingsConfig
     ctx: em27_metadata.types.SensorDataContext
     ctn: Proffast22Container | Proffast23Container | Proffast24Container | Proffast241Container
+    process_budget: int = 1
+    invers_shard_count: int = 1
+    preprocess_slice_count: int = 1
 
 
 RetrievalSession = Proffast1RetrievalSession | Proffast2RetrievalSession
 
 
+class RetrievalStageTiming(pydantic.BaseModel):
+    """Resources used by one stage of a retrieval session, including all
+    subprocesses that have finished during the stage. `peak_rss_mb` is the
+    largest resident set size of the Proffast executables called during the
+    stage and `None` for stages that call none, `read_bytes` and
+    `write_bytes` count the block device I/O."""
+
+    stage: str
+    wall_time_seconds: float
+    cpu_time_seconds: float
+    peak_rss_mb: Optional[float] = None
+    read_bytes: int
+    write_bytes: int
+
+
 class AboutRetrievalConfig(pydantic.BaseModel):
     general: GeneralConfig
     retrieval: RetrievalConfig
@@ -112,3 +146,4 @@ class AboutRetrieval(pydantic.BaseModel):
     generationTime: str
     config: AboutRetrievalConfig
     session: RetrievalSession
+    timings: list[RetrievalStageTiming] = []
@@ -1,5 +1,9 @@
+from . import file_index as file_index
 from . import functions as functions
+from . import ifg_catalog as ifg_catalog
 from . import metadata as metadata
+from . import metrics as metrics
+from . import profile_inventory as profile_inventory
 from . import report as report
 from . import semaphores as semaphores
 from . import text as text
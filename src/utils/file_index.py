@@ -0,0 +1,119 @@
+import datetime
+import os
+import re
+from typing import Optional
+
+from .text import replace_regex_placeholders
+
+# placeholder -> (name of the regex group that captures it, regex of the group)
+_DATE_PLACEHOLDERS: dict[str, tuple[str, str]] = {
+    "$(DATE)": ("DATE", "\\d{8}"),
+    "$(YYYY)": ("YYYY", "\\d{4}"),
+    "$(YY)": ("YY", "\\d{2}"),
+    "$(MM)": ("MM", "\\d{2}"),
+    "$(DD)": ("DD", "\\d{2}"),
+}
+
+
+def _compile_date_capturing_pattern(regex_pattern: str, sensor_id: str) -> re.Pattern[str]:
+    """Replace the date placeholders with named groups. Repeated placeholders
+    become backreferences to the first occurrence."""
+
+    pattern = regex_pattern.replace("$(SENSOR_ID)", sensor_id)
+    for placeholder, (group_name, group_regex) in _DATE_PLACEHOLDERS.items():
+        first_index = pattern.find(placeholder)
+        if first_index == -1:
+            continue
+        pattern = (
+            pattern[:first_index]
+            + f"(?P<{group_name}>{group_regex})"
+            + pattern[first_index + len(placeholder) :].replace(placeholder, f"(?P={group_name})")
+        )
+    return re.compile(pattern)
+
+
+def _parse_date(groups: dict[str, Optional[str]]) -> Optional[datetime.date]:
+    try:
+        if groups.get("DATE") is not None:
+            date = datetime.datetime.strptime(str(groups["DATE"]), "%Y%m%d").date()
+            for name, value in [
+                ("YYYY", date.strftime("%Y")),
+                ("YY", date.strftime("%y")),
+                ("MM", date.strftime("%m")),
+                ("DD", date.strftime("%d")),
+            ]:
+                if groups.get(name) not in [None, value]:
+                    return None
+            return date
+        if (groups.get("YYYY") is None) or (
+            groups.get("YY") not in [None, str(groups["YYYY"])[2:]]
+        ):
+            return None
+        return datetime.date(
+            int(str(groups["YYYY"])), int(str(groups["MM"])), int(str(groups["DD"]))
+        )
+    except ValueError:
+        return None
+
+
+class DatedFileIndex:
+    """Index of the files in one directory that match a `file_regex` with the
+    placeholders `$(SENSOR_ID)`, `$(DATE)`, `$(YYYY)`, `$(YY)`, `$(MM)` and `$(DD)`.
+
+    The directory is listed once. If the regex pins down a full date (via
+    `$(DATE)` or `$(YYYY)`, `$(MM)` and `$(DD)`), the date of every file is
+    extracted from its name and lookups by date take constant time. Otherwise
+    (e.g. monthly files with only `$(YYYY)` and `$(MM)`), the lookups fall back
+    to matching the date-specific regex against the listed files.
+
+    The lookups give the same result as matching every file against the
+    second pattern returned by `utils.text.replace_regex_placeholders`, as
+    long as a filename does not contain several dates that the regex could
+    match at the same position."""
+
+    def __init__(self, directory: str, sensor_id: str, file_regex: str) -> None:
+        self.directory = directory
+        self.sensor_id = sensor_id
+        self.file_regex = file_regex
+
+        try:
+            self.all_files: list[str] = sorted(os.listdir(directory))
+        except (FileNotFoundError, NotADirectoryError):
+            self.all_files = []
+
+        general_file_pattern, _ = replace_regex_placeholders(
+            file_regex, sensor_id, datetime.date(2000, 1, 1)
+        )
+        self.general_matching_files: list[str] = [
+            f for f in self.all_files if general_file_pattern.match(f) is not None
+        ]
+
+        self.files_by_date: Optional[dict[datetime.date, list[str]]] = None
+        if ("$(DATE)" in file_regex) or all(p in file_regex for p in ["$(YYYY)", "$(MM)", "$(DD)"]):
+            date_capturing_pattern = _compile_date_capturing_pattern(file_regex, sensor_id)
+            self.files_by_date = {}
+            for f in self.general_matching_files:
+                m = date_capturing_pattern.match(f)
+                if m is None:
+                    continue
+                date = _parse_date(m.groupdict())
+                if date is not None:
+                    self.files_by_date.setdefault(date, []).append(f)
+
+    def find(self, date: datetime.date) -> list[str]:
+        """All files that match the `file_regex` on the given date."""
+
+        if self.files_by_date is not None:
+            return self.files_by_date.get(date, [])
+
+        _, specific_file_pattern = replace_regex_placeholders(self.file_regex, self.sensor_id, date)
+        return [
+            f for f in self.general_matching_files if specific_file_pattern.match(f) is not None
+        ]
+
+    def exists(self, date: datetime.date) -> bool:
+        """Whether any file matches the `file_regex` on the given date."""
+
+        if self.files_by_date is not None:
+            return date in self.files_by_date
+        return len(self.find(date)) > 0
@@ -1,6 +1,7 @@
+import concurrent.futures
 import datetime
 import os
-from typing import Any, Optional
+from typing import Any, Callable, Iterable, Optional, TypeVar
 import polars as pl
 import em27_metadata
 import tum_esm_utils
@@ -10,6 +11,9 @@ try:
 except ImportError:
     import tomli as tomllib  # type: ignore
 
+T = TypeVar("T")
+R = TypeVar("R")
+
 
 def sdc_covers_the_full_day(
     sdc: em27_metadata.types.SensorDataContext,
@@ -21,6 +25,22 @@ def sdc_covers_the_full_day(
     )
 
 
+def get_output_folder_slug(
+    sdc: em27_metadata.types.SensorDataContext,
+    output_suffix: Optional[str],
+) -> str:
+    """Returns the name of the results folder of a sensor data context
+    (`YYYYMMDD[_HHMMSS_HHMMSS][_suffix]`)."""
+
+    output_folder_slug = sdc.from_datetime.strftime("%Y%m%d")
+    if not sdc_covers_the_full_day(sdc):
+        output_folder_slug += sdc.from_datetime.strftime("_%H%M%S")
+        output_folder_slug += sdc.to_datetime.strftime("_%H%M%S")
+    if output_suffix is not None:
+        output_folder_slug += f"_{output_suffix}"
+    return output_folder_slug
+
+
 def get_pipeline_version() -> str:
     """Returns the current version (`x.y.z`) of the pipeline."""
 
@@ -75,3 +95,22 @@ def load_dat_file(
         )
         .drop("full", "splitted")
     )
+
+
+def concurrent_map(
+    function: Callable[[T], R],
+    items: Iterable[T],
+    concurrency: int,
+) -> list[R]:
+    """Like `map`, but runs on a thread pool with `concurrency` threads if
+    `concurrency > 1`. Meant for I/O bound functions like directory listings.
+
+    Returns: list of results in the order of the input items"""
+
+    items = list(items)
+    if (concurrency <= 1) or (len(items) <= 1):
+        return [function(item) for item in items]
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=min(concurrency, len(items))
+    ) as executor:
+        return list(executor.map(function, items))
@@ -0,0 +1,545 @@
+import contextlib
+import datetime
+import os
+import re
+import sqlite3
+from typing import Any, Callable, ClassVar, Generator, Optional
+
+import pydantic
+import tum_esm_utils
+
+from .functions import concurrent_map
+from .text import replace_regex_placeholders
+
+_PROJECT_DIR = tum_esm_utils.files.get_parent_dir_path(__file__, current_depth=3)
+_CATALOG_DATABASE = os.path.join(_PROJECT_DIR, "data", "ifg-catalog.sqlite")
+
+# concurrent writers wait for each other instead of dropping their update
+_BUSY_TIMEOUT_SECONDS = 60
+
+# the instrument parameters from the OPUS header stored for every interferogram
+INSTRUMENT_VARS = [
+    "ABP",
+    "LWN",
+    "RSN",
+    "TSC",
+    "DUR",
+    "MVD",
+    "PKA",
+    "PKL",
+    "PRA",
+    "PRL",
+    "P2A",
+    "P2L",
+    "P2R",
+    "P2K",
+]
+
+_COLUMNS = [
+    "sensor_id",
+    "date",
+    "filename",
+    "size",
+    "mtime_ns",
+    "checksum",
+    "measurement_time",
+    "read_error",
+    "validated",
+    *[f"instrument_{var}" for var in INSTRUMENT_VARS],
+]
+# bumped whenever the table layout changes - the catalog only caches
+# information from the interferograms, so outdated databases are recreated
+_SCHEMA_VERSION = 2
+_SCHEMA = [
+    "DROP TABLE IF EXISTS interferograms",
+    "DROP TABLE IF EXISTS directories",
+    f"""CREATE TABLE interferograms (
+        sensor_id TEXT NOT NULL,
+        date TEXT NOT NULL,
+        filename TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        checksum TEXT NOT NULL,
+        measurement_time TEXT,
+        read_error TEXT,
+        validated INTEGER NOT NULL,
+        {", ".join(f"instrument_{var} REAL" for var in INSTRUMENT_VARS)},
+        PRIMARY KEY (sensor_id, date, filename)
+    )""",
+    """CREATE TABLE directories (
+        sensor_id TEXT NOT NULL,
+        date TEXT NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        PRIMARY KEY (sensor_id, date)
+    )""",
+    f"PRAGMA user_version = {_SCHEMA_VERSION}",
+]
+
+
+class InterferogramEntry(pydantic.BaseModel):
+    """The information about one interferogram file, valid as long as its
+    size and modification time do not change."""
+
+    sensor_id: str
+    date: datetime.date
+    filename: str
+    size: int
+    mtime_ns: int
+    checksum: str
+    measurement_time: Optional[datetime.datetime] = pydantic.Field(
+        default=None, description="Timestamp of the first channel, `None` if unreadable"
+    )
+    read_error: Optional[str] = pydantic.Field(
+        default=None,
+        description="Why the file could not be read as an OPUS file, `None` if it is valid",
+    )
+    validated: bool = pydantic.Field(
+        default=False,
+        description="Whether the interferogram blocks have been checked, otherwise only the header",
+    )
+    instrument: dict[str, Optional[float]]
+
+    @property
+    def is_corrupt(self) -> bool:
+        return self.read_error is not None
+
+    def matches(self, stat: os.stat_result) -> bool:
+        return (self.size == stat.st_size) and (self.mtime_ns == stat.st_mtime_ns)
+
+    def to_row(self) -> tuple[Any, ...]:
+        return (
+            self.sensor_id,
+            self.date.strftime("%Y%m%d"),
+            self.filename,
+            self.size,
+            self.mtime_ns,
+            self.checksum,
+            None if self.measurement_time is None else self.measurement_time.isoformat(),
+            self.read_error,
+            int(self.validated),
+            *[self.instrument.get(var) for var in INSTRUMENT_VARS],
+        )
+
+    @staticmethod
+    def from_row(row: tuple[Any, ...]) -> "InterferogramEntry":
+        values = dict(zip(_COLUMNS, row))
+        return InterferogramEntry(
+            sensor_id=values["sensor_id"],
+            date=datetime.datetime.strptime(values["date"], "%Y%m%d").date(),
+            filename=values["filename"],
+            size=values["size"],
+            mtime_ns=values["mtime_ns"],
+            checksum=values["checksum"],
+            measurement_time=values["measurement_time"],
+            read_error=values["read_error"],
+            validated=bool(values["validated"]),
+            instrument={var: values[f"instrument_{var}"] for var in INSTRUMENT_VARS},
+        )
+
+
+class DaySummary(pydantic.BaseModel):
+    """The interferograms of one sensor-day in the catalog."""
+
+    sensor_id: str
+    date: datetime.date
+    ifg_count: int
+    corrupt_ifg_count: int
+    total_size: int
+    first_measurement_time: Optional[datetime.datetime]
+    last_measurement_time: Optional[datetime.datetime]
+
+
+class CatalogUpdate(pydantic.BaseModel):
+    """What an update of the catalog has done."""
+
+    scanned_directories: int = 0
+    unchanged_directories: int = 0
+    removed_directories: int = 0
+    read_files: int = 0
+    unchanged_files: int = 0
+    removed_files: int = 0
+
+
+def read_interferogram(
+    path: str,
+    sensor_id: str,
+    date: datetime.date,
+    stat: Optional[os.stat_result] = None,
+    validate: bool = False,
+) -> InterferogramEntry:
+    """Compute the checksum of an interferogram and read its OPUS header.
+
+    A file counts as corrupt if its header cannot be read or - with
+    `validate` - if the first and last block of the interferogram cannot
+    be read. This is a cheap check - the retrieval's corruption filter
+    runs the more thorough Proffast preprocessing on each file. The header
+    values of corrupt files are still read if possible."""
+
+    if stat is None:
+        stat = os.stat(path)
+    checksum = tum_esm_utils.files.get_file_checksum(path)
+    measurement_time: Optional[datetime.datetime] = None
+    read_error: Optional[str] = None
+    instrument: dict[str, Optional[float]] = {var: None for var in INSTRUMENT_VARS}
+    opus_file: Optional[tum_esm_utils.opus.OpusFile] = None
+    try:
+        opus_file = tum_esm_utils.opus.OpusFile.read(
+            path, interferogram_mode="validate" if validate else "skip"
+        )
+    except Exception as e:
+        read_error = f"{type(e).__name__}: {e}"
+        if validate:
+            try:
+                opus_file = tum_esm_utils.opus.OpusFile.read(path, interferogram_mode="skip")
+            except Exception:
+                pass
+    if opus_file is not None:
+        measurement_time = opus_file.measurement_times[0]
+        for var in INSTRUMENT_VARS:
+            instrument[var] = opus_file.channel_parameters[0].instrument.get(var, None)
+    return InterferogramEntry(
+        sensor_id=sensor_id,
+        date=date,
+        filename=os.path.basename(path),
+        size=stat.st_size,
+        mtime_ns=stat.st_mtime_ns,
+        checksum=checksum,
+        measurement_time=measurement_time,
+        read_error=read_error,
+        validated=validate,
+        instrument=instrument,
+    )
+
+
+def _list_date_directories(sensor_path: str) -> dict[str, int]:
+    """The `YYYYMMDD` directories of a sensor and their modification times."""
+
+    try:
+        with os.scandir(sensor_path) as entries:
+            return {
+                e.name: e.stat().st_mtime_ns
+                for e in entries
+                if (len(e.name) == 8) and e.name.isdigit() and e.is_dir()
+            }
+    except (FileNotFoundError, NotADirectoryError):
+        return {}
+
+
+def _list_files(directory: str) -> dict[str, os.stat_result]:
+    """The regular files in a directory, except for hidden files like `.do-not-touch`."""
+
+    try:
+        with os.scandir(directory) as entries:
+            return {
+                e.name: e.stat() for e in entries if (not e.name.startswith(".")) and e.is_file()
+            }
+    except (FileNotFoundError, NotADirectoryError):
+        return {}
+
+
+class InterferogramCatalog:
+    """A catalog of all interferograms under `interferograms.root`, stored
+    in an SQLite database in WAL mode: the size, modification time,
+    checksum, measurement time, instrument parameters and whether the file
+    is corrupt. Consumers can answer per-day questions from the catalog
+    without reading the raw files.
+
+    `update` only rescans the day directories whose modification time has
+    changed since the last update. Within these directories, only the
+    files whose size or modification time has changed are read again.
+    Every directory is committed separately, so an interrupted update
+    keeps its progress. Files that are modified in place do not change the
+    directory's modification time - use `force` to check every file.
+
+    The retrieval adds the files it had to read for a session without
+    validating their interferogram blocks (see `add_entries`), `update`
+    validates them when it rescans their directory."""
+
+    database_path: ClassVar[str] = _CATALOG_DATABASE
+
+    @classmethod
+    @contextlib.contextmanager
+    def connect(cls, read_only: bool = False) -> Generator[sqlite3.Connection, None, None]:
+        """Open the catalog database and commit the transaction on exit."""
+
+        if read_only:
+            connection = sqlite3.connect(
+                f"file:{cls.database_path}?mode=ro", uri=True, timeout=_BUSY_TIMEOUT_SECONDS
+            )
+        else:
+            os.makedirs(os.path.dirname(cls.database_path), exist_ok=True)
+            connection = sqlite3.connect(
+                cls.database_path, timeout=_BUSY_TIMEOUT_SECONDS, isolation_level="IMMEDIATE"
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            if connection.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+                with connection:
+                    # checked again, another process might have created it meanwhile
+                    connection.execute("BEGIN IMMEDIATE")
+                    if connection.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+                        for statement in _SCHEMA:
+                            connection.execute(statement)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    @classmethod
+    def _select(cls, query: str, parameters: list[Any]) -> list[tuple[Any, ...]]:
+        """Run a read-only query. Returns no rows if the catalog does not exist yet."""
+
+        if not os.path.isfile(cls.database_path):
+            return []
+        try:
+            with cls.connect(read_only=True) as connection:
+                return connection.execute(query, parameters).fetchall()
+        except sqlite3.OperationalError:
+            return []
+
+    @classmethod
+    def update(
+        cls,
+        interferograms_root: str,
+        sensor_ids: Optional[list[str]] = None,
+        dates: Optional[list[datetime.date]] = None,
+        concurrency: int = 8,
+        force: bool = False,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+    ) -> CatalogUpdate:
+        """Bring the catalog up to date with the interferogram directories.
+
+        Args:
+            interferograms_root: The directory containing one directory per sensor.
+            sensor_ids:          Only update these sensors. Defaults to all sensor directories.
+            dates:               Only update these dates.
+            concurrency:         Number of threads reading the files.
+            force:               Check the files of all directories, also of unchanged ones.
+            on_progress:         Called with the number of processed and of all
+                                 directories after each directory."""
+
+        if sensor_ids is None:
+            try:
+                sensor_ids = sorted(e.name for e in os.scandir(interferograms_root) if e.is_dir())
+            except FileNotFoundError:
+                sensor_ids = []
+        date_strings = None if dates is None else set(d.strftime("%Y%m%d") for d in dates)
+        result = CatalogUpdate()
+
+        with cls.connect() as connection:
+            known_directories: dict[tuple[str, str], int] = {
+                (sensor_id, date): mtime_ns
+                for sensor_id, date, mtime_ns in connection.execute(
+                    "SELECT sensor_id, date, mtime_ns FROM directories"
+                ).fetchall()
+            }
+
+        current_directories: dict[tuple[str, str], int] = {}
+        for sensor_id, date_directories in zip(
+            sensor_ids,
+            concurrent_map(
+                _list_date_directories,
+                [os.path.join(interferograms_root, s) for s in sensor_ids],
+                concurrency,
+            ),
+        ):
+            for date, mtime_ns in date_directories.items():
+                if (date_strings is None) or (date in date_strings):
+                    current_directories[(sensor_id, date)] = mtime_ns
+
+        # REMOVE DIRECTORIES THAT DO NOT EXIST ANYMORE
+
+        removed_directories = [
+            key
+            for key in known_directories
+            if (key[0] in sensor_ids)
+            and ((date_strings is None) or (key[1] in date_strings))
+            and (key not in current_directories)
+        ]
+        if len(removed_directories) > 0:
+            with cls.connect() as connection:
+                for sensor_id, date in removed_directories:
+                    result.removed_files += connection.execute(
+                        "DELETE FROM interferograms WHERE sensor_id = ? AND date = ?",
+                        (sensor_id, date),
+                    ).rowcount
+                    connection.execute(
+                        "DELETE FROM directories WHERE sensor_id = ? AND date = ?",
+                        (sensor_id, date),
+                    )
+        result.removed_directories = len(removed_directories)
+
+        # RESCAN DIRECTORIES THAT HAVE CHANGED
+
+        changed_directories = sorted(
+            key
+            for key, mtime_ns in current_directories.items()
+            if force or (known_directories.get(key) != mtime_ns)
+        )
+        result.unchanged_directories = len(current_directories) - len(changed_directories)
+        for index, (sensor_id, date) in enumerate(changed_directories):
+            directory = os.path.join(interferograms_root, sensor_id, date)
+            files = _list_files(directory)
+            known_entries = {
+                e.filename: e
+                for e in cls.get_day(sensor_id, datetime.datetime.strptime(date, "%Y%m%d").date())
+            }
+            new_filenames = [
+                f
+                for f, stat in sorted(files.items())
+                if (f not in known_entries)
+                or (not known_entries[f].matches(stat))
+                or (not known_entries[f].validated)
+            ]
+
+            def _read(filename: str) -> Optional[InterferogramEntry]:
+                try:
+                    return read_interferogram(
+                        os.path.join(directory, filename),
+                        sensor_id,
+                        datetime.datetime.strptime(date, "%Y%m%d").date(),
+                        stat=files[filename],
+                        validate=True,
+                    )
+                except FileNotFoundError:
+                    return None
+
+            new_entries = [
+                e for e in concurrent_map(_read, new_filenames, concurrency) if e is not None
+            ]
+            removed_filenames = [f for f in known_entries if f not in files]
+            with cls.connect() as connection:
+                connection.executemany(
+                    "DELETE FROM interferograms WHERE sensor_id = ? AND date = ? AND filename = ?",
+                    [(sensor_id, date, f) for f in removed_filenames],
+                )
+                connection.executemany(
+                    f"INSERT OR REPLACE INTO interferograms ({', '.join(_COLUMNS)}) "
+                    + f"VALUES ({', '.join('?' for _ in _COLUMNS)})",
+                    [e.to_row() for e in new_entries],
+                )
+                # the modification time from before the listing, so that
+                # changes during the scan are picked up by the next update
+                connection.execute(
+                    "INSERT OR REPLACE INTO directories (sensor_id, date, mtime_ns) "
+                    + "VALUES (?, ?, ?)",
+                    (sensor_id, date, current_directories[(sensor_id, date)]),
+                )
+            result.scanned_directories += 1
+            result.read_files += len(new_entries)
+            result.unchanged_files += len(files) - len(new_filenames)
+            result.removed_files += len(removed_filenames)
+            if on_progress is not None:
+                on_progress(index + 1, len(changed_directories))
+
+        return result
+
+    @classmethod
+    def add_entries(cls, entries: list[InterferogramEntry]) -> None:
+        """Add or replace the entries of individual files, e.g. of files that
+        have been read anyway. The directories are still rescanned by the
+        next `update`, which only reads the files again whose interferogram
+        blocks have not been validated yet."""
+
+        if len(entries) == 0:
+            return
+        with cls.connect() as connection:
+            connection.executemany(
+                f"INSERT OR REPLACE INTO interferograms ({', '.join(_COLUMNS)}) "
+                + f"VALUES ({', '.join('?' for _ in _COLUMNS)})",
+                [e.to_row() for e in entries],
+            )
+
+    @classmethod
+    def get_day(
+        cls,
+        sensor_id: str,
+        date: datetime.date,
+        file_regex: Optional[str] = None,
+    ) -> list[InterferogramEntry]:
+        """The entries of the interferograms of a sensor-day, sorted by
+        filename. `file_regex` can contain the same placeholders as
+        `config.retrieval.general.ifg_file_regex`."""
+
+        rows = cls._select(
+            f"SELECT {', '.join(_COLUMNS)} FROM interferograms "
+            + "WHERE sensor_id = ? AND date = ? ORDER BY filename",
+            [sensor_id, date.strftime("%Y%m%d")],
+        )
+        entries = [InterferogramEntry.from_row(row) for row in rows]
+        if file_regex is None:
+            return entries
+        _, file_pattern = replace_regex_placeholders(file_regex, sensor_id, date)
+        return [e for e in entries if file_pattern.match(e.filename) is not None]
+
+    @classmethod
+    def get_day_summaries(
+        cls,
+        sensor_id: str,
+        from_date: Optional[datetime.date] = None,
+        to_date: Optional[datetime.date] = None,
+        file_regex: Optional[str] = None,
+    ) -> list[DaySummary]:
+        """The summaries of all days of a sensor in the catalog, sorted by
+        date. Days without interferograms are not included."""
+
+        file_patterns: dict[str, re.Pattern[str]] = {}
+
+        def _matches(filename: str, date: str) -> bool:
+            assert file_regex is not None
+            if date not in file_patterns:
+                file_patterns[date] = replace_regex_placeholders(
+                    file_regex, sensor_id, datetime.datetime.strptime(date, "%Y%m%d").date()
+                )[1]
+            return file_patterns[date].match(filename) is not None
+
+        query = (
+            "SELECT date, COUNT(*), COUNT(read_error), SUM(size), "
+            + "MIN(measurement_time), MAX(measurement_time) FROM interferograms "
+            + "WHERE sensor_id = ? AND date >= ? AND date <= ?"
+            + ("" if file_regex is None else " AND ifg_file_matches(filename, date)")
+            + " GROUP BY date ORDER BY date"
+        )
+        parameters = [
+            sensor_id,
+            "00000000" if from_date is None else from_date.strftime("%Y%m%d"),
+            "99999999" if to_date is None else to_date.strftime("%Y%m%d"),
+        ]
+        if not os.path.isfile(cls.database_path):
+            return []
+        try:
+            with cls.connect(read_only=True) as connection:
+                connection.create_function("ifg_file_matches", 2, _matches, deterministic=True)
+                rows = connection.execute(query, parameters).fetchall()
+        except sqlite3.OperationalError:
+            return []
+        return [
+            DaySummary(
+                sensor_id=sensor_id,
+                date=datetime.datetime.strptime(date, "%Y%m%d").date(),
+                ifg_count=ifg_count,
+                corrupt_ifg_count=corrupt_ifg_count,
+                total_size=total_size,
+                first_measurement_time=first_measurement_time,
+                last_measurement_time=last_measurement_time,
+            )
+            for (
+                date,
+                ifg_count,
+                corrupt_ifg_count,
+                total_size,
+                first_measurement_time,
+                last_measurement_time,
+            ) in rows
+        ]
+
+    @classmethod
+    def get_scanned_sensor_ids(cls) -> list[str]:
+        """The sensors with at least one directory scanned by `update`."""
+
+        return [
+            row[0]
+            for row in cls._select(
+                "SELECT DISTINCT sensor_id FROM directories ORDER BY sensor_id", []
+            )
+        ]
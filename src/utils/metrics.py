@@ -0,0 +1,132 @@
+import math
+import os
+from typing import Literal, Optional
+
+from src import types
+
+_Labels = tuple[tuple[str, str], ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: _Labels) -> str:
+    if len(labels) == 0:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class MetricsRegistry:
+    """Counters, gauges and histograms of one pipeline component, written
+    to a textfile in the Prometheus text format, e.g. for the textfile
+    collector of a local node_exporter. The file is replaced atomically,
+    so the collector never reads a partially written file.
+
+    Counters count from the start of the process. Histograms are set from
+    all observed values at once, because the components recompute them
+    from their state anyway."""
+
+    def __init__(self, textfile_path: Optional[str] = None) -> None:
+        self.textfile_path = textfile_path
+        self._families: dict[str, tuple[Literal["counter", "gauge", "histogram"], str]] = {}
+        self._samples: dict[str, dict[_Labels, float]] = {}
+        self._histograms: dict[str, dict[_Labels, tuple[list[float], list[int], float, int]]] = {}
+
+    @staticmethod
+    def from_config(config: types.Config, component: str) -> "MetricsRegistry":
+        """The registry of a component (`retrieval`, `profiles` or `bundle`),
+        writing to `<textfile_dir>/em27_<component>.prom` if the metrics
+        export is configured."""
+
+        if config.general.metrics is None:
+            return MetricsRegistry()
+        return MetricsRegistry(
+            os.path.join(config.general.metrics.textfile_dir.root, f"em27_{component}.prom")
+        )
+
+    def _register(
+        self,
+        name: str,
+        metric_type: Literal["counter", "gauge", "histogram"],
+        description: str,
+    ) -> None:
+        registered = self._families.get(name)
+        if registered is None:
+            self._families[name] = (metric_type, description)
+            self._samples[name] = {}
+            self._histograms[name] = {}
+        elif registered[0] != metric_type:
+            raise ValueError(f"metric {name} is already registered as a {registered[0]}")
+
+    def inc(self, name: str, description: str, value: float = 1, **labels: str) -> None:
+        """Increase a counter. Counter names end with `_total`."""
+
+        assert name.endswith("_total"), "counter names must end with `_total`"
+        assert value >= 0, "counters can only be increased"
+        self._register(name, "counter", description)
+        key = tuple(sorted(labels.items()))
+        self._samples[name][key] = self._samples[name].get(key, 0) + value
+
+    def set(self, name: str, description: str, value: float, **labels: str) -> None:
+        """Set a gauge."""
+
+        self._register(name, "gauge", description)
+        self._samples[name][tuple(sorted(labels.items()))] = value
+
+    def set_histogram(
+        self,
+        name: str,
+        description: str,
+        values: list[float],
+        buckets: list[float],
+        **labels: str,
+    ) -> None:
+        """Set a histogram from all observed values. `buckets` are the
+        upper bounds, the `+Inf` bucket is added automatically."""
+
+        self._register(name, "histogram", description)
+        upper_bounds = sorted(buckets) + [math.inf]
+        self._histograms[name][tuple(sorted(labels.items()))] = (
+            upper_bounds,
+            [sum(1 for v in values if v <= b) for b in upper_bounds],
+            sum(values),
+            len(values),
+        )
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for name, (metric_type, description) in self._families.items():
+            lines.append(f"# HELP {name} {_escape(description)}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in self._samples[name].items():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+            for labels, (upper_bounds, counts, total, count) in self._histograms[name].items():
+                for upper_bound, bucket_count in zip(upper_bounds, counts):
+                    bucket_labels = labels + (("le", _format_value(upper_bound)),)
+                    lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {bucket_count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self) -> None:
+        """Atomically replace the textfile with the current values. Does
+        nothing if no textfile is configured."""
+
+        if self.textfile_path is None:
+            return
+        tmp_path = os.path.join(
+            os.path.dirname(self.textfile_path),
+            f".{os.path.basename(self.textfile_path)}.{os.getpid()}.tmp",
+        )
+        with open(tmp_path, "w") as f:
+            f.write(self.render())
+        os.replace(tmp_path, self.textfile_path)
@@ -0,0 +1,142 @@
+import datetime
+import os
+import re
+from typing import Optional
+
+from src import types
+
+from .functions import concurrent_map
+
+# `YYYYMMDD_48N011E.map` (GGG2014) or `YYYYMMDDHH_48N011E.map` (GGG2020)
+PROFILE_FILENAME_PATTERN = re.compile(r"^(\d{8})(\d{2})?_(\d{2}[NS]\d{3}[EW])\.(map|mod|vmr)$")
+
+
+def _list_names(path: str) -> list[str]:
+    try:
+        return os.listdir(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return []
+
+
+def _parse_date(date_string: str) -> Optional[datetime.date]:
+    try:
+        return datetime.datetime.strptime(date_string, "%Y%m%d").date()
+    except ValueError:
+        return None
+
+
+class AtmosphericProfileInventory:
+    """Inventory of the atmospheric profiles of one model.
+
+    Scans `atmospheric_profiles.root/<model>` once, including both the flat
+    layout (`<model>/<file>`, before ERP 1.7.0) and the nested layout
+    (`<model>/YYYY/MM/<file>`, starting with ERP 1.7.0). In the nested layout,
+    only files in the directory of their own year and month are considered,
+    just like `retrieval.session.move_profiles` looks them up.
+
+    The year and month directories are listed with `concurrency` threads."""
+
+    def __init__(
+        self,
+        atmospheric_profiles_root: str,
+        atmospheric_profile_model: types.AtmosphericProfileModel,
+        concurrency: int = 1,
+    ) -> None:
+        self.atmospheric_profile_model = atmospheric_profile_model
+        self.model_dir = os.path.join(atmospheric_profiles_root, atmospheric_profile_model)
+
+        self.filenames: set[str] = set()
+        year_dirs: list[str] = []
+        for name in _list_names(self.model_dir):
+            if PROFILE_FILENAME_PATTERN.match(name) is not None:
+                self.filenames.add(name)
+            elif re.match(r"^\d{4}$", name) is not None:
+                year_dirs.append(name)
+
+        month_dirs: list[tuple[str, str]] = []
+        for year, names in zip(
+            year_dirs,
+            concurrent_map(
+                lambda y: _list_names(os.path.join(self.model_dir, y)), year_dirs, concurrency
+            ),
+        ):
+            month_dirs.extend((year, m) for m in names if re.match(r"^\d{2}$", m) is not None)
+
+        for (year, month), names in zip(
+            month_dirs,
+            concurrent_map(
+                lambda ym: _list_names(os.path.join(self.model_dir, *ym)), month_dirs, concurrency
+            ),
+        ):
+            self.filenames.update(
+                name
+                for name in names
+                if (name[:4] == year)
+                and (name[4:6] == month)
+                and (PROFILE_FILENAME_PATTERN.match(name) is not None)
+            )
+
+    def has_file(self, filename: str) -> bool:
+        """Whether a profile file with this name exists in either layout."""
+
+        return filename in self.filenames
+
+    def _required_files(self, extensions: Optional[list[str]]) -> set[tuple[Optional[str], str]]:
+        if extensions is None:
+            extensions = ["map", "mod"]
+            if self.atmospheric_profile_model == "GGG2020":
+                extensions.append("vmr")
+        hours: list[Optional[str]] = (
+            [None]
+            if self.atmospheric_profile_model == "GGG2014"
+            else [f"{h:02d}" for h in range(0, 24, 3)]
+        )
+        return set((h, e) for h in hours for e in extensions)
+
+    def list_complete_days(
+        self,
+        extensions: Optional[list[str]] = None,
+    ) -> dict[str, set[datetime.date]]:
+        """All (location, date) pairs for which the profiles are complete, i.e.
+        all files with the given extensions exist (for GGG2020: for all eight
+        3-hourly timestamps). By default, all extensions downloaded from the
+        ERP (`map` and `mod`, plus `vmr` for GGG2020) are required.
+
+        Returns: dict mapping coordinate slugs (like `48N011E`) to dates"""
+
+        required_files = self._required_files(extensions)
+        available_files: dict[tuple[str, str], set[tuple[Optional[str], str]]] = {}
+        for filename in self.filenames:
+            m = PROFILE_FILENAME_PATTERN.match(filename)
+            assert m is not None
+            date_string, hour_string, coordinates_slug, extension = m.groups()
+            available_files.setdefault((coordinates_slug, date_string), set()).add(
+                (hour_string, extension)
+            )
+
+        complete_days: dict[str, set[datetime.date]] = {}
+        for (coordinates_slug, date_string), files in available_files.items():
+            if not required_files.issubset(files):
+                continue
+            date = _parse_date(date_string)
+            if date is not None:
+                complete_days.setdefault(coordinates_slug, set()).add(date)
+        return complete_days
+
+    def has_complete_day(
+        self,
+        coordinates_slug: str,
+        date: datetime.date,
+        extensions: Optional[list[str]] = None,
+    ) -> bool:
+        """Whether the profiles of this location and date are complete (see
+        `list_complete_days`). Stops looking at the first missing file."""
+
+        date_string = date.strftime("%Y%m%d")
+        for hour_string, extension in self._required_files(extensions):
+            if (
+                f"{date_string}{hour_string or ''}_{coordinates_slug}.{extension}"
+                not in self.filenames
+            ):
+                return False
+        return True
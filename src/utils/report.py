@@ -10,42 +10,23 @@ import tum_esm_utils
 
 from src import types
 
+from .file_index import DatedFileIndex
 from .functions import sdc_covers_the_full_day
-from .text import get_coordinates_slug, replace_regex_placeholders
+from .ifg_catalog import InterferogramCatalog
+from .profile_inventory import AtmosphericProfileInventory
+from .text import get_coordinates_slug
 
 
-def _ggg2014_profiles_exists(
-    path: str,
+def _profiles_exist(
+    profile_inventory: AtmosphericProfileInventory,
     lat: float,
     lon: float,
     date: datetime.date,
 ) -> str:
-    date_string = date.strftime("%Y%m%d")
-    coords_string = get_coordinates_slug(lat, lon)
     return (
         "✅"
-        if os.path.isfile(os.path.join(path, "GGG2014", f"{date_string}_{coords_string}.map"))
-        else "-"
-    )
-
-
-def _ggg2020_profiles_exists(
-    path: str,
-    lat: float,
-    lon: float,
-    date: datetime.date,
-) -> str:
-    date_string = date.strftime("%Y%m%d")
-    coords_string = get_coordinates_slug(lat, lon)
-    return (
-        "✅"
-        if all(
-            [
-                os.path.isfile(
-                    os.path.join(path, "GGG2020", f"{date_string}{h:02d}_{coords_string}.map")
-                )
-                for h in range(0, 22, 3)
-            ]
+        if profile_inventory.has_complete_day(
+            get_coordinates_slug(lat, lon), date, extensions=["map"]
         )
         else "-"
     )
@@ -67,19 +48,12 @@ def _count_ifg_datapoints(
 
 
 def _count_ground_pressure_datapoints(
-    config: types.Config,
-    sensor_id: str,
+    ground_pressure_index: DatedFileIndex,
     date: datetime.date,
 ) -> int:
-    _, file_pattern = replace_regex_placeholders(
-        config.general.data.ground_pressure.file_regex, sensor_id, date
-    )
-    d = os.path.join(config.general.data.ground_pressure.path.root, sensor_id)
-    all_files = os.listdir(d)
-    matching_files = [f for f in all_files if file_pattern.match(f) is not None]
     line_count = 0
-    for file in matching_files:
-        with open(os.path.join(d, file), "r") as f:
+    for file in ground_pressure_index.find(date):
+        with open(os.path.join(ground_pressure_index.directory, file), "r") as f:
             line_count += len(f.readlines())
     return line_count
 
@@ -138,12 +112,25 @@ def export_data_report(
     config: types.Config,
     em27_metadata_interface: em27_metadata.interfaces.EM27MetadataInterface,
     console: rich.console.Console,
+    use_ifg_catalog: bool = False,
 ) -> None:
+    """Export a CSV report per sensor to `data/reports`. With `use_ifg_catalog`,
+    the interferograms are counted from the interferogram catalog instead
+    of listing every directory and the number of corrupt interferograms is
+    included."""
+
+    ggg2014_profile_inventory = AtmosphericProfileInventory(
+        config.general.data.atmospheric_profiles.root, "GGG2014"
+    )
+    ggg2020_profile_inventory = AtmosphericProfileInventory(
+        config.general.data.atmospheric_profiles.root, "GGG2020"
+    )
     for sensor in em27_metadata_interface.sensors.root:
         from_datetimes: list[datetime.datetime] = []
         to_datetimes: list[datetime.datetime] = []
         location_ids: list[str] = []
         interferograms: list[int] = []
+        corrupt_interferograms: list[int] = []
         ground_pressure: list[int] = []
         ggg2014_profiles: list[str] = []
         ggg2020_profiles: list[str] = []
@@ -154,6 +141,16 @@ def export_data_report(
         ggg2020_proffast_22_outputs: list[str] = []
         ggg2020_proffast_23_outputs: list[str] = []
         ggg2020_proffast_24_outputs: list[str] = []
+        ground_pressure_index = DatedFileIndex(
+            os.path.join(config.general.data.ground_pressure.path.root, sensor.sensor_id),
+            sensor.sensor_id,
+            config.general.data.ground_pressure.file_regex,
+        )
+        ifg_day_summaries = (
+            {}
+            if not use_ifg_catalog
+            else {s.date: s for s in InterferogramCatalog.get_day_summaries(sensor.sensor_id)}
+        )
         console.print(f"determining sensor data contexts for sensor {sensor.sensor_id}")
         sdcs = em27_metadata_interface.get(
             sensor_id=sensor.sensor_id,
@@ -188,31 +185,36 @@ def export_data_report(
                         )
                     )
                     location_ids.append(sdc.location.location_id)
-                    interferograms.append(
-                        _count_ifg_datapoints(
-                            config.general.data.interferograms.root,
-                            sensor.sensor_id,
-                            date,
+                    if use_ifg_catalog:
+                        ifg_day_summary = ifg_day_summaries.get(date)
+                        interferograms.append(
+                            0 if ifg_day_summary is None else ifg_day_summary.ifg_count
                         )
-                    )
-                    ground_pressure.append(
-                        _count_ground_pressure_datapoints(
-                            config,
-                            sensor.sensor_id,
-                            date,
+                        corrupt_interferograms.append(
+                            0 if ifg_day_summary is None else ifg_day_summary.corrupt_ifg_count
+                        )
+                    else:
+                        interferograms.append(
+                            _count_ifg_datapoints(
+                                config.general.data.interferograms.root,
+                                sensor.sensor_id,
+                                date,
+                            )
                         )
+                    ground_pressure.append(
+                        _count_ground_pressure_datapoints(ground_pressure_index, date)
                     )
                     ggg2014_profiles.append(
-                        _ggg2014_profiles_exists(
-                            config.general.data.atmospheric_profiles.root,
+                        _profiles_exist(
+                            ggg2014_profile_inventory,
                             sdc.location.lat,
                             sdc.location.lon,
                             date,
                         )
                     )
                     ggg2020_profiles.append(
-                        _ggg2020_profiles_exists(
-                            config.general.data.atmospheric_profiles.root,
+                        _profiles_exist(
+                            ggg2020_profile_inventory,
                             sdc.location.lat,
                             sdc.location.lon,
                             date,
@@ -249,6 +251,7 @@ def export_data_report(
                 "to_datetime": to_datetimes,
                 "location_id": location_ids,
                 "interferograms": interferograms,
+                **({"corrupt_interferograms": corrupt_interferograms} if use_ifg_catalog else {}),
                 "ground_pressure": ground_pressure,
                 "ggg2014_profiles": ggg2014_profiles,
                 "ggg2014_proffast_10_outputs": ggg2014_proffast_10_outputs,
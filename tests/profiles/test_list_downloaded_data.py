@@ -43,7 +43,15 @@ def test_list_downloaded_data(provide_config_template: src.types.Config) -> None
                 config.general.data.atmospheric_profiles.root = tmpdir
                 os.mkdir(os.path.join(tmpdir, model))
                 for filename in filenames:
-                    with open(os.path.join(tmpdir, model, filename), "w"):
+                    # flat layout (before 1.7.0) or nested `YYYY/MM` layout
+                    d = random.choice(
+                        [
+                            os.path.join(tmpdir, model),
+                            os.path.join(tmpdir, model, filename[:4], filename[4:6]),
+                        ]
+                    )
+                    os.makedirs(d, exist_ok=True)
+                    with open(os.path.join(d, filename), "w"):
                         pass
                 downloaded = src.profiles.generate_queries.list_downloaded_data(config, model)
                 assert downloaded.keys() == downloaded_data.keys()
@@ -0,0 +1,107 @@
+import os
+import tempfile
+from typing import Any
+import pytest
+
+from src import retrieval
+from src.retrieval.utils import abscos_cache
+
+
+class _FakePylot:
+    """Stands in for the Pylot of one sensor: input files list the template
+    parameters line by line and "running pcxs" writes the four pcxs outputs
+    of the date, whose content only depends on the location and date."""
+
+    def __init__(self, root_dir: str, site: str) -> None:
+        self.site = site
+        self.proffast_path = os.path.join(root_dir, site, "prf")
+        for dirname in ["inp_fast", "wrk_fast", "out_fast"]:
+            os.makedirs(os.path.join(self.proffast_path, dirname))
+        with open(os.path.join(self.proffast_path, "pcxs24"), "w") as f:
+            f.write("pcxs executable")
+        self.map_file = os.path.join(root_dir, site, "so2017060812_Z.map")
+        with open(self.map_file, "w") as f:
+            f.write("map file content")
+        self.logger = retrieval.utils.logger.Logger(
+            "pytest", write_to_file=False, print_to_console=True
+        )
+        self.pcxs_calls = 0
+
+    def _get_executable(self, program: str) -> str:
+        return os.path.join(self.proffast_path, "pcxs24")
+
+    def replace_params_in_template(
+        self, parameters: dict[str, Any], template_type: str, prf_input_file: str
+    ) -> None:
+        with open(prf_input_file, "w") as f:
+            f.writelines(f"{key}={value}\n" for key, value in parameters.items())
+
+    def run_prf_with_inputfile(
+        self, prf_inputfile: str, executable: str, popen_kwargs: dict[str, Any] = {}
+    ) -> tuple[str, str, str, str]:
+        self.pcxs_calls += 1
+        with open(prf_inputfile, "r") as f:
+            parameters = dict(line.strip().split("=", 1) for line in f)
+        prefix = f"{parameters['SITE']}{parameters['DATE']}-"
+        for filename, dirname in abscos_cache.PCXS_OUTPUT_FILES.items():
+            with open(os.path.join(self.proffast_path, dirname, prefix + filename), "w") as f:
+                f.write(f"{filename} at {parameters['LAT']} on {parameters['DATE']}")
+        return "out", "", "0", f"{executable} {os.path.basename(prf_inputfile)}"
+
+    def pcxs(self, lat: float = 48.15) -> tuple[str, str, str, str]:
+        input_file = os.path.join(self.proffast_path, "inp_fast", f"pcxs24{self.site}170608.inp")
+        self.replace_params_in_template(
+            {
+                "ALT": 0.5,
+                "LAT": lat,
+                "LON": 11.57,
+                "DATAPATH": os.path.join(os.path.dirname(self.proffast_path), "analysis"),
+                "DATE": "170608",
+                "SITE": self.site,
+                "MAPPATH_WITH_MAPFILE": self.map_file,
+                "WET_VMR": True,
+            },
+            "pcxs",
+            input_file,
+        )
+        return self.run_prf_with_inputfile(input_file, self._get_executable("pcxs"))
+
+
+class _CachedFakePylot(abscos_cache.AbscosCacheMixin, _FakePylot):
+    pass
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_abscos_cache_mixin() -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache_dir = os.path.join(tmpdir, "cache")
+        os.mkdir(cache_dir)
+        _CachedFakePylot.abscos_cache_dir = cache_dir
+
+        # the first sensor runs pcxs and populates the cache
+        pylot_1 = _CachedFakePylot(tmpdir, "so")
+        assert pylot_1.pcxs()[2] == "0"
+        assert pylot_1.pcxs_calls == 1
+        assert len(os.listdir(cache_dir)) == 1
+
+        # a co-located sensor reuses the outputs under its own file names
+        pylot_2 = _CachedFakePylot(tmpdir, "mb")
+        assert pylot_2.pcxs()[2] == "0"
+        assert pylot_2.pcxs_calls == 0
+        for filename, dirname in abscos_cache.PCXS_OUTPUT_FILES.items():
+            with open(os.path.join(pylot_1.proffast_path, dirname, "so170608-" + filename)) as f:
+                content_1 = f.read()
+            with open(os.path.join(pylot_2.proffast_path, dirname, "mb170608-" + filename)) as f:
+                assert f.read() == content_1
+        abscos_path = os.path.join(pylot_2.proffast_path, "wrk_fast", "mb170608-abscos.bin")
+        assert os.stat(abscos_path).st_nlink > 1
+
+        # any change of the pcxs inputs is a cache miss
+        assert pylot_2.pcxs(lat=48.16)[2] == "0"
+        assert pylot_2.pcxs_calls == 1
+        with open(pylot_2.map_file, "w") as f:
+            f.write("updated map file content")
+        assert pylot_2.pcxs()[2] == "0"
+        assert pylot_2.pcxs_calls == 2
+        assert len(os.listdir(cache_dir)) == 3
@@ -0,0 +1,69 @@
+import os
+import tempfile
+import pytest
+
+from src.retrieval.dispatching import container_factory
+
+# stands in for the Proffast install script: "compiles" the sources into
+# one executable and counts its runs
+_INSTALL_SCRIPT = """#!/bin/bash
+set -o errexit
+cat prf/source/pcxs.f90 > prf/pcxs
+echo "$1" >> prf/pcxs
+chmod +x prf/pcxs
+echo "compiled" >> ../compilations.txt
+"""
+
+
+def _setup_root_dir(root_dir: str, source: str) -> None:
+    os.makedirs(os.path.join(root_dir, "prf", "source"))
+    with open(os.path.join(root_dir, "install.sh"), "w") as f:
+        f.write(_INSTALL_SCRIPT)
+    os.chmod(os.path.join(root_dir, "install.sh"), 0o755)
+    with open(os.path.join(root_dir, "prf", "source", "pcxs.f90"), "w") as f:
+        f.write(source)
+
+
+def _count_compilations(tmpdir: str) -> int:
+    with open(os.path.join(tmpdir, "compilations.txt"), "r") as f:
+        return len(f.readlines())
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_binary_cache() -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache_dir = os.path.join(tmpdir, "cache")
+        os.mkdir(cache_dir)
+
+        def _compile(root_dir: str, fast_compilation: bool = False) -> None:
+            container_factory.compile_code(
+                root_dir,
+                [os.path.join("prf", "pcxs")],
+                print,
+                fast_compilation=fast_compilation,
+                binary_cache_dir=cache_dir,
+            )
+
+        # the first node compiles the code and populates the cache
+        _setup_root_dir(os.path.join(tmpdir, "node-1"), "program pcxs")
+        _compile(os.path.join(tmpdir, "node-1"))
+        assert _count_compilations(tmpdir) == 1
+        assert len(os.listdir(cache_dir)) == 1
+
+        # a node with the same sources and flags only copies the executable
+        _setup_root_dir(os.path.join(tmpdir, "node-2"), "program pcxs")
+        _compile(os.path.join(tmpdir, "node-2"))
+        assert _count_compilations(tmpdir) == 1
+        executable_path = os.path.join(tmpdir, "node-2", "prf", "pcxs")
+        assert os.access(executable_path, os.X_OK)
+        with open(executable_path, "r") as f:
+            assert f.read() == "program pcxs\n"
+
+        # different flags or sources have to be compiled
+        _compile(os.path.join(tmpdir, "node-2"), fast_compilation=True)
+        assert _count_compilations(tmpdir) == 2
+        _setup_root_dir(os.path.join(tmpdir, "node-3"), "program pcxs ! updated")
+        _compile(os.path.join(tmpdir, "node-3"))
+        assert _count_compilations(tmpdir) == 3
+        assert len(os.listdir(cache_dir)) == 3
@@ -0,0 +1,135 @@
+import multiprocessing
+import time
+import psutil
+import pytest
+from ..fixtures import provide_config_template  # pyright: ignore[reportUnusedImport]
+
+from src import retrieval, types
+from src.retrieval.dispatching.concurrency_controller import ConcurrencyController
+
+
+def _sleep() -> None:
+    time.sleep(10)
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_concurrency_controller(provide_config_template: types.Config) -> None:
+    config = provide_config_template.model_copy(deep=True)
+    assert config.retrieval is not None
+    config.retrieval.general.max_process_count = 3
+    logger = retrieval.utils.logger.Logger("pytest", write_to_file=False, print_to_console=True)
+
+    processes = [multiprocessing.get_context("spawn").Process(target=_sleep) for _ in range(3)]
+    for p in processes:
+        p.start()
+
+    try:
+        # static mode: only limited by max_process_count
+        controller = ConcurrencyController(config, logger)
+        assert controller.poll_interval is None
+        assert controller.may_start_process(processes[:2])
+        assert not controller.may_start_process(processes)
+
+        # adaptive mode without any headroom: only min_process_count
+        config.retrieval.general.adaptive_process_count = (
+            types.config.RetrievalAdaptiveProcessCountConfig(
+                min_process_count=2, min_available_memory_gb=1e6
+            )
+        )
+        controller = ConcurrencyController(config, logger)
+        assert controller.poll_interval is not None
+        assert controller.may_start_process(processes[:1])
+        assert not controller.may_start_process(processes[:2])
+        assert controller.session_peak_rss[processes[0].name] > 0
+
+        # freshly started sessions have not allocated their memory yet: the
+        # estimated session memory is reserved for them until they finish
+        config.retrieval.general.adaptive_process_count = (
+            types.config.RetrievalAdaptiveProcessCountConfig(
+                min_process_count=1,
+                min_available_memory_gb=0,
+                session_memory_gb=psutil.virtual_memory().available / 1.5e9,
+                max_load_per_core=1e6,
+            )
+        )
+        controller = ConcurrencyController(config, logger)
+        assert controller.may_start_process([])
+        assert not controller.may_start_process(processes[:1])
+        assert controller.peak_session_rss is None
+
+        # once a session has finished, its peak memory is the estimate
+        assert controller.may_start_process(processes[1:2])
+        assert controller.peak_session_rss is not None
+        assert processes[0].name not in controller.session_peak_rss
+
+        # adaptive mode with plenty of headroom: up to max_process_count
+        config.retrieval.general.adaptive_process_count = (
+            types.config.RetrievalAdaptiveProcessCountConfig(
+                min_process_count=1,
+                min_available_memory_gb=0,
+                session_memory_gb=0,
+                max_load_per_core=1e6,
+            )
+        )
+        controller = ConcurrencyController(config, logger)
+        assert controller.may_start_process(processes[:2])
+        assert not controller.may_start_process(processes)
+    finally:
+        for p in processes:
+            p.terminate()
+            p.join()
+
+    with pytest.raises(ValueError):
+        types.config.RetrievalGeneralConfig.model_validate(
+            {
+                **config.retrieval.general.model_dump(),
+                "max_process_count": 1,
+                "adaptive_process_count": {"min_process_count": 2},
+            }
+        )
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_process_budget(provide_config_template: types.Config) -> None:
+    config = provide_config_template.model_copy(deep=True)
+    assert config.retrieval is not None
+    config.retrieval.general.max_process_count = 8
+    logger = retrieval.utils.logger.Logger("pytest", write_to_file=False, print_to_console=True)
+    processes = [
+        multiprocessing.get_context("spawn").Process(target=_sleep, name=f"session-{i}")
+        for i in range(3)
+    ]
+
+    # by default, every session uses one process
+    controller = ConcurrencyController(config, logger)
+    assert controller.get_process_budget([], queued_job_count=0) == 1
+
+    # without invers shards or preprocess slices, extra processes are useless
+    config.retrieval.general.max_processes_per_session = 4
+    controller = ConcurrencyController(config, logger)
+    assert controller.get_process_budget([], queued_job_count=0) == 1
+    config.retrieval.general.max_preprocess_slices = 3
+    controller = ConcurrencyController(config, logger)
+    assert controller.get_process_budget([], queued_job_count=0) == 3
+
+    # free slots are only given to sessions when the queue runs dry
+    config.retrieval.general.max_invers_shards = 4
+    controller = ConcurrencyController(config, logger)
+    assert controller.get_process_budget([], queued_job_count=10) == 1
+    assert controller.get_process_budget([], queued_job_count=3) == 2
+    assert controller.get_process_budget([], queued_job_count=0) == 4
+    assert controller.get_process_budget(processes[:2], queued_job_count=0) == 4
+
+    # sessions with several processes occupy several process slots
+    controller.set_process_budget(processes[0].name, 4)
+    controller.set_process_budget(processes[1].name, 3)
+    assert controller.get_process_budget(processes[:2], queued_job_count=0) == 1
+    assert controller.may_start_process(processes[:2])
+    controller.set_process_budget(processes[2].name, 1)
+    assert not controller.may_start_process(processes)
+
+    # budgets of finished processes are forgotten
+    assert controller.may_start_process(processes[1:])
+    assert processes[0].name not in controller.process_budgets
@@ -0,0 +1,63 @@
+import os
+import tempfile
+import pytest
+
+from src.retrieval.dispatching import container_factory
+
+
+def _write(path: str, content: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def _shares_data(path_1: str, path_2: str) -> bool:
+    """Hardlinked files share the inode, reflinked files are reported as
+    separate files - but writing to one of them never changes the other."""
+
+    if os.stat(path_1).st_ino == os.stat(path_2).st_ino:
+        return True
+    with open(path_1, "r") as f1, open(path_2, "r") as f2:
+        return f1.read() == f2.read()
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_container_provisioning() -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        src_dir = os.path.join(tmpdir, "main")
+        _write(os.path.join(src_dir, "prf", "preprocess", "preprocess6"), "executable")
+        _write(os.path.join(src_dir, "prf", "preprocess", "preprocess6.inp"), "input")
+        _write(os.path.join(src_dir, "prf", "inp_fast", "invers20.inp"), "input")
+        _write(os.path.join(src_dir, "prf", "wrk_fast", "README"), "working directory")
+        _write(os.path.join(src_dir, "prfpylot", "templates", "template_invers.inp"), "template")
+        os.chmod(os.path.join(src_dir, "prf", "preprocess", "preprocess6"), 0o755)
+
+        dst_dirs = [os.path.join(tmpdir, f"container-{i}") for i in range(2)]
+        for dst_dir in dst_dirs:
+            container_factory.provision_code_tree(src_dir, dst_dir)
+
+        for dst_dir in dst_dirs:
+            executable = os.path.join(dst_dir, "prf", "preprocess", "preprocess6")
+            assert _shares_data(
+                os.path.join(src_dir, "prf", "preprocess", "preprocess6"), executable
+            )
+            assert os.access(executable, os.X_OK)
+
+        # files that sessions write to are independent in every container
+        for relative_path in [
+            os.path.join("prf", "preprocess", "preprocess6.inp"),
+            os.path.join("prf", "inp_fast", "invers20.inp"),
+            os.path.join("prf", "wrk_fast", "README"),
+            os.path.join("prfpylot", "templates", "template_invers.inp"),
+        ]:
+            _write(os.path.join(dst_dirs[0], relative_path), "modified")
+            for path in [
+                os.path.join(src_dir, relative_path),
+                os.path.join(dst_dirs[1], relative_path),
+            ]:
+                with open(path, "r") as f:
+                    assert f.read() != "modified"
+                assert (
+                    os.stat(path).st_ino != os.stat(os.path.join(dst_dirs[0], relative_path)).st_ino
+                )
@@ -0,0 +1,102 @@
+import datetime
+import os
+import tempfile
+from typing import Any
+import pytest
+from ..fixtures import provide_config_template  # pyright: ignore[reportUnusedImport]
+
+from src import types
+from src.retrieval.dispatching.data_inventory import DataInventory
+
+
+def _touch(*path: str) -> None:
+    os.makedirs(os.path.dirname(os.path.join(*path)), exist_ok=True)
+    with open(os.path.join(*path), "w") as f:
+        f.write("")
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_data_inventory(
+    provide_config_template: types.Config, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    config = provide_config_template.model_copy(deep=True)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for d in ["ifgs", "profiles", "pressure", "results"]:
+            os.mkdir(os.path.join(tmpdir, d))
+        config.general.data.interferograms.root = os.path.join(tmpdir, "ifgs")
+        config.general.data.atmospheric_profiles.root = os.path.join(tmpdir, "profiles")
+        config.general.data.ground_pressure.path.root = os.path.join(tmpdir, "pressure")
+        config.general.data.ground_pressure.file_regex = "^gp-$(SENSOR_ID)-$(DATE).csv$"
+        config.general.data.results.root = os.path.join(tmpdir, "results")
+
+        _touch(tmpdir, "ifgs", "ma", "20220601", "ma20220601.ifg.001")
+        _touch(tmpdir, "ifgs", "ma", "20220601", "ma20220601.ifg.002")
+        _touch(tmpdir, "ifgs", "ma", "20220601", "notes.txt")
+        _touch(tmpdir, "ifgs", "ma", "20220602", ".do-not-touch")
+        _touch(tmpdir, "ifgs", "ma", "20220603")
+        _touch(tmpdir, "profiles", "GGG2014", "20220601_48N011E.map")
+        _touch(tmpdir, "profiles", "GGG2014", "2022", "06", "20220602_48N011E.map")
+        _touch(tmpdir, "profiles", "GGG2014", "2022", "07", "20220603_48N011E.map")
+        _touch(tmpdir, "pressure", "ma", "gp-ma-20220601.csv")
+        os.makedirs(
+            os.path.join(
+                tmpdir, "results", "proffast-2.4", "GGG2014", "ma", "successful", "20220601"
+            )
+        )
+        os.makedirs(
+            os.path.join(
+                tmpdir, "results", "proffast-2.4", "GGG2014", "ma", "failed", "20220602_v2"
+            )
+        )
+
+        d1, d2, d3 = [datetime.date(2022, 6, d) for d in [1, 2, 3]]
+        for concurrency in [1, 4]:
+            inventory = DataInventory(config, concurrency=concurrency)
+            if concurrency > 1:
+                inventory.prefetch_sensors(["ma", "mb"], "proffast-2.4", "GGG2014")
+                inventory.prefetch_locked_interferograms("ma", [d2, d1])
+                assert inventory.interferogram_dates == {
+                    "ma": {"20220601", "20220602"},
+                    "mb": set(),
+                }
+                assert inventory.locked_interferogram_dates == {
+                    ("ma", "20220601"): False,
+                    ("ma", "20220602"): True,
+                }
+
+                # the interferogram counts come from the same directory scan
+                scanned_paths: list[str] = []
+                original_scandir = os.scandir
+
+                def _scandir(path: str) -> Any:
+                    scanned_paths.append(path)
+                    return original_scandir(path)
+
+                monkeypatch.setattr(os, "scandir", _scandir)
+                assert inventory.get_interferogram_count("ma", d1) == 2
+                assert inventory.get_interferogram_count("ma", d2) == 0
+                assert scanned_paths == []
+                monkeypatch.undo()
+
+            assert inventory.has_interferograms("ma", d1)
+            assert inventory.has_interferograms("ma", d2)
+            assert not inventory.has_interferograms("ma", d3)  # a file, not a directory
+            assert not inventory.has_interferograms("mb", d1)
+            assert not inventory.has_locked_interferograms("ma", d1)
+            assert inventory.has_locked_interferograms("ma", d2)
+            assert inventory.get_interferogram_count("ma", d1) == 2
+
+            assert inventory.has_atmospheric_profile("GGG2014", "20220601_48N011E.map")
+            assert inventory.has_atmospheric_profile("GGG2014", "20220602_48N011E.map")
+            assert not inventory.has_atmospheric_profile("GGG2014", "20220603_48N011E.map")
+            assert not inventory.has_atmospheric_profile("GGG2020", "2022060100_48N011E.map")
+
+            assert inventory.has_ground_pressure_files("ma", d1)
+            assert not inventory.has_ground_pressure_files("ma", d2)
+            assert not inventory.has_ground_pressure_files("mb", d1)
+
+            assert inventory.has_output("proffast-2.4", "GGG2014", "ma", "20220601")
+            assert inventory.has_output("proffast-2.4", "GGG2014", "ma", "20220602_v2")
+            assert not inventory.has_output("proffast-2.4", "GGG2014", "ma", "20220602")
+            assert not inventory.has_output("proffast-2.4", "GGG2020", "ma", "20220601")
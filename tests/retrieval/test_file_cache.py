@@ -0,0 +1,28 @@
+import os
+import tempfile
+import pytest
+
+from src.retrieval.utils import file_cache
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_file_cache_eviction() -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = file_cache.FileCache(os.path.join(tmpdir, "cache"), max_size=250)
+        os.mkdir(cache.directory)
+        source_path = os.path.join(tmpdir, "abscos.bin")
+        with open(source_path, "wb") as f:
+            f.write(b"0" * 100)
+
+        for i, key in enumerate(["a", "b"]):
+            cache.store(key, {"abscos.bin": source_path})
+            os.utime(os.path.join(cache.directory, key), (1000 + i, 1000 + i))
+
+        # restoring "a" makes "b" the least recently used entry
+        restored_path = os.path.join(tmpdir, "restored.bin")
+        assert cache.restore("a", lambda filename: restored_path)
+        assert os.path.getsize(restored_path) == 100
+        assert not cache.restore("x", lambda filename: restored_path)
+        cache.store("c", {"abscos.bin": source_path})
+        assert sorted(os.listdir(cache.directory)) == ["a", "c"]
@@ -0,0 +1,123 @@
+import datetime
+import os
+import tempfile
+import pytest
+
+from src.utils.ifg_catalog import InterferogramCatalog, read_interferogram
+
+
+class _TmpInterferogramCatalog(InterferogramCatalog):
+    pass
+
+
+def _write_file(path: str, content: str, mtime: int) -> None:
+    with open(path, "w") as f:
+        f.write(content)
+    os.utime(path, (mtime, mtime))
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_ifg_catalog() -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        _TmpInterferogramCatalog.database_path = os.path.join(tmpdir, "ifg-catalog.sqlite")
+        root = os.path.join(tmpdir, "interferograms")
+        day1, day2 = datetime.date(2017, 1, 1), datetime.date(2017, 1, 2)
+        assert _TmpInterferogramCatalog.get_day("so", day1) == []
+        assert _TmpInterferogramCatalog.get_day_summaries("so") == []
+
+        for date, filenames in [
+            (day1, ["so20170101.ifg.0001", "so20170101.ifg.0002", "notes.txt"]),
+            (day2, ["so20170102.ifg.0001"]),
+        ]:
+            directory = os.path.join(root, "so", date.strftime("%Y%m%d"))
+            os.makedirs(directory)
+            for filename in filenames:
+                _write_file(os.path.join(directory, filename), filename, 1_000_000)
+            _write_file(os.path.join(directory, ".do-not-touch"), "", 1_000_000)
+            os.utime(directory, (1_000_000, 1_000_000))
+        os.makedirs(os.path.join(root, "so", "not-a-date"))
+
+        result = _TmpInterferogramCatalog.update(root, concurrency=2)
+        assert (result.scanned_directories, result.read_files) == (2, 4)
+        assert _TmpInterferogramCatalog.get_scanned_sensor_ids() == ["so"]
+
+        entries = _TmpInterferogramCatalog.get_day("so", day1)
+        assert [e.filename for e in entries] == [
+            "notes.txt",
+            "so20170101.ifg.0001",
+            "so20170101.ifg.0002",
+        ]
+        # the test files are no OPUS files
+        assert all(e.is_corrupt and (e.measurement_time is None) for e in entries)
+        assert entries[1].size == len("so20170101.ifg.0001")
+        assert len(set(e.checksum for e in entries)) == 3
+        assert [
+            e.filename
+            for e in _TmpInterferogramCatalog.get_day(
+                "so", day1, file_regex="^$(SENSOR_ID)$(DATE).*\\.\\d+$"
+            )
+        ] == ["so20170101.ifg.0001", "so20170101.ifg.0002"]
+
+        summaries = _TmpInterferogramCatalog.get_day_summaries(
+            "so", file_regex="^$(SENSOR_ID)$(DATE).*\\.\\d+$"
+        )
+        assert [(s.date, s.ifg_count, s.corrupt_ifg_count) for s in summaries] == [
+            (day1, 2, 2),
+            (day2, 1, 1),
+        ]
+        assert summaries[1].total_size == len("so20170102.ifg.0001")
+        assert [
+            s.date for s in _TmpInterferogramCatalog.get_day_summaries("so", from_date=day2)
+        ] == [day2]
+
+        # unchanged directories are skipped
+        result = _TmpInterferogramCatalog.update(root)
+        assert (result.scanned_directories, result.unchanged_directories) == (0, 2)
+
+        # only new or modified files of changed directories are read
+        directory = os.path.join(root, "so", "20170101")
+        _write_file(os.path.join(directory, "so20170101.ifg.0002"), "modified", 2_000_000)
+        _write_file(os.path.join(directory, "so20170101.ifg.0003"), "new", 2_000_000)
+        os.remove(os.path.join(directory, "notes.txt"))
+        os.utime(directory, (2_000_000, 2_000_000))
+        result = _TmpInterferogramCatalog.update(root, sensor_ids=["so"])
+        assert result.model_dump() == {
+            "scanned_directories": 1,
+            "unchanged_directories": 1,
+            "removed_directories": 0,
+            "read_files": 2,
+            "unchanged_files": 1,
+            "removed_files": 1,
+        }
+        entries = _TmpInterferogramCatalog.get_day("so", day1)
+        assert [(e.filename, e.size) for e in entries] == [
+            ("so20170101.ifg.0001", len("so20170101.ifg.0001")),
+            ("so20170101.ifg.0002", len("modified")),
+            ("so20170101.ifg.0003", len("new")),
+        ]
+
+        # files modified in place are only found with `force`
+        _write_file(os.path.join(directory, "so20170101.ifg.0003"), "NEW", 3_000_000)
+        assert _TmpInterferogramCatalog.update(root).read_files == 0
+        assert _TmpInterferogramCatalog.update(root, force=True).read_files == 1
+
+        # removed directories are removed from the catalog
+        for filename in os.listdir(os.path.join(root, "so", "20170102")):
+            os.remove(os.path.join(root, "so", "20170102", filename))
+        os.rmdir(os.path.join(root, "so", "20170102"))
+        result = _TmpInterferogramCatalog.update(root)
+        assert (result.removed_directories, result.removed_files) == (1, 1)
+        assert [s.date for s in _TmpInterferogramCatalog.get_day_summaries("so")] == [day1]
+
+        # files added by the retrieval are only validated by the next update
+        _write_file(os.path.join(directory, "so20170101.ifg.0004"), "staged", 4_000_000)
+        os.utime(directory, (4_000_000, 4_000_000))
+        staged_entry = read_interferogram(
+            os.path.join(directory, "so20170101.ifg.0004"), "so", day1
+        )
+        assert not staged_entry.validated
+        _TmpInterferogramCatalog.add_entries([staged_entry])
+        result = _TmpInterferogramCatalog.update(root)
+        assert (result.read_files, result.unchanged_files) == (1, 3)
+        assert all(e.validated for e in _TmpInterferogramCatalog.get_day("so", day1))
@@ -0,0 +1,336 @@
+import datetime
+import importlib
+import os
+import struct
+import sys
+import tempfile
+from typing import Any
+import pytest
+import tum_esm_utils
+
+from src import retrieval
+from src.retrieval.utils import invers_sharding
+
+_PROJECT_DIR = tum_esm_utils.files.get_parent_dir_path(__file__, current_depth=3)
+_RESULTS_DIR = os.path.join(
+    _PROJECT_DIR,
+    "data/testing/inputs/results/proffast-2.3/GGG2014/so/successful/20170608",
+)
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_split_spectra_pT_input() -> None:
+    spectra_pT_input = [f"170608_{i:06d}SN.BIN, 998.0, 0.0" for i in range(450)]
+
+    # small days are not split
+    shards = invers_sharding.split_spectra_pT_input(spectra_pT_input[:150], 4, ["a", "b", "c"])
+    assert len(shards) == 1
+    assert shards[0].spectra_pT_input == spectra_pT_input[:150]
+
+    shards = invers_sharding.split_spectra_pT_input(spectra_pT_input, 8, ["b", "a", "c", "d"])
+    assert [s.suffix for s in shards] == ["b", "a", "c", "d"]
+    assert shards[0].warmup_spectra == 0
+    assert all(s.warmup_spectra == invers_sharding.WARMUP_SPECTRA for s in shards[1:])
+
+    # without the warm-up spectra, the shards are the original list
+    assert [line for s in shards for line in s.spectra_pT_input[s.warmup_spectra :]] == (
+        spectra_pT_input
+    )
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_merge_invers_shards() -> None:
+    with open(os.path.join(_RESULTS_DIR, "so170608-invparms_a.dat"), "r") as f:
+        invparms_lines = f.read().splitlines(keepends=True)
+    with open(os.path.join(_RESULTS_DIR, "so170608-job01_a.spc"), "rb") as f:
+        spc_content = f.read()
+    spectrum_count, point_count = struct.unpack("<ii", spc_content[:8])
+    record_size = (len(spc_content) - 8) // spectrum_count
+    spc_records = [
+        spc_content[8 + i * record_size : 8 + (i + 1) * record_size] for i in range(spectrum_count)
+    ]
+    spectra_pT_input = [f"{line.split(',')[3].strip()}, 998.0, 0.0" for line in invparms_lines[1:]]
+    assert len(spectra_pT_input) == spectrum_count == 14
+
+    # three shards with two warm-up spectra each, as invers would write them
+    bounds = [(0, 0, 5), (2, 5, 10), (2, 10, 14)]
+    shards: list[invers_sharding.InversShard] = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        invparms_paths: list[str] = []
+        spc_paths: list[str] = []
+        for suffix, (warmup, start, end) in zip(["a", "b", "c"], bounds):
+            shards.append(
+                invers_sharding.InversShard(
+                    suffix, spectra_pT_input[start - warmup : end], warmup_spectra=warmup
+                )
+            )
+            invparms_paths.append(os.path.join(tmpdir, f"so170608-invparms_{suffix}.dat"))
+            with open(invparms_paths[-1], "w") as f:
+                f.writelines([invparms_lines[0], *invparms_lines[1 + start - warmup : 1 + end]])
+            spc_paths.append(os.path.join(tmpdir, f"so170608-job01_{suffix}.spc"))
+            with open(spc_paths[-1], "wb") as f:
+                f.write(struct.pack("<ii", end - start + warmup, point_count))
+                f.writelines(spc_records[start - warmup : end])
+
+        invers_sharding.merge_invparms_files(
+            shards, invparms_paths, os.path.join(tmpdir, "merged-invparms.dat")
+        )
+        invers_sharding.merge_spc_files(shards, spc_paths, os.path.join(tmpdir, "merged.spc"))
+
+        with open(os.path.join(tmpdir, "merged-invparms.dat"), "r") as f:
+            assert f.read() == "".join(invparms_lines)
+        with open(os.path.join(tmpdir, "merged.spc"), "rb") as f:
+            assert f.read() == spc_content
+
+
+class _FakePylot:
+    """Stands in for the Pylot: two invers calls (`b` and `c`) for one local
+    date, whose `run_inv` writes one invparms row per spectrum."""
+
+    def __init__(self, proffast_path: str) -> None:
+        self.proffast_path = proffast_path
+        self.logger = retrieval.utils.logger.Logger(
+            "pytest", write_to_file=False, print_to_console=True
+        )
+        self.invers_calls: list[str] = []
+
+    def get_inv_parameters(self, local_date: str) -> tuple[list[dict[str, str]], list[str]]:
+        return [
+            {
+                "SITE": "so",
+                "LOCAL_DATE": local_date,
+                "SUFFIX": suffix,
+                "SPECTRA_PT_INPUT": "\n".join(
+                    f"17060{day}_{i:06d}SN.BIN, 998.0, 0.0" for i in range(250)
+                ),
+            }
+            for suffix, day in [("b", 8), ("c", 9)]
+        ], []
+
+    def run_inv(self, n_processes: int = 1) -> None:
+        for parameters in self.get_inv_parameters("170608")[0]:
+            self.invers_calls.append(parameters["SUFFIX"])
+            prefix = os.path.join(self.proffast_path, "out_fast", "so170608-")
+            with open(prefix + f"invparms_{parameters['SUFFIX']}.dat", "w") as f:
+                f.write("JulianDate, spectrum\n")
+                for line in parameters["SPECTRA_PT_INPUT"].split("\n"):
+                    f.write(f"0.0, {line.split(',')[0]}\n")
+            with open(prefix + f"version_{parameters['SUFFIX']}.dat", "w") as f:
+                f.write("invers")
+
+
+class _ShardedFakePylot(invers_sharding.InversShardingMixin, _FakePylot):
+    invers_shard_count = 3
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_invers_sharding_mixin() -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.mkdir(os.path.join(tmpdir, "out_fast"))
+        pylot = _ShardedFakePylot(tmpdir)
+        pylot.run_inv()
+
+        # two shards per call (250 spectra), none reuses the suffix of the other call
+        assert sorted(pylot.invers_calls) == ["a", "b", "c", "d"]
+        assert sorted(os.listdir(os.path.join(tmpdir, "out_fast"))) == [
+            "so170608-invparms_b.dat",
+            "so170608-invparms_c.dat",
+            "so170608-version_b.dat",
+            "so170608-version_c.dat",
+        ]
+        for suffix, day in [("b", 8), ("c", 9)]:
+            with open(os.path.join(tmpdir, "out_fast", f"so170608-invparms_{suffix}.dat")) as f:
+                assert f.read().splitlines()[1:] == [
+                    f"0.0, 17060{day}_{i:06d}SN.BIN" for i in range(250)
+                ]
+
+
+_FAKE_INVERS = """#!{python}
+import os, sys
+
+with open(os.path.join("inp_fast", sys.argv[1])) as f:
+    site, local_date, suffix = f.readline().split()
+    spectra = [line.split(",")[0] for line in f.read().splitlines()]
+with open("invers-calls.txt", "a") as f:
+    f.write(suffix + "\\n")
+if not os.path.isfile(f"skip_{{suffix}}"):
+    prefix = os.path.join("out_fast", f"{{site}}{{local_date}}-")
+    with open(prefix + f"invparms_{{suffix}}.dat", "w") as f:
+        f.write("JulianDate, spectrum, XCO2\\n")
+        # like the parameter persistence of invers, every result depends
+        # on the results of the previous spectra of the same call
+        xco2 = 0.0
+        for spectrum in spectra:
+            xco2 = 0.5 * xco2 + 0.5 * (400 + int(spectrum[-11:-6]) % 7)
+            f.write(f"0.0, {{spectrum}}, {{xco2:.9f}}\\n")
+    with open(prefix + f"version_{{suffix}}.dat", "w") as f:
+        f.write("invers")
+"""
+
+
+class _FakePressureHandler:
+    interpolation_failed_at: list[datetime.datetime] = []
+
+    def prepare_pressure_df(self) -> None:
+        pass
+
+
+class _Proffast24Setup:
+    """Replaces the parts of the Proffast 2.4 Pylot that need a Pylot config,
+    interferograms and pressure data: two invers calls (`b` and `c`) for one
+    local date, run by a fake invers executable that writes one invparms
+    row per spectrum."""
+
+    # suffix, day and spectrum count of the invers calls
+    invers_calls = [("b", 8, 450), ("c", 9, 250)]
+
+    def __init__(self, proffast_path: str) -> None:
+        self.proffast_path = proffast_path
+        self.logfile_folder = proffast_path
+        self.site_name = "so"
+        self.local_dates = [datetime.datetime(2017, 6, 8)]
+        self.pressure_handler = _FakePressureHandler()
+        self.ignore_interpolation_error = False
+        self.global_inputfile_list: list[str] = []
+        self.logger = retrieval.utils.logger.Logger(
+            "pytest", write_to_file=False, print_to_console=True
+        )
+
+    def get_inv_parameters(
+        self, local_date: datetime.datetime
+    ) -> tuple[list[dict[str, str]], list[str]]:
+        return [
+            {
+                "SITE": "so",
+                "LOCAL_DATE": local_date.strftime("%y%m%d"),
+                "SUFFIX": suffix,
+                "SPECTRA_PT_INPUT": "\n".join(
+                    f"17060{day}_{i:06d}SN.BIN, 998.0, 0.0" for i in range(spectrum_count)
+                ),
+            }
+            for suffix, day, spectrum_count in self.invers_calls
+        ], []
+
+    def replace_params_in_template(
+        self, parameters: dict[str, str], template_type: str, prf_input_file: str
+    ) -> None:
+        assert template_type == "inv"
+        with open(prf_input_file, "w") as f:
+            f.write(f"{parameters['SITE']} {parameters['LOCAL_DATE']} {parameters['SUFFIX']}\n")
+            f.write(parameters["SPECTRA_PT_INPUT"])
+
+
+def _run_proffast_24_inv(tmpdir: str, attributes: dict[str, Any]) -> list[str]:
+    """Run the `run_inv` of the Proffast 2.4 Pylot with the mixin in a new
+    directory of `tmpdir` and return the suffixes of the invers calls."""
+
+    sys.path.insert(0, os.path.join(_PROJECT_DIR, "src/retrieval/algorithms/proffast-2.4/main"))
+    try:
+        pylot_class = type(
+            "ShardedPylot",
+            (
+                invers_sharding.InversShardingMixin,
+                _Proffast24Setup,
+                importlib.import_module("prfpylot.pylot").Pylot,
+            ),
+            attributes,
+        )
+        os.makedirs(os.path.join(tmpdir, "inp_fast"), exist_ok=True)
+        os.makedirs(os.path.join(tmpdir, "out_fast"), exist_ok=True)
+        with open(os.path.join(tmpdir, "invers24"), "w") as f:
+            f.write(_FAKE_INVERS.format(python=sys.executable))
+        os.chmod(os.path.join(tmpdir, "invers24"), 0o755)
+        if os.path.isfile(os.path.join(tmpdir, "invers-calls.txt")):
+            os.remove(os.path.join(tmpdir, "invers-calls.txt"))
+
+        pylot_class(tmpdir).run_inv()
+        with open(os.path.join(tmpdir, "invers-calls.txt")) as f:
+            return sorted(f.read().split())
+    finally:
+        sys.path.pop(0)
+        for module_name in [m for m in sys.modules if m.split(".")[0] == "prfpylot"]:
+            del sys.modules[module_name]
+
+
+def _load_invparms_rows(path: str) -> list[tuple[str, float]]:
+    with open(path) as f:
+        return [
+            (line.split(",")[1].strip(), float(line.split(",")[2])) for line in f.readlines()[1:]
+        ]
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_invers_sharding_with_proffast_24() -> None:
+    """The `run_inv` of Proffast 2.4 only runs the last input file of every
+    local date, all shards have to run nevertheless."""
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # without sharding, the Pylot behaves like the plain Pylot
+        assert _run_proffast_24_inv(tmpdir, {"invers_shard_count": 1}) == ["c"]
+        for filename in os.listdir(os.path.join(tmpdir, "out_fast")):
+            os.remove(os.path.join(tmpdir, "out_fast", filename))
+
+        assert _run_proffast_24_inv(tmpdir, {"invers_shard_count": 3}) == [
+            "a",
+            "b",
+            "c",
+            "d",
+            "e",
+        ]
+        assert sorted(os.listdir(os.path.join(tmpdir, "out_fast"))) == [
+            "so170608-invparms_b.dat",
+            "so170608-invparms_c.dat",
+            "so170608-version_b.dat",
+            "so170608-version_c.dat",
+        ]
+        for suffix, day, spectrum_count in _Proffast24Setup.invers_calls:
+            rows = _load_invparms_rows(
+                os.path.join(tmpdir, "out_fast", f"so170608-invparms_{suffix}.dat")
+            )
+            assert [r[0] for r in rows] == [
+                f"17060{day}_{i:06d}SN.BIN" for i in range(spectrum_count)
+            ]
+
+        # a shard without output fails the invers stage
+        with open(os.path.join(tmpdir, "skip_d"), "w") as f:
+            f.write("")
+        with pytest.raises(RuntimeError, match="missing"):
+            _run_proffast_24_inv(tmpdir, {"invers_shard_count": 3})
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_invers_sharding_matches_unsharded_run() -> None:
+    """Compare the merged output of a sharded invers call with the output
+    of the unsharded call. The warm-up spectra reduce the influence of the
+    shard boundaries, but the results right after a boundary still differ
+    slightly - this is why `max_invers_shards` is experimental."""
+
+    attributes: dict[str, Any] = {"invers_calls": [("b", 8, 450)]}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        unsharded_dir = os.path.join(tmpdir, "unsharded")
+        sharded_dir = os.path.join(tmpdir, "sharded")
+        assert _run_proffast_24_inv(unsharded_dir, {**attributes, "invers_shard_count": 1}) == ["b"]
+        assert _run_proffast_24_inv(sharded_dir, {**attributes, "invers_shard_count": 3}) == [
+            "a",
+            "b",
+            "c",
+        ]
+        unsharded_rows, sharded_rows = [
+            _load_invparms_rows(os.path.join(d, "out_fast", "so170608-invparms_b.dat"))
+            for d in [unsharded_dir, sharded_dir]
+        ]
+
+    assert [r[0] for r in sharded_rows] == [r[0] for r in unsharded_rows]
+    deviations = [abs(s[1] - u[1]) for s, u in zip(sharded_rows, unsharded_rows)]
+    boundaries = [150, 300]
+    assert all(d == 0 for d in deviations[: boundaries[0]])
+    assert all(0 < deviations[b] < 1 for b in boundaries)
+
+    # beyond the first rows after a boundary, the results are identical
+    boundary_rows = set(b + i for b in boundaries for i in range(30))
+    assert all(d < 1e-9 for i, d in enumerate(deviations) if i not in boundary_rows)
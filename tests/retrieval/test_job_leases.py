@@ -0,0 +1,127 @@
+import datetime
+import os
+import tempfile
+import time
+import pytest
+import em27_metadata
+import tum_esm_utils
+from ..fixtures import provide_config_template  # pyright: ignore[reportUnusedImport]
+
+from src import retrieval, types
+from src.retrieval.dispatching.job_leases import JobLeaseManager
+from src.retrieval.utils.job_queue import RetrievalJob
+
+em27_metadata_interface = em27_metadata.interfaces.EM27MetadataInterface(
+    locations=em27_metadata.types.LocationMetadataList(
+        root=[
+            em27_metadata.types.LocationMetadata(
+                location_id="SOD", details="Sodankyla", lon=26.630, lat=67.366, alt=181.0
+            )
+        ]
+    ),
+    sensors=em27_metadata.types.SensorMetadataList(
+        root=[
+            em27_metadata.types.SensorMetadata(
+                sensor_id="so",
+                serial_number=1,
+                setups=[
+                    em27_metadata.types.SetupsListItem(
+                        from_datetime="2017-01-01T00:00:00+0000",  # pyright: ignore[reportArgumentType]
+                        to_datetime="2017-12-31T23:59:59+0000",  # pyright: ignore[reportArgumentType]
+                        value=em27_metadata.types.Setup(location_id="SOD"),
+                    )
+                ],
+            )
+        ]
+    ),
+    campaigns=em27_metadata.types.CampaignMetadataList(root=[]),
+)
+
+
+def _get_job(day: int) -> RetrievalJob:
+    return RetrievalJob(
+        retrieval_algorithm="proffast-2.4",
+        atmospheric_profile_model="GGG2020",
+        sensor_data_context=em27_metadata_interface.get(
+            "so",
+            datetime.datetime(2017, 6, day, 0, 0, 0, tzinfo=datetime.timezone.utc),
+            datetime.datetime(2017, 6, day, 23, 59, 59, tzinfo=datetime.timezone.utc),
+        )[0],
+        job_settings=types.config.RetrievalJobSettingsConfig(),
+    )
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_job_leases(provide_config_template: types.Config) -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.mkdir(os.path.join(tmpdir, "leases"))
+        os.mkdir(os.path.join(tmpdir, "results"))
+        managers: list[JobLeaseManager] = []
+        for node_id in ["node-a", "node-b"]:
+            config = provide_config_template.model_copy(deep=True)
+            config.general.data.results.root = os.path.join(tmpdir, "results")
+            assert config.retrieval is not None
+            config.retrieval.general.distributed = types.config.RetrievalDistributedConfig(
+                lease_dir=os.path.join(tmpdir, "leases"),  # pyright: ignore[reportArgumentType]
+                lease_timeout=60,
+                node_id=node_id,
+            )
+            logger = retrieval.utils.logger.Logger(
+                "pytest", write_to_file=False, print_to_console=True
+            )
+            managers.append(JobLeaseManager(config, logger))
+        node_a, node_b = managers
+        job_1, job_2, job_3 = _get_job(1), _get_job(2), _get_job(3)
+
+        # a job can only be claimed once
+        assert node_a.try_claim(job_1) == "claimed"
+        assert node_b.try_claim(job_1) == "leased"
+        assert node_a.try_claim(job_1) == "leased"
+        assert node_b.try_claim(job_2) == "claimed"
+        assert len(os.listdir(os.path.join(tmpdir, "leases"))) == 2
+        assert abs(node_b.get_lease_expiry(job_1) - (time.time() + 60)) < 5
+        assert abs(node_b.get_lease_expiry(job_3) - time.time()) < 5
+
+        # expired leases can be claimed by another node
+        lease_path = node_a.held_leases[node_a._lease_filename(job_1)][0]  # pyright: ignore[reportPrivateUsage]
+        os.utime(lease_path, (time.time() - 120, time.time() - 120))
+        assert node_b.try_claim(job_1) == "claimed"
+        assert "node-b" in tum_esm_utils.files.load_file(lease_path)
+
+        # the previous owner neither removes nor renews the lease it has lost
+        node_a.release(job_1)
+        assert "node-b" in tum_esm_utils.files.load_file(lease_path)
+        assert node_a.try_claim(job_1) == "leased"
+        assert node_a.try_claim(job_3) == "claimed"
+        lease_path = node_a.held_leases[node_a._lease_filename(job_3)][0]  # pyright: ignore[reportPrivateUsage]
+        os.utime(lease_path, (time.time() - 120, time.time() - 120))
+        assert node_b.try_claim(job_3) == "claimed"
+        os.utime(lease_path, (time.time() - 30, time.time() - 30))
+        node_a.renew()
+        assert abs(os.stat(lease_path).st_mtime - (time.time() - 30)) < 5
+        assert node_a.held_leases == {}
+        node_a.release_all()
+        assert "node-b" in tum_esm_utils.files.load_file(lease_path)
+
+        # renewed leases do not expire
+        lease_path = node_b.held_leases[node_b._lease_filename(job_2)][0]  # pyright: ignore[reportPrivateUsage]
+        os.utime(lease_path, (time.time() - 120, time.time() - 120))
+        node_b.renew()
+        assert node_a.try_claim(job_2) == "leased"
+
+        # released jobs with an output are not processed again
+        os.makedirs(
+            os.path.join(tmpdir, "results", "proffast-2.4", "GGG2020", "so", "failed", "20170602")
+        )
+        node_b.release(job_2)
+        assert node_a.try_claim(job_2) == "processed"
+
+        node_b.release_all()
+        assert node_b.held_leases == {}
+        assert node_a.try_claim(job_1) == "claimed"
+        assert node_a.try_claim(job_3) == "claimed"
+        assert sorted(os.listdir(os.path.join(tmpdir, "leases"))) == [
+            "proffast-2.4_GGG2020_so_20170601.lease",
+            "proffast-2.4_GGG2020_so_20170603.lease",
+        ]
@@ -0,0 +1,202 @@
+import datetime
+import os
+import tempfile
+import time
+import pytest
+import em27_metadata
+
+from src import types
+from src.retrieval.utils.job_queue import RetrievalJobQueue, compute_seconds_per_ifg
+from src.retrieval.utils.queue_state import QueueState
+from src.retrieval.utils.retrieval_status import RetrievalStatus
+
+em27_metadata_interface = em27_metadata.interfaces.EM27MetadataInterface(
+    locations=em27_metadata.types.LocationMetadataList(
+        root=[
+            em27_metadata.types.LocationMetadata(
+                location_id="SOD",
+                details="Sodankyla",
+                lon=26.630,
+                lat=67.366,
+                alt=181.0,
+            )
+        ]
+    ),
+    sensors=em27_metadata.types.SensorMetadataList(
+        root=[
+            em27_metadata.types.SensorMetadata(
+                sensor_id="so",
+                serial_number=1,
+                setups=[
+                    em27_metadata.types.SetupsListItem(
+                        from_datetime="2017-01-01T00:00:00+0000",  # pyright: ignore[reportArgumentType]
+                        to_datetime="2017-12-31T23:59:59+0000",  # pyright: ignore[reportArgumentType]
+                        value=em27_metadata.types.Setup(location_id="SOD"),
+                    )
+                ],
+            )
+        ]
+    ),
+    campaigns=em27_metadata.types.CampaignMetadataList(root=[]),
+)
+
+
+def _get_sdc(day: int) -> em27_metadata.types.SensorDataContext:
+    return em27_metadata_interface.get(
+        "so",
+        datetime.datetime(2017, 6, day, 0, 0, 0, tzinfo=datetime.timezone.utc),
+        datetime.datetime(2017, 6, day, 23, 59, 59, tzinfo=datetime.timezone.utc),
+    )[0]
+
+
+def _fill_queue(
+    queue: RetrievalJobQueue,
+    costs: dict[int, float],
+    requeued_days: list[int] = [],
+) -> list[int]:
+    for day, cost in costs.items():
+        queue.push(
+            "proffast-2.4",
+            "GGG2020",
+            _get_sdc(day),
+            types.config.RetrievalJobSettingsConfig(),
+            estimated_cost=cost,
+            requeued=(day in requeued_days),
+        )
+    assert len(queue) == len(costs)
+    popped_days: list[int] = []
+    while not queue.is_empty():
+        peeked_job = queue.peek()
+        job = queue.pop()
+        assert job is not None
+        assert peeked_job == job
+        popped_days.append(job.sensor_data_context.from_datetime.day)
+    assert queue.pop() is None
+    return popped_days
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_job_queue_ordering() -> None:
+    costs = {9: 10.0, 8: 3000.0, 7: 10.0, 6: 500.0}
+
+    assert _fill_queue(RetrievalJobQueue(ordering="newest-first"), costs) == [9, 8, 7, 6]
+    assert _fill_queue(RetrievalJobQueue(ordering="longest-first"), costs) == [8, 6, 9, 7]
+
+    # interrupted jobs of a previous run come first
+    assert _fill_queue(RetrievalJobQueue(ordering="newest-first"), costs, [7]) == [7, 9, 8, 6]
+    assert _fill_queue(RetrievalJobQueue(ordering="longest-first"), costs, [7, 9]) == [9, 7, 8, 6]
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_job_queue_deferral() -> None:
+    queue = RetrievalJobQueue(ordering="newest-first")
+    for day in [3, 2, 1]:
+        queue.push(
+            "proffast-2.4", "GGG2020", _get_sdc(day), types.config.RetrievalJobSettingsConfig()
+        )
+    assert queue.get_deferral_timeout() is None
+
+    # deferred jobs are kept in the queue but not popped before their time
+    job_3 = queue.pop()
+    assert job_3 is not None
+    queue.defer(job_3, not_before=time.time() + 0.5)
+    job_2 = queue.pop()
+    assert job_2 is not None
+    queue.defer(job_2, not_before=time.time() + 60)
+    assert len(queue) == 3
+    timeout = queue.get_deferral_timeout()
+    assert (timeout is not None) and (0 < timeout <= 0.5)
+    assert [j.sensor_data_context.from_datetime.day for j in queue.to_list()] == [3, 2, 1]
+
+    job_1 = queue.pop()
+    assert (job_1 is not None) and (job_1.sensor_data_context.from_datetime.day == 1)
+    assert queue.pop() is None
+    assert not queue.is_empty()
+
+    # once its time has passed, a deferred job keeps its position
+    queue.push("proffast-2.4", "GGG2020", _get_sdc(4), types.config.RetrievalJobSettingsConfig())
+    time.sleep(0.5)
+    assert queue.pop() == job_3
+    assert queue.pop() is not None
+    assert (queue.pop() is None) and (len(queue) == 1)
+
+
+class _TmpQueueState(QueueState):
+    pass
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_queue_state() -> None:
+    queue = RetrievalJobQueue(ordering="newest-first")
+    for day in [3, 2, 1, 1]:
+        queue.push(
+            "proffast-2.4", "GGG2020", _get_sdc(day), types.config.RetrievalJobSettingsConfig()
+        )
+    jobs = queue.to_list()
+    assert [j.sensor_data_context.from_datetime.day for j in jobs] == [3, 2, 1, 1]
+    assert [j.job_id for j in jobs] == [0, 1, 2, 3]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        _TmpQueueState.database_path = os.path.join(tmpdir, "queue-state.sqlite")
+        assert _TmpQueueState.load() is None
+
+        queue_state = _TmpQueueState.create("abc", jobs)
+        queue_state.set_state(jobs[0], "done")
+        queue_state.set_state(jobs[1], "running")
+        queue_state.set_state(jobs[2], "failed")
+        assert not queue_state.is_finished()
+
+        # jobs with the same inputs are tracked separately
+        loaded_queue_state = _TmpQueueState.load()
+        assert loaded_queue_state is not None
+        assert loaded_queue_state.queue_fingerprint == "abc"
+        assert loaded_queue_state.get_jobs("running") == [jobs[1]]
+        assert loaded_queue_state.get_jobs("failed") == [jobs[2]]
+        assert loaded_queue_state.get_jobs("pending") == [jobs[3]]
+
+        # resumed jobs keep their job id
+        resumed_queue = RetrievalJobQueue(ordering="newest-first")
+        for j in loaded_queue_state.get_jobs("pending"):
+            resumed_queue.push(
+                j.retrieval_algorithm,
+                j.atmospheric_profile_model,
+                j.sensor_data_context,
+                j.job_settings,
+                job_id=j.job_id,
+            )
+        resumed_job = resumed_queue.pop()
+        assert (resumed_job is not None) and (resumed_job == jobs[3])
+        loaded_queue_state.set_state(resumed_job, "done")
+        loaded_queue_state.set_state(jobs[1], "done")
+        assert loaded_queue_state.is_finished()
+        assert _TmpQueueState.create("def", []).is_finished()
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_seconds_per_ifg_estimation() -> None:
+    t = datetime.datetime(2024, 1, 1, 12, 0, 0, tzinfo=datetime.timezone.utc)
+    statuses = [
+        RetrievalStatus(
+            retrieval_algorithm="proffast-2.4",
+            atmospheric_profile_model="GGG2020",
+            sensor_id=sensor_id,
+            from_datetime=t,
+            to_datetime=t,
+            location_id="SOD",
+            ifg_count=ifg_count,
+            process_start_time=None if duration is None else t,
+            process_end_time=None if duration is None else t + datetime.timedelta(seconds=duration),
+        )
+        for sensor_id, ifg_count, duration in [
+            ("so", 100, 200),
+            ("so", 300, 600),
+            ("ma", 50, 50),
+            ("ma", 50, None),
+            ("mb", 0, 100),
+        ]
+    ]
+    assert compute_seconds_per_ifg(statuses) == {"so": 2.0, "ma": 1.0}
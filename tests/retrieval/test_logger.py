@@ -0,0 +1,88 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import pytest
+
+from src import retrieval
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_buffered_json_logger() -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        logger = retrieval.utils.logger.Logger("pytest", log_format="json")
+        logger.logfile_path = os.path.join(tmpdir, "pytest.log")
+
+        # lines are buffered until the next flush point
+        logger.set_stage("inputs")
+        logger.info("Moving interferograms")
+        with open(logger.logfile_path, "r") as f:
+            assert f.read() == ""
+        logger.set_stage("proffast")
+        logger.error("Proffast execution failed")
+        with open(logger.logfile_path, "r") as f:
+            records = [json.loads(line) for line in f.readlines()]
+        logger.close()
+
+        assert [(r["stage"], r["level"], r["message"]) for r in records] == [
+            ("inputs", "INFO", "Moving interferograms"),
+            ("proffast", "ERROR", "Proffast execution failed"),
+        ]
+        assert all(r["container_id"] == "pytest" for r in records)
+        assert 0 <= records[0]["elapsed_seconds"] <= records[1]["elapsed_seconds"]
+
+        # the text format stays the default
+        logger = retrieval.utils.logger.Logger("pytest")
+        logger.logfile_path = os.path.join(tmpdir, "pytest.log")
+        logger.info("Finished")
+        logger.close()
+        with open(logger.logfile_path, "r") as f:
+            assert f.readlines()[-1].endswith(" - INFO - Finished\n")
+
+
+# logs in a loop while signals arrive at a high rate, every signal handler
+# logs as well and the last one closes the logfile like the teardown hooks
+_SIGNAL_SCRIPT = """
+import signal, sys
+sys.path.insert(0, sys.argv[1])
+from src import retrieval
+
+logger = retrieval.utils.logger.Logger("pytest")
+logger.logfile_path = sys.argv[2]
+signal_count = 0
+
+def _on_signal(*args):
+    global signal_count
+    signal_count += 1
+    logger.info(f"Received signal {signal_count}")
+    logger.flush()
+    if signal_count == 500:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        logger.close()
+        sys.exit(0)
+
+signal.signal(signal.SIGALRM, _on_signal)
+signal.setitimer(signal.ITIMER_REAL, 0.0002, 0.0002)
+while True:
+    logger.debug("x" * 100)
+    logger.flush()
+"""
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_logging_from_signal_handler() -> None:
+    project_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    with tempfile.TemporaryDirectory() as tmpdir:
+        logfile_path = os.path.join(tmpdir, "pytest.log")
+        process = subprocess.run(
+            [sys.executable, "-c", _SIGNAL_SCRIPT, project_dir, logfile_path],
+            timeout=60,
+            capture_output=True,
+        )
+        assert process.returncode == 0, process.stderr.decode()
+        with open(logfile_path, "r") as f:
+            lines = f.read().splitlines()
+        assert len([line for line in lines if " - INFO - Received signal " in line]) == 500
@@ -0,0 +1,160 @@
+import datetime
+import os
+import tempfile
+import pytest
+import tum_esm_utils
+from ..fixtures import provide_config_template  # pyright: ignore[reportUnusedImport]
+
+from src import retrieval, types
+from src.retrieval.dispatching.metrics_exporter import RetrievalMetricsExporter
+from src.retrieval.utils.retrieval_status import RetrievalStatusList
+from src.utils.metrics import MetricsRegistry
+
+from .test_retrieval_status import em27_metadata_interface
+
+
+class _TmpRetrievalStatusList(RetrievalStatusList):
+    pass
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_metrics_registry() -> None:
+    registry = MetricsRegistry()
+    registry.inc("em27_test_total", "A counter.", sensor_id='a"b')
+    registry.inc("em27_test_total", "A counter.", 2.5, sensor_id='a"b')
+    registry.set("em27_test_gauge", "A gauge.", 3)
+    registry.set_histogram("em27_test_seconds", "A histogram.", [1, 5, 5, 20], buckets=[10, 1])
+    assert registry.render() == "\n".join(
+        [
+            "# HELP em27_test_total A counter.",
+            "# TYPE em27_test_total counter",
+            'em27_test_total{sensor_id="a\\"b"} 3.5',
+            "# HELP em27_test_gauge A gauge.",
+            "# TYPE em27_test_gauge gauge",
+            "em27_test_gauge 3",
+            "# HELP em27_test_seconds A histogram.",
+            "# TYPE em27_test_seconds histogram",
+            'em27_test_seconds_bucket{le="1"} 1',
+            'em27_test_seconds_bucket{le="10"} 3',
+            'em27_test_seconds_bucket{le="+Inf"} 4',
+            "em27_test_seconds_sum 31",
+            "em27_test_seconds_count 4",
+            "",
+        ]
+    )
+    with pytest.raises(ValueError):
+        registry.set("em27_test_total", "Not a gauge.", 1)
+    with pytest.raises(AssertionError):
+        registry.inc("em27_test_counter", "Counters end with _total.")
+
+    # without a textfile, nothing is written
+    registry.write()
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_retrieval_metrics_exporter(provide_config_template: types.Config) -> None:
+    config = provide_config_template.model_copy(deep=True)
+    logger = retrieval.utils.logger.Logger("pytest", write_to_file=False, print_to_console=True)
+    assert RetrievalMetricsExporter(config, logger).poll_interval is None
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        config.general.metrics = types.config.MetricsConfig(
+            textfile_dir=tum_esm_utils.validators.StrictDirectoryPath(tmpdir),
+            interval_seconds=60,
+        )
+        _TmpRetrievalStatusList.database_path = os.path.join(tmpdir, "active-processes.sqlite")
+        _TmpRetrievalStatusList.reset()
+        now = datetime.datetime.now(datetime.timezone.utc)
+        for day, ifg_count, duration_minutes, end_hours_ago in [
+            (1, 100, 2, 0.5),
+            (2, 200, 20, 0.1),
+            (3, 400, 20, 3),
+        ]:
+            from_datetime = datetime.datetime(2017, 1, day, tzinfo=datetime.timezone.utc)
+            sdc = em27_metadata_interface.get(
+                "so", from_datetime, from_datetime + datetime.timedelta(hours=23)
+            )[0]
+            _TmpRetrievalStatusList.add_items([sdc], "proffast-2.4", "GGG2020")
+            end_time = now - datetime.timedelta(hours=end_hours_ago)
+            _TmpRetrievalStatusList.update_item(
+                "proffast-2.4",
+                "GGG2020",
+                "so",
+                sdc.from_datetime,
+                None,
+                ifg_count=ifg_count,
+                process_start_time=end_time - datetime.timedelta(minutes=duration_minutes),
+                process_end_time=end_time,
+            )
+
+        exporter = RetrievalMetricsExporter(config, logger, status_list=_TmpRetrievalStatusList)
+        exporter.record_finished_session("proffast-2.4", "done")
+        exporter.record_finished_session("proffast-2.4", "failed")
+        exporter.record_finished_session("proffast-2.4", "done")
+        exporter.export(queue_depth=7, running_session_count=2)
+
+        textfile_path = os.path.join(tmpdir, "em27_retrieval.prom")
+        with open(textfile_path) as f:
+            lines = f.read().splitlines()
+        assert "em27_retrieval_queue_depth 7" in lines
+        assert "em27_retrieval_running_sessions 2" in lines
+        assert "em27_retrieval_sessions_per_hour 2" in lines
+        assert "em27_retrieval_interferograms_per_hour 300" in lines
+        assert 'em27_retrieval_session_duration_seconds_bucket{le="300"} 1' in lines
+        assert 'em27_retrieval_session_duration_seconds_bucket{le="+Inf"} 3' in lines
+        assert "em27_retrieval_session_duration_seconds_count 3" in lines
+        for result, count in [("successful", 2), ("failed", 1)]:
+            assert (
+                "em27_retrieval_finished_sessions_total{"
+                + f'result="{result}",retrieval_algorithm="proffast-2.4"'
+                + f"}} {count}"
+            ) in lines
+
+        # within the interval, the file is only written when forced
+        exporter.export(queue_depth=0, running_session_count=0)
+        with open(textfile_path) as f:
+            assert "em27_retrieval_queue_depth 7" in f.read().splitlines()
+        exporter.export(queue_depth=0, running_session_count=0, force=True)
+        with open(textfile_path) as f:
+            assert "em27_retrieval_queue_depth 0" in f.read().splitlines()
+
+        # later exports only load the changed rows
+        sdc = em27_metadata_interface.get(
+            "so",
+            datetime.datetime(2017, 1, 4, tzinfo=datetime.timezone.utc),
+            datetime.datetime(2017, 1, 4, 23, tzinfo=datetime.timezone.utc),
+        )[0]
+        _TmpRetrievalStatusList.add_items([sdc], "proffast-2.4", "GGG2020")
+        _TmpRetrievalStatusList.update_item(
+            "proffast-2.4",
+            "GGG2020",
+            "so",
+            sdc.from_datetime,
+            None,
+            ifg_count=50,
+            process_start_time=now - datetime.timedelta(minutes=1),
+            process_end_time=now,
+        )
+        changes = _TmpRetrievalStatusList.load_changes(
+            exporter.status_generation, exporter.status_version
+        )
+        assert (changes is not None) and (len(changes.items) == 1)
+        exporter.export(queue_depth=0, running_session_count=0, force=True)
+        with open(textfile_path) as f:
+            lines = f.read().splitlines()
+        assert "em27_retrieval_sessions_per_hour 3" in lines
+        assert "em27_retrieval_interferograms_per_hour 350" in lines
+        assert "em27_retrieval_session_duration_seconds_count 4" in lines
+
+        # a reset of the status list starts over
+        _TmpRetrievalStatusList.reset()
+        exporter.export(queue_depth=0, running_session_count=0, force=True)
+        with open(textfile_path) as f:
+            lines = f.read().splitlines()
+        assert "em27_retrieval_sessions_per_hour 0" in lines
+        assert "em27_retrieval_session_duration_seconds_count 0" in lines
+
+        # no temporary files are left behind
+        assert [f for f in os.listdir(tmpdir) if f.endswith(".tmp")] == []
@@ -0,0 +1,110 @@
+import json
+import os
+import tempfile
+from typing import Any
+import pytest
+
+from src import retrieval
+from src.retrieval.utils import preprocess_splitting
+
+
+class _FakePylot:
+    """Stands in for the Pylot: input files are JSON dumps of the template
+    parameters and "running preprocess" behaves like the preprocess
+    executable - it truncates the `logfile.dat` in the output directory
+    and its internal log in the log directory, then writes one spectrum,
+    one indexed logfile line and one internal log line per interferogram."""
+
+    def __init__(self, root_dir: str) -> None:
+        self.root_dir = root_dir
+        self.global_inputfile_list: list[str] = []
+        self.logger = retrieval.utils.logger.Logger(
+            "pytest", write_to_file=False, print_to_console=True
+        )
+
+    def replace_params_in_template(
+        self, parameters: dict[str, Any], template_type: str, prf_input_file: str
+    ) -> None:
+        with open(prf_input_file, "w") as f:
+            json.dump(parameters, f)
+
+    def run_prf_with_inputfile(
+        self, prf_inputfile: str, executable: str, popen_kwargs: dict[str, Any] = {}
+    ) -> tuple[str, str, str, str]:
+        with open(prf_inputfile, "r") as f:
+            parameters: dict[str, str] = json.load(f)
+        with (
+            open(os.path.join(parameters["path_spectra"], "logfile.dat"), "w") as logfile,
+            open(
+                os.path.join(parameters["path_preprocess_log"], "Internal_preprocess_log.log"), "w"
+            ) as internal_log,
+        ):
+            for i, ifg in enumerate(parameters["igrams"].split("\n")):
+                spectrum_name = os.path.basename(ifg) + "SN.BIN"
+                with open(os.path.join(parameters["path_spectra"], spectrum_name), "w") as f:
+                    f.write(ifg)
+                logfile.write(f"{i + 1:>7}    0 {spectrum_name}\n")
+                internal_log.write(f"Processing {ifg}\n")
+        return "out", "", "0", f"{executable} {os.path.basename(prf_inputfile)}"
+
+    def preprocess(self, ifg_count: int) -> tuple[str, Any]:
+        spectra_dir = os.path.join(self.root_dir, "170608", "cal")
+        os.makedirs(spectra_dir)
+        log_dir = os.path.join(self.root_dir, "logfiles")
+        os.makedirs(log_dir)
+        input_file = os.path.join(self.root_dir, "preprocess6so_170608.inp")
+        self.replace_params_in_template(
+            {
+                "igrams": "\n".join(f"/ifgs/170608/so20170608.ifg.{i}" for i in range(ifg_count)),
+                "path_spectra": spectra_dir,
+                "path_preprocess_log": log_dir,
+            },
+            "prep",
+            input_file,
+        )
+        return spectra_dir, self.run_prf_with_inputfile(input_file, "preprocess6")
+
+
+class _SplitFakePylot(preprocess_splitting.PreprocessSplittingMixin, _FakePylot):
+    preprocess_slice_count = 3
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_preprocess_splitting() -> None:
+    assert preprocess_splitting.split_ifgs([str(i) for i in range(99)], 4) == [
+        [str(i) for i in range(99)]
+    ]
+    slices = preprocess_splitting.split_ifgs([str(i) for i in range(250)], 4)
+    assert [len(s) for s in slices] == [62, 63, 63, 62]
+    assert [ifg for s in slices for ifg in s] == [str(i) for i in range(250)]
+
+    outputs: dict[str, dict[str, str]] = {}
+    for pylot_class in [_FakePylot, _SplitFakePylot]:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            pylot = pylot_class(tmpdir)
+            spectra_dir, output = pylot.preprocess(ifg_count=160)
+            assert output[2] == "0"
+            assert sorted(os.listdir(os.path.join(tmpdir, "170608"))) == ["cal"]
+            # the spectra and log directories of the slices are removed
+            assert sorted(os.listdir(tmpdir)) == sorted(
+                [
+                    "170608",
+                    "logfiles",
+                    "preprocess6so_170608.inp",
+                    *[os.path.basename(f) for f in pylot.global_inputfile_list],
+                ]
+            )
+            outputs[pylot_class.__name__] = {}
+            for directory in [spectra_dir, os.path.join(tmpdir, "logfiles")]:
+                for filename in os.listdir(directory):
+                    with open(os.path.join(directory, filename), "r") as f:
+                        outputs[pylot_class.__name__][filename] = f.read()
+            if pylot_class == _SplitFakePylot:
+                assert len(pylot.global_inputfile_list) == 3
+                assert output[3].count(" && ") == 2
+
+    # the split run produces the same spectra and logfiles as the unsplit run
+    assert len(outputs["_FakePylot"]) == 162
+    assert outputs["_FakePylot"]["logfile.dat"].splitlines()[-1].startswith("    160 ")
+    assert outputs["_FakePylot"] == outputs["_SplitFakePylot"]
@@ -8,6 +8,8 @@ import polars as pl
 import tum_esm_utils
 from src import types
 from src.retrieval.utils.pressure_loading import find_pressure_files, load_pressure_file
+from src.utils.file_index import DatedFileIndex
+from src.utils.text import replace_regex_placeholders
 
 
 def _popuplate_directory_structure(root_dir: str, files: dict[str, set[str]]) -> None:
@@ -131,6 +133,47 @@ def test_pressure_file_locating() -> None:
         assert len(r6[2]) == 0
 
 
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_dated_file_index() -> None:
+    filenames = [
+        "gp-ma-20220602.csv",
+        "gp-ma-20220602-b.csv",
+        "gp-ma-20221399.csv",
+        "gp-mb-20220603.csv",
+        "gp-ma-2022-06-03.csv",
+        "gp-ma-2022-06-03-22.csv",
+        "gp-ma-2022-06-03-23.csv",
+        "gp-ma-2022-06.csv",
+        "gp-ma-22-06-04.csv",
+        "readme.txt",
+    ]
+    dates = [datetime.date(2022, 6, d) for d in range(1, 6)] + [datetime.date(1922, 6, 3)]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        _popuplate_directory_structure(tmpdir, {"ma": set(filenames)})
+
+        for file_regex in [
+            r"gp-$(SENSOR_ID)-$(DATE)\.csv",
+            r"gp-$(SENSOR_ID)-$(DATE).*\.csv",
+            r"gp-.*-$(DATE)\.csv",
+            r"gp-$(SENSOR_ID)-$(YYYY)-$(MM)-$(DD).*\.csv",
+            r"gp-$(SENSOR_ID)-$(YYYY)-$(MM)-$(DD)-$(YY)\.csv",
+            r"gp-$(SENSOR_ID)-$(YYYY)-$(MM).*\.csv",
+            r"gp-$(SENSOR_ID)-$(YY)-$(MM)-$(DD)\.csv",
+            r".*",
+        ]:
+            index = DatedFileIndex(os.path.join(tmpdir, "ma"), "ma", file_regex)
+            for date in dates:
+                _, specific_file_pattern = replace_regex_placeholders(file_regex, "ma", date)
+                expected_files = sorted(
+                    f for f in filenames if specific_file_pattern.match(f) is not None
+                )
+                assert index.find(date) == expected_files, (file_regex, date)
+                assert index.exists(date) == (len(expected_files) > 0), (file_regex, date)
+
+        assert not DatedFileIndex(os.path.join(tmpdir, "mb"), "mb", ".*").exists(dates[0])
+
+
 @pytest.mark.order(3)
 @pytest.mark.quick
 def test_pressure_file_loading() -> None:
@@ -0,0 +1,81 @@
+import os
+import sys
+import tempfile
+from typing import Any
+import pytest
+
+from src.retrieval.utils.process_accounting import (
+    PylotAccountingMixin,
+    load_executable_usage,
+    run_accounted,
+    summarize_executable_usage,
+)
+
+# allocates and touches 200 MB, then prints 1 MB to both stdout and stderr
+_SCRIPT = (
+    "import sys; b = bytearray(200 * 1024 * 1024); "
+    + "sys.stdout.write('o' * 1024 * 1024); sys.stderr.write('e' * 1024 * 1024); "
+    + "sys.exit(int(sys.argv[1]))"
+)
+
+
+class _FakePylot:
+    def _call_external_program(self, command_list: list[str], **kwargs: Any) -> Any:
+        raise NotImplementedError()
+
+    def run_prf_with_inputfile(self, prf_inputfile: str, executable: str) -> Any:
+        out, err, return_val = self._call_external_program(
+            [executable, "-c", _SCRIPT, prf_inputfile], cwd=os.getcwd()
+        )
+        return out, err, str(return_val), f"{executable} {prf_inputfile}"
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_run_accounted() -> None:
+    out, err, usage = run_accounted([sys.executable, "-c", _SCRIPT, "3"])
+    assert (len(out), len(err)) == (1024 * 1024, 1024 * 1024)
+    assert usage.executable == os.path.basename(sys.executable)
+    assert usage.arguments == ["-c", _SCRIPT, "3"]
+    assert usage.return_code == 3
+    assert usage.max_rss_mb >= 200
+    assert usage.user_time_seconds + usage.system_time_seconds > 0
+    assert usage.voluntary_context_switches + usage.involuntary_context_switches > 0
+
+    # the usage of a shell command includes all commands of the shell
+    out, _, usage = run_accounted(
+        f'echo 0 | {sys.executable} -c "{_SCRIPT}" 0 > /dev/null && echo done',
+        executable_name="script",
+        shell=True,
+        executable="/bin/bash",
+    )
+    assert out == "done\n"
+    assert usage.executable == "script"
+    assert usage.return_code == 0
+    assert usage.max_rss_mb >= 200
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_pylot_accounting_mixin() -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "executable_usage.jsonl")
+
+        class _AccountedPylot(PylotAccountingMixin, _FakePylot):
+            executable_usage_path = path
+
+        pylot = _AccountedPylot()
+        for return_code in ["0", "0", "1"]:
+            pylot.run_prf_with_inputfile(return_code, sys.executable)
+        out, _, return_code, _ = pylot.run_prf_with_inputfile("2", sys.executable)
+        assert (len(out), return_code) == (1024 * 1024, "2")
+
+        usages = load_executable_usage(path)
+        assert [u.return_code for u in usages] == [0, 0, 1, 2]
+        summaries = summarize_executable_usage(usages)
+        assert len(summaries) == 1
+        assert summaries[0].call_count == 4
+        assert summaries[0].max_rss_mb == max(u.max_rss_mb for u in usages)
+        assert summaries[0].user_time_seconds == pytest.approx(
+            sum(u.user_time_seconds for u in usages)
+        )
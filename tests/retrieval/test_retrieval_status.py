@@ -0,0 +1,171 @@
+import datetime
+import multiprocessing
+import os
+import tempfile
+import pytest
+import em27_metadata
+
+from src.retrieval.utils.queue_watcher import QueueView
+from src.retrieval.utils.retrieval_status import RetrievalStatusList
+
+em27_metadata_interface = em27_metadata.interfaces.EM27MetadataInterface(
+    locations=em27_metadata.types.LocationMetadataList(
+        root=[
+            em27_metadata.types.LocationMetadata(
+                location_id="SOD",
+                details="Sodankyla",
+                lon=26.630,
+                lat=67.366,
+                alt=181.0,
+            )
+        ]
+    ),
+    sensors=em27_metadata.types.SensorMetadataList(
+        root=[
+            em27_metadata.types.SensorMetadata(
+                sensor_id="so",
+                serial_number=1,
+                setups=[
+                    em27_metadata.types.SetupsListItem(
+                        from_datetime="2017-01-01T00:00:00+0000",  # pyright: ignore[reportArgumentType]
+                        to_datetime="2017-12-31T23:59:59+0000",  # pyright: ignore[reportArgumentType]
+                        value=em27_metadata.types.Setup(location_id="SOD"),
+                    )
+                ],
+            )
+        ]
+    ),
+    campaigns=em27_metadata.types.CampaignMetadataList(root=[]),
+)
+
+_SESSION_COUNT = 64
+
+
+class _TmpRetrievalStatusList(RetrievalStatusList):
+    pass
+
+
+def _get_from_datetime(day_of_year: int) -> datetime.datetime:
+    return datetime.datetime(2017, 1, 1, tzinfo=datetime.timezone.utc) + datetime.timedelta(
+        days=day_of_year
+    )
+
+
+def _run_session(database_path: str, day_of_year: int) -> None:
+    _TmpRetrievalStatusList.database_path = database_path
+    for kwargs in [
+        {"container_id": f"container-{day_of_year}"},
+        {"ifg_count": day_of_year},
+        {"executable_cpu_seconds": day_of_year * 1.5, "executable_max_rss_mb": 512.0},
+        {"process_start_time": datetime.datetime.now(datetime.timezone.utc)},
+        {"process_end_time": datetime.datetime.now(datetime.timezone.utc)},
+    ]:
+        _TmpRetrievalStatusList.update_item(
+            "proffast-2.4",
+            "GGG2020",
+            "so",
+            _get_from_datetime(day_of_year),
+            None,
+            **kwargs,  # type: ignore
+        )
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_retrieval_status_list() -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        _TmpRetrievalStatusList.database_path = os.path.join(tmpdir, "active-processes.sqlite")
+        assert _TmpRetrievalStatusList.load() == []
+
+        _TmpRetrievalStatusList.reset()
+        sdcs = [
+            em27_metadata_interface.get(
+                "so",
+                _get_from_datetime(i),
+                _get_from_datetime(i) + datetime.timedelta(hours=23, minutes=59, seconds=59),
+            )[0]
+            for i in range(_SESSION_COUNT)
+        ]
+        _TmpRetrievalStatusList.add_items(sdcs, "proffast-2.4", "GGG2020")
+        _TmpRetrievalStatusList.add_items(sdcs[:1], "proffast-2.4", "GGG2020", output_suffix="v2")
+
+        # concurrent sessions do not lose each other's updates
+        processes = [
+            multiprocessing.Process(
+                target=_run_session, args=(_TmpRetrievalStatusList.database_path, i)
+            )
+            for i in range(_SESSION_COUNT)
+        ]
+        for p in processes:
+            p.start()
+        for p in processes:
+            p.join()
+            assert p.exitcode == 0
+
+        statuses = _TmpRetrievalStatusList.load()
+        assert len(statuses) == _SESSION_COUNT + 1
+        for i, s in enumerate(statuses[:_SESSION_COUNT]):
+            assert s.from_datetime == _get_from_datetime(i)
+            assert s.container_id == f"container-{i}"
+            assert s.ifg_count == i
+            assert (s.executable_cpu_seconds, s.executable_max_rss_mb) == (i * 1.5, 512.0)
+            assert s.process_start_time is not None
+            assert s.process_end_time is not None
+            assert s.process_start_time <= s.process_end_time
+
+        # items of other jobs are not touched
+        assert statuses[-1].output_suffix == "v2"
+        assert statuses[-1].container_id is None
+
+        _TmpRetrievalStatusList.reset()
+        assert _TmpRetrievalStatusList.load() == []
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_queue_view() -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        _TmpRetrievalStatusList.database_path = os.path.join(tmpdir, "active-processes.sqlite")
+        view = QueueView(_TmpRetrievalStatusList)
+        view.poll()
+        assert view.process_count == 0
+
+        _TmpRetrievalStatusList.reset()
+        sdcs = [
+            em27_metadata_interface.get(
+                "so",
+                _get_from_datetime(i),
+                _get_from_datetime(i) + datetime.timedelta(hours=23, minutes=59, seconds=59),
+            )[0]
+            for i in range(10)
+        ]
+        _TmpRetrievalStatusList.add_items(sdcs, "proffast-2.4", "GGG2020")
+        view.poll()
+        assert (view.process_count, view.pending_process_count) == (10, 10)
+
+        # only the changed rows are loaded
+        _run_session(_TmpRetrievalStatusList.database_path, 3)
+        _TmpRetrievalStatusList.update_item(
+            "proffast-2.4",
+            "GGG2020",
+            "so",
+            _get_from_datetime(4),
+            None,
+            process_start_time=datetime.datetime.now(datetime.timezone.utc),
+        )
+        changes = _TmpRetrievalStatusList.load_changes(view.generation, view.version)
+        assert (changes is not None) and (len(changes.items) == 2)
+        view.poll()
+        assert view.pending_process_count == 8
+        assert view.in_progress_process_count == 1
+        assert view.done_process_count == 1
+        assert [p.from_datetime for p in view.running_processes.values()] == [_get_from_datetime(4)]
+        changes = _TmpRetrievalStatusList.load_changes(view.generation, view.version)
+        assert (changes is not None) and (len(changes.items) == 0)
+
+        # a reset of the list is a full reload
+        _TmpRetrievalStatusList.reset()
+        _TmpRetrievalStatusList.add_items(sdcs[:2], "proffast-2.4", "GGG2020")
+        view.poll()
+        assert (view.process_count, view.pending_process_count) == (2, 2)
+        assert view.in_progress_process_count == 0
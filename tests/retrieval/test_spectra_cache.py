@@ -0,0 +1,138 @@
+import json
+import os
+import tempfile
+from typing import Any
+import pytest
+
+from src import retrieval
+from src.retrieval.utils import preprocess_splitting, spectra_cache
+
+
+class _FakePylot:
+    """Stands in for the Pylot of one container: input files are JSON dumps
+    of the template parameters and "running preprocess" writes one spectrum
+    per interferogram, the spectra logfile and the preprocess log."""
+
+    def __init__(self, container_path: str, ifg_count: int) -> None:
+        self.container_path = container_path
+        self.proffast_path = os.path.join(container_path, "prf")
+        os.makedirs(os.path.join(self.proffast_path, "preprocess"))
+        with open(os.path.join(self.proffast_path, "preprocess", "preprocess6"), "w") as f:
+            f.write("preprocess executable")
+        with open(os.path.join(self.proffast_path, "template_preprocess6.inp"), "w") as f:
+            f.write("preprocess template")
+        os.makedirs(os.path.join(container_path, "ifg", "170608"))
+        os.makedirs(os.path.join(container_path, "logfiles"))
+        with open(os.path.join(container_path, "opus_file_stats.csv"), "w") as f:
+            f.write("opus_filename,retrieval_filename,checksum")
+            for i in range(ifg_count):
+                f.write(f"\nso20170608.ifg.{i},170608SN.{i + 1},checksum{i}")
+                with open(os.path.join(container_path, "ifg", "170608", f"170608SN.{i + 1}"), "w"):
+                    pass
+        self.ifg_count = ifg_count
+        self.global_inputfile_list: list[str] = []
+        self.logger = retrieval.utils.logger.Logger(
+            "pytest", write_to_file=False, print_to_console=True
+        )
+        self.preprocess_calls = 0
+
+    def get_template_path(self, template_type: str) -> str:
+        return os.path.join(self.proffast_path, "template_preprocess6.inp")
+
+    def _get_executable(self, program: str) -> str:
+        return os.path.join(self.proffast_path, "preprocess", "preprocess6")
+
+    def replace_params_in_template(
+        self, parameters: dict[str, Any], template_type: str, prf_input_file: str
+    ) -> None:
+        with open(prf_input_file, "w") as f:
+            json.dump(parameters, f)
+
+    def run_prf_with_inputfile(
+        self, prf_inputfile: str, executable: str, popen_kwargs: dict[str, Any] = {}
+    ) -> tuple[str, str, str, str]:
+        self.preprocess_calls += 1
+        with open(prf_inputfile, "r") as f:
+            parameters: dict[str, str] = json.load(f)
+        with open(os.path.join(parameters["path_spectra"], "logfile.dat"), "w") as logfile:
+            for ifg in parameters["igrams"].split("\n"):
+                spectrum_name = os.path.basename(ifg) + "SN.BIN"
+                with open(os.path.join(parameters["path_spectra"], spectrum_name), "w") as f:
+                    f.write(f"{os.path.basename(ifg)} with {parameters['ILS_Channel1']}")
+                logfile.write(f"{spectrum_name} ok\n")
+        log_path = os.path.join(parameters["path_preprocess_log"], parameters["filename_logfile"])
+        with open(log_path, "a") as f:
+            f.write(f"preprocessed {os.path.basename(prf_inputfile)}\n")
+        return "out", "", "0", f"{executable} {os.path.basename(prf_inputfile)}"
+
+    def preprocess(self, ils: str = "0.983 0.0") -> tuple[str, Any]:
+        spectra_dir = os.path.join(self.container_path, "analysis", "170608", "cal")
+        os.makedirs(spectra_dir, exist_ok=True)
+        input_file = os.path.join(self.proffast_path, "preprocess6so_170608.inp")
+        self.replace_params_in_template(
+            {
+                "ILS_Channel1": ils,
+                "site_name": "so",
+                "igrams": "\n".join(
+                    os.path.join(self.container_path, "ifg", "170608", f"170608SN.{i + 1}")
+                    for i in range(self.ifg_count)
+                ),
+                "path_preprocess_log": os.path.join(self.container_path, "logfiles"),
+                "filename_logfile": "Internal_preprocess_log_170608.log",
+                "path_spectra": spectra_dir,
+            },
+            "prep",
+            input_file,
+        )
+        return spectra_dir, self.run_prf_with_inputfile(input_file, self._get_executable("prep"))
+
+
+class _CachedFakePylot(
+    spectra_cache.SpectraCacheMixin, preprocess_splitting.PreprocessSplittingMixin, _FakePylot
+):
+    preprocess_slice_count = 3
+
+
+def _read_dir(path: str) -> dict[str, str]:
+    contents: dict[str, str] = {}
+    for filename in os.listdir(path):
+        with open(os.path.join(path, filename), "r") as f:
+            contents[filename] = f.read()
+    return contents
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_spectra_cache_mixin() -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache_dir = os.path.join(tmpdir, "cache")
+        os.mkdir(cache_dir)
+        _CachedFakePylot.spectra_cache_dir = cache_dir
+
+        # the first run preprocesses the day in three slices and caches the merged spectra
+        pylot_1 = _CachedFakePylot(os.path.join(tmpdir, "container-1"), ifg_count=160)
+        spectra_dir_1, output = pylot_1.preprocess()
+        assert output[2] == "0"
+        assert pylot_1.preprocess_calls == 3
+        assert len(os.listdir(cache_dir)) == 1
+
+        # a rerun of the day in another container restores the same spectra and logs
+        pylot_2 = _CachedFakePylot(os.path.join(tmpdir, "container-2"), ifg_count=160)
+        spectra_dir_2, output = pylot_2.preprocess()
+        assert output[2] == "0"
+        assert pylot_2.preprocess_calls == 0
+        assert _read_dir(spectra_dir_2) == _read_dir(spectra_dir_1)
+        assert len(_read_dir(spectra_dir_2)) == 161
+        assert os.listdir(os.path.dirname(spectra_dir_2)) == ["cal"]
+        assert _read_dir(os.path.join(pylot_2.container_path, "logfiles")) == _read_dir(
+            os.path.join(pylot_1.container_path, "logfiles")
+        )
+
+        # different preprocess parameters or interferograms are a cache miss
+        pylot_3 = _CachedFakePylot(os.path.join(tmpdir, "container-3"), ifg_count=160)
+        assert pylot_3.preprocess(ils="0.99 0.0")[1][2] == "0"
+        assert pylot_3.preprocess_calls == 3
+        pylot_4 = _CachedFakePylot(os.path.join(tmpdir, "container-4"), ifg_count=159)
+        assert pylot_4.preprocess()[1][2] == "0"
+        assert pylot_4.preprocess_calls == 3
+        assert len(os.listdir(cache_dir)) == 3
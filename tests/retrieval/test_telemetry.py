@@ -0,0 +1,164 @@
+import datetime
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from typing import Any
+import pytest
+
+from src import types
+from src.retrieval.utils.process_accounting import append_executable_usage, run_accounted
+from src.retrieval.utils.telemetry import (
+    PylotTelemetryMixin,
+    SessionMetrics,
+    compute_stage_statistics,
+    load_session_metrics,
+    load_stage_timings,
+    measure_stage,
+)
+
+
+def _timing(stage: str, wall_time_seconds: float) -> types.RetrievalStageTiming:
+    return types.RetrievalStageTiming(
+        stage=stage,
+        wall_time_seconds=wall_time_seconds,
+        cpu_time_seconds=wall_time_seconds / 2,
+        peak_rss_mb=100,
+        read_bytes=0,
+        write_bytes=4096,
+    )
+
+
+def _record(sensor_id: str, timings: list[types.RetrievalStageTiming]) -> SessionMetrics:
+    return SessionMetrics(
+        time=datetime.datetime.now(datetime.timezone.utc),
+        container_id="abc",
+        retrieval_algorithm="proffast-2.4",
+        atmospheric_profile_model="GGG2020",
+        sensor_id=sensor_id,
+        from_datetime=datetime.datetime(2017, 6, 1, tzinfo=datetime.timezone.utc),
+        output_suffix=None,
+        timings=timings,
+    )
+
+
+class _FakePylot:
+    executable_usage_path: Any = None
+
+    def __init__(self, config: str) -> None:
+        self.config = config
+        self.calls: list[str] = []
+
+    def run_preprocess(self, n_processes: int = 1) -> None:
+        self.calls.append("preprocess")
+        _, _, usage = run_accounted([sys.executable, "-c", "pass"])
+        append_executable_usage(self.executable_usage_path, usage)
+
+    def run_pcxs(self, n_processes: int = 1) -> None:
+        self.calls.append("pcxs")
+
+    def run_inv(self, n_processes: int = 1) -> None:
+        raise RuntimeError("invers failed")
+
+    def combine_results(self) -> None:
+        self.calls.append("combine")
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_measure_stage() -> None:
+    timings: list[types.RetrievalStageTiming] = []
+    with measure_stage("busy-subprocess", timings):
+        subprocess.run(
+            [sys.executable, "-c", "sum(i * i for i in range(3_000_000))"],
+            check=True,
+        )
+    with pytest.raises(ValueError):
+        with measure_stage("failing", timings):
+            raise ValueError()
+
+    assert [t.stage for t in timings] == ["busy-subprocess", "failing"]
+    assert timings[0].wall_time_seconds > 0
+    assert timings[0].cpu_time_seconds > 0
+    assert timings[0].peak_rss_mb is None
+
+    # the peak RSS only covers the executables called during the stage
+    with tempfile.TemporaryDirectory() as tmpdir:
+        usage_path = os.path.join(tmpdir, "executable_usage.jsonl")
+        _, _, large_usage = run_accounted(
+            [sys.executable, "-c", "b = bytearray(512 * 1024 * 1024)"]
+        )
+        append_executable_usage(usage_path, large_usage)
+        with measure_stage("small-executable", timings, usage_path):
+            _, _, small_usage = run_accounted([sys.executable, "-c", "pass"])
+            append_executable_usage(usage_path, small_usage)
+        with measure_stage("no-executable", timings, usage_path):
+            pass
+
+    assert large_usage.max_rss_mb > small_usage.max_rss_mb
+    assert timings[2].peak_rss_mb == small_usage.max_rss_mb
+    assert timings[3].peak_rss_mb is None
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_stage_statistics() -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "retrieval-metrics.jsonl")
+        assert load_session_metrics(path) == []
+
+        with open(path, "w") as f:
+            for i in range(1, 11):
+                f.write(_record("ma", [_timing("move_ifg_files", i)]).model_dump_json() + "\n")
+            f.write("not a record\n")
+            f.write(_record("mb", [_timing("move_ifg_files", 42)]).model_dump_json() + "\n")
+
+        records = load_session_metrics(path)
+        assert len(records) == 11
+        statistics = compute_stage_statistics(records)
+        assert [(s.sensor_id, s.stage, s.session_count) for s in statistics] == [
+            ("ma", "move_ifg_files", 10),
+            ("mb", "move_ifg_files", 1),
+        ]
+        assert statistics[0].wall_time_seconds == {"p50": 5, "p90": 9, "p99": 10, "max": 10}
+        assert statistics[0].cpu_time_seconds["p50"] == 2.5
+        assert statistics[1].write_bytes == {"p50": 4096, "p90": 4096, "p99": 4096, "max": 4096}
+
+        # stages without any executable call have no peak RSS
+        statistics = compute_stage_statistics(
+            [_record("ma", [_timing("move_ifg_files", 1).model_copy(update={"peak_rss_mb": None})])]
+        )
+        assert statistics[0].peak_rss_mb == {}
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_pylot_telemetry_mixin() -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "pylot_timings.json")
+        usage_path = os.path.join(tmpdir, "executable_usage.jsonl")
+
+        class _MeasuredPylot(PylotTelemetryMixin, _FakePylot):
+            timings_path = path
+            executable_usage_path = usage_path
+
+        pylot: Any = _MeasuredPylot("pylot_config.yml")
+        assert pylot.config == "pylot_config.yml"
+        pylot.run_preprocess(n_processes=2)
+        pylot.run_pcxs(n_processes=2)
+
+        # the timings are written after every stage, also a failing one
+        with open(path) as f:
+            assert [t["stage"] for t in json.load(f)] == ["pylot.preprocess", "pylot.pcxs"]
+        with pytest.raises(RuntimeError):
+            pylot.run_inv(n_processes=2)
+        assert [t.stage for t in load_stage_timings(path)] == [
+            "pylot.preprocess",
+            "pylot.pcxs",
+            "pylot.invers",
+        ]
+        assert pylot.calls == ["preprocess", "pcxs"]
+        assert [t.peak_rss_mb is None for t in load_stage_timings(path)] == [False, True, True]
+
+        assert load_stage_timings(os.path.join(tmpdir, "missing.json")) == []
@@ -0,0 +1,71 @@
+import datetime
+from typing import Optional
+import pytest
+
+from src.retrieval.utils.retrieval_status import RetrievalStatus
+from src.retrieval.utils.throughput import estimate_ifgs_per_core_second, estimate_queue
+
+_NOW = datetime.datetime(2024, 1, 1, 12, tzinfo=datetime.timezone.utc)
+
+
+def _status(
+    day: int,
+    output_suffix: Optional[str] = None,
+    ifg_count: Optional[int] = None,
+    process_count: Optional[int] = None,
+    started_minutes_ago: Optional[float] = None,
+    duration_minutes: Optional[float] = None,
+) -> RetrievalStatus:
+    from_datetime = datetime.datetime(2023, 6, day, tzinfo=datetime.timezone.utc)
+    start_time = (
+        None
+        if started_minutes_ago is None
+        else _NOW - datetime.timedelta(minutes=started_minutes_ago)
+    )
+    return RetrievalStatus(
+        retrieval_algorithm="proffast-2.4",
+        atmospheric_profile_model="GGG2020",
+        sensor_id="so",
+        from_datetime=from_datetime,
+        to_datetime=from_datetime + datetime.timedelta(hours=23, minutes=59, seconds=59),
+        output_suffix=output_suffix,
+        location_id="SOD",
+        ifg_count=ifg_count,
+        process_count=process_count,
+        process_start_time=start_time,
+        process_end_time=(
+            None
+            if (start_time is None) or (duration_minutes is None)
+            else start_time + datetime.timedelta(minutes=duration_minutes)
+        ),
+    )
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_throughput_estimation() -> None:
+    assert estimate_ifgs_per_core_second([_status(1), _status(2, started_minutes_ago=5)]) is None
+
+    statuses = [
+        # finished: 600 ifgs in 10 core-minutes and 1200 ifgs in 2 x 10 core-minutes
+        _status(1, ifg_count=600, process_count=1, started_minutes_ago=30, duration_minutes=10),
+        _status(2, ifg_count=1200, process_count=2, started_minutes_ago=20, duration_minutes=10),
+        # running for 5 core-minutes: 300 of 900 ifgs are done
+        _status(3, ifg_count=900, process_count=1, started_minutes_ago=5),
+        # pending with an unknown ifg count: assumed to have the mean of 900 ifgs
+        _status(4),
+        # another job without finished sessions uses the throughput of all jobs
+        _status(5, output_suffix="v2"),
+    ]
+    assert estimate_ifgs_per_core_second(statuses) == pytest.approx(1.0)
+
+    estimate = estimate_queue(statuses, max_process_count=4, now=_NOW)
+    assert (estimate.pending_count, estimate.running_count, estimate.done_count) == (2, 1, 2)
+    assert len(estimate.jobs) == 2
+    assert estimate.jobs[0].output_suffix is None
+    assert estimate.jobs[0].remaining_ifg_count == pytest.approx(600 + 900)
+    assert estimate.jobs[1].output_suffix == "v2"
+    assert estimate.jobs[1].remaining_ifg_count == pytest.approx(900)
+    assert estimate.remaining_core_seconds == pytest.approx(2400)
+    assert estimate.estimated_remaining_seconds == pytest.approx(600)
+    assert estimate.estimated_end_time == _NOW + datetime.timedelta(minutes=10)